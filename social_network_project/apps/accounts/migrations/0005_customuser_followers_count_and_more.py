@@ -0,0 +1,27 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_customuser_avatar_customuser_bio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'followers_count'], name='accounts_cu_user_ty_ad5a6d_idx'),
+        ),
+    ]
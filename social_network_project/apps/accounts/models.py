@@ -26,6 +26,16 @@ class CustomUser(AbstractUser):
     course = models.CharField(max_length=100, blank=True, null=True)
     university = models.CharField(max_length=100, blank=True, null=True)
     semester = models.CharField(max_length=20, blank=True, null=True)
+    
+    # Contadores do grafo de seguidores (mantidos pelos signals de core.Follow)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Empresas com muitos seguidores (timeline no modo de leitura)
+            models.Index(fields=['user_type', 'followers_count']),
+        ]
 
     def __str__(self):
         return self.nickname or self.username
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from apps.core.models import Post, JobListing, JobApplication, Comment, Like
+from apps.core.models import Post, JobListing, JobApplication, Comment, Like, Tag, FollowSuggestion
 from apps.accounts.models import CustomUser
 
 User = get_user_model()
@@ -39,6 +39,25 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at']
 
 
+class TagSerializer(serializers.ModelSerializer):
+    """Serializer for Tag model"""
+    
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'slug', 'posts_count', 'jobs_count', 'student_posts_count']
+        read_only_fields = fields
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    """Serializer for precomputed follow suggestions"""
+    suggested = UserProfileSerializer(read_only=True)
+    
+    class Meta:
+        model = FollowSuggestion
+        fields = ['suggested', 'score', 'reason', 'mutual_count']
+        read_only_fields = fields
+
+
 class PostSerializer(serializers.ModelSerializer):
     """Serializer for Post model"""
     author = UserProfileSerializer(read_only=True)
@@ -58,6 +77,11 @@ class PostSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
     
     def get_user_liked(self, obj):
+        # List views resolve the whole page in PostViewSet.get_page_context
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.id in liked_post_ids
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Like.objects.filter(user=request.user, post=obj).exists()
@@ -67,7 +91,7 @@ class PostSerializer(serializers.ModelSerializer):
 class JobListingSerializer(serializers.ModelSerializer):
     """Serializer for JobListing model"""
     company = UserProfileSerializer(read_only=True)
-    applications_count = serializers.IntegerField(read_only=True)
+    applications_count = serializers.SerializerMethodField()
     is_applied = serializers.SerializerMethodField()
     
     class Meta:
@@ -80,7 +104,18 @@ class JobListingSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'company', 'created_at', 'updated_at']
     
+    def get_applications_count(self, obj):
+        # Annotated by JobListingViewSet; other callers fall back to a COUNT
+        if hasattr(obj, 'applications_total'):
+            return obj.applications_total
+        return obj.applications_count
+    
     def get_is_applied(self, obj):
+        # List views resolve the whole page in JobListingViewSet.get_page_context
+        applied_job_ids = self.context.get('applied_job_ids')
+        if applied_job_ids is not None:
+            return obj.id in applied_job_ids
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return JobApplication.objects.filter(job=obj, applicant=request.user).exists()
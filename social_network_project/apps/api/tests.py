@@ -0,0 +1,105 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from apps.core.models import Post, Like, Comment, JobListing, JobApplication
+from apps.messaging.models import StudentConnection
+
+User = get_user_model()
+
+
+class PageQueryCountTest(TestCase):
+    """Per-user flags must be resolved once per page, not once per object"""
+    
+    def setUp(self):
+        self.student = User.objects.create_user(
+            username='student',
+            nickname='student',
+            email='student@test.com',
+            password='testpass123',
+            user_type='student'
+        )
+        self.company = User.objects.create_user(
+            username='company',
+            nickname='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company'
+        )
+        self.client.force_login(self.student)
+    
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.company, content=f'Post {i}', post_type='text')
+            Comment.objects.create(user=self.student, post=post, content='Comentário')
+            if i % 2:
+                Like.objects.create(user=self.student, post=post)
+    
+    def create_jobs(self, count):
+        for i in range(count):
+            job = JobListing.objects.create(
+                company=self.company,
+                title=f'Desenvolvedor Python {i}',
+                description='Descrição da vaga ' * 10,
+                requirements='Python',
+                location='Florianópolis'
+            )
+            if i % 2:
+                JobApplication.objects.create(job=job, applicant=self.student, cover_letter='Carta ' * 30)
+    
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+    
+    def test_post_list_queries_do_not_grow_with_page_size(self):
+        self.create_posts(3)
+        small_page, _ = self.count_queries('/api/v1/posts/?page_size=3')
+        
+        self.create_posts(17)
+        large_page, data = self.count_queries('/api/v1/posts/?page_size=20')
+        
+        self.assertEqual(small_page, large_page)
+        self.assertEqual(sum(post['user_liked'] for post in data['results']), 9)
+    
+    def test_job_list_queries_do_not_grow_with_page_size(self):
+        self.create_jobs(3)
+        small_page, _ = self.count_queries('/api/v1/jobs/?page_size=3')
+        
+        self.create_jobs(17)
+        large_page, data = self.count_queries('/api/v1/jobs/?page_size=20')
+        
+        self.assertEqual(small_page, large_page)
+        self.assertEqual(sum(job['is_applied'] for job in data['results']), 9)
+    
+    def test_post_list_uses_cursor_pagination(self):
+        self.create_posts(5)
+        
+        response = self.client.get('/api/v1/posts/?page_size=3')
+        data = response.json()
+        self.assertNotIn('count', data)
+        self.assertEqual(len(data['results']), 3)
+        
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNone(data['next'])
+    
+    def test_connection_status_is_one_query(self):
+        others = [
+            User.objects.create_user(username=f'other{i}', nickname=f'other{i}', email=f'other{i}@test.com', password='testpass123')
+            for i in range(3)
+        ]
+        StudentConnection.objects.create(from_student=others[0], to_student=self.student, status='accepted')
+        StudentConnection.objects.create(from_student=self.student, to_student=others[1], status='pending')
+        
+        ids = ','.join(str(user.id) for user in others)
+        _, data = self.count_queries(f'/api/v1/users/connection-status/?ids={ids}')
+        self.assertEqual(data, {str(others[0].id): 'accepted', str(others[1].id): 'pending', str(others[2].id): 'none'})
+        
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(f'/api/v1/users/connection-status/?ids={ids}')
+        self.assertEqual(sum('messaging_studentconnection' in query['sql'] for query in context.captured_queries), 1)
+        
+        response = self.client.get('/api/v1/users/connection-status/?ids=1,abc')
+        self.assertEqual(response.status_code, 400)
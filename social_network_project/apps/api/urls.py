@@ -5,7 +5,7 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from .views import (
-    UserViewSet, PostViewSet, JobListingViewSet, JobApplicationViewSet
+    UserViewSet, PostViewSet, JobListingViewSet, JobApplicationViewSet, TagViewSet
 )
 
 app_name = 'api'
@@ -15,6 +15,7 @@ router.register(r'users', UserViewSet, basename='user')
 router.register(r'posts', PostViewSet, basename='post')
 router.register(r'jobs', JobListingViewSet, basename='job')
 router.register(r'applications', JobApplicationViewSet, basename='application')
+router.register(r'tags', TagViewSet, basename='tag')
 
 urlpatterns = [
     path('', include(router.urls)),
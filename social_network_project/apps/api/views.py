@@ -2,15 +2,19 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from django.db.models import Q, Count
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 
-from apps.core.models import Post, JobListing, JobApplication, Comment, Like
+from apps.core.models import Post, JobListing, JobApplication, Like, Tag, adjust_counters
+from apps.core import application_stats, events, follow_graph, job_facets, search, suggestions, tags, timeline
 from apps.accounts.models import CustomUser
+from apps.messaging.models import StudentConnection
 from .serializers import (
     UserSerializer, PostSerializer, JobListingSerializer,
-    JobApplicationSerializer, CommentSerializer, LikeSerializer
+    JobApplicationSerializer, CommentSerializer, TagSerializer,
+    FollowSuggestionSerializer
 )
 
 
@@ -20,6 +24,81 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class FeedCursorPagination(CursorPagination):
+    """
+    Keyset pagination for time-ordered lists.
+    
+    Uses the (-created_at, ...) indexes instead of COUNT + OFFSET, so deep pages
+    cost the same as the first one and new rows do not shift the pages.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+
+
+class ApplicationCursorPagination(FeedCursorPagination):
+    ordering = '-applied_at'
+
+
+class CommentCursorPagination(FeedCursorPagination):
+    page_size = 20
+    ordering = 'created_at'
+
+
+class JobSearchFilter(filters.BaseFilterBackend):
+    """
+    Full-text job search through apps.core.search (?search=...).
+    
+    Replaces SearchFilter's icontains scans with the tsvector/FTS5 index.
+    """
+    search_param = 'search'
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search.search_jobs(queryset, query)
+
+
+class JobOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter whose default is relevance when ?search= is present.
+    
+    The cursor pagination takes its ordering from this filter, so search
+    results are paged by (-search_rank, -id) instead of -created_at; an
+    explicit ?ordering= still wins.
+    """
+    search_ordering = ['-search_rank', '-id']
+    
+    def get_default_ordering(self, view):
+        if view.request.query_params.get(JobSearchFilter.search_param, '').strip():
+            return self.search_ordering
+        return super().get_default_ordering(view)
+
+
+class PageContextMixin:
+    """
+    Resolves per-user flags for a whole page of objects at once.
+    
+    Viewsets implement ``get_page_context(objects)``, which is called once with
+    the objects being serialized and returns extra serializer context (e.g. the
+    set of ids the current user liked), instead of one query per object.
+    """
+    
+    def get_page_context(self, objects):
+        return {}
+    
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            objects = list(args[0])
+            args = (objects,) + args[1:]
+            kwargs.setdefault('context', self.get_serializer_context())
+            if self.request.user.is_authenticated:
+                kwargs['context'].update(self.get_page_context(objects))
+        return super().get_serializer(*args, **kwargs)
+
+
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing user profiles.
@@ -36,19 +115,49 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         """Get current user profile"""
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def suggestions(self, request):
+        """
+        Who to follow: precomputed by the build_suggestions command and read
+        straight from the (user, -score) index. ?limit= caps the list.
+        """
+        try:
+            limit = max(int(request.query_params.get('limit', 0)), 0)
+        except ValueError:
+            limit = 0
+        rows = suggestions.suggestions_for(request.user, limit or None)
+        return Response(FollowSuggestionSerializer(rows, many=True, context={'request': request}).data)
+    
+    @action(detail=False, methods=['get'], url_path='connection-status', permission_classes=[IsAuthenticated])
+    def connection_status(self, request):
+        """
+        Connection status between the current user and ?ids=1,2,3 (up to 100
+        ids), resolved in one query on the connection pair key. Users without
+        a connection are reported as 'none'.
+        """
+        try:
+            user_ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return Response({'error': 'ids must be a comma-separated list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > 100:
+            return Response({'error': 'At most 100 ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        statuses = StudentConnection.statuses_for(request.user.id, user_ids)
+        return Response({str(user_id): statuses.get(user_id, 'none') for user_id in user_ids})
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(PageContextMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing posts.
     """
-    queryset = Post.objects.filter(is_active=True).select_related('author').prefetch_related('likes', 'comments')
+    queryset = Post.objects.filter(is_active=True).select_related('author').prefetch_related('comments__user')
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedCursorPagination
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['content', 'hashtags', 'location']
-    ordering_fields = ['created_at', 'likes__count']
+    ordering_fields = ['created_at', 'likes_count', 'comments_count']
     ordering = ['-created_at']
     
     def get_queryset(self):
@@ -64,33 +173,41 @@ class PostViewSet(viewsets.ModelViewSet):
         if author_id:
             queryset = queryset.filter(author_id=author_id)
         
+        # Filter by hashtag (indexed lookup on the normalized tags)
+        tag = self.request.query_params.get('tag', None)
+        if tag:
+            queryset = tags.filter_by_tag(queryset, tag)
+        
         # Feed: posts from followed users
         feed = self.request.query_params.get('feed', None)
         if feed == 'true':
-            following_users = self.request.user.following.values_list('following', flat=True)
+            following_users = follow_graph.following_ids(self.request.user.id)
             queryset = queryset.filter(
                 Q(author__in=following_users) | Q(author=self.request.user)
             )
         
-        return queryset.annotate(
-            likes_count=Count('likes'),
-            comments_count=Count('comments')
-        )
+        return queryset
+    
+    def get_page_context(self, objects):
+        liked_post_ids = Like.objects.filter(
+            user=self.request.user,
+            post_id__in=[post.id for post in objects]
+        ).values_list('post_id', flat=True)
+        # Likes still queued in core.events count for the user who made them
+        return {'liked_post_ids': events.overlay_ids(self.request.user.id, 'like', liked_post_ids)}
     
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        timeline.fanout_post(post)
     
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
         """Toggle like on a post"""
         post = self.get_object()
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        
-        if not created:
-            like.delete()
-            return Response({'liked': False, 'likes_count': post.likes.count()})
+        # Written in batches by core.events; the response already counts this click
+        liked, likes_count = events.toggle_like(request.user, post)
         
-        return Response({'liked': True, 'likes_count': post.likes.count()})
+        return Response({'liked': liked, 'likes_count': likes_count})
     
     @action(detail=True, methods=['post'])
     def comment(self, request, pk=None):
@@ -100,31 +217,33 @@ class PostViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             serializer.save(user=request.user, post=post)
+            adjust_counters(post, refresh=False, comments_count=1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
-        """Get all comments for a post"""
+        """Get the comments of a post, oldest first, one cursor page at a time"""
         post = self.get_object()
-        comments = post.comments.all()
-        serializer = CommentSerializer(comments, many=True, context={'request': request})
-        return Response(serializer.data)
+        comments = post.comments.select_related('user')
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(comments, request)
+        serializer = CommentSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
 
-class JobListingViewSet(viewsets.ModelViewSet):
+class JobListingViewSet(PageContextMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing job listings.
     """
     queryset = JobListing.objects.filter(status='active').select_related('company', 'category')
     serializer_class = JobListingSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = FeedCursorPagination
+    filter_backends = [DjangoFilterBackend, JobSearchFilter, JobOrderingFilter]
     filterset_fields = ['category', 'job_type', 'experience_level', 'status']
-    search_fields = ['title', 'description', 'tags', 'company__company_name']
-    ordering_fields = ['created_at', 'applications__count']
+    ordering_fields = ['created_at', 'applications_total']
     ordering = ['-created_at']
     
     def get_queryset(self):
@@ -135,18 +254,39 @@ class JobListingViewSet(viewsets.ModelViewSet):
         if location:
             queryset = queryset.filter(location__icontains=location)
         
+        # Filter by tag (indexed lookup on the normalized tags)
+        tag = self.request.query_params.get('tag', None)
+        if tag:
+            queryset = tags.filter_by_tag(queryset, tag)
+        
         # My jobs (for companies)
         my_jobs = self.request.query_params.get('my_jobs', None)
         if my_jobs == 'true':
             queryset = JobListing.objects.filter(company=self.request.user)
         
-        return queryset.annotate(applications_count=Count('applications'))
+        return queryset.annotate(applications_total=Count('applications'))
+    
+    def get_page_context(self, objects):
+        applied_job_ids = JobApplication.objects.filter(
+            applicant=self.request.user,
+            job_id__in=[job.id for job in objects]
+        ).values_list('job_id', flat=True)
+        return {'applied_job_ids': set(applied_job_ids)}
     
     def perform_create(self, serializer):
         if not self.request.user.is_company():
             raise PermissionError("Apenas empresas podem criar vagas.")
         serializer.save(company=self.request.user)
     
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Active-job counts per category, job_type, experience_level and
+        location, from one cached grouped aggregation (see core.job_facets).
+        """
+        result = job_facets.facets()
+        return Response({name: result[name] for name in ('total', *job_facets.FACETS)})
+    
     @action(detail=True, methods=['post'])
     def apply(self, request, pk=None):
         """Apply to a job"""
@@ -191,6 +331,52 @@ class JobListingViewSet(viewsets.ModelViewSet):
             applications, many=True, context={'request': request}
         )
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """
+        Application totals per status for a job (company only), from one
+        cached conditional aggregation (see core.application_stats).
+        """
+        job = get_object_or_404(JobListing, pk=pk)
+        
+        if job.company != request.user:
+            return Response(
+                {'error': 'Você não tem permissão para ver estas estatísticas.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return Response(application_stats.for_job(job.id))
+
+
+class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for browsing tags.
+    
+    The list is the trending tags for one kind of content
+    (?type=posts|jobs|student_posts), ordered by the stored per-tag count.
+    """
+    serializer_class = TagSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'slug'
+    
+    COUNTERS = {
+        'posts': 'posts_count',
+        'jobs': 'jobs_count',
+        'student_posts': 'student_posts_count',
+    }
+    
+    def get_queryset(self):
+        return Tag.objects.all()
+    
+    def list(self, request, *args, **kwargs):
+        counter = self.COUNTERS.get(request.query_params.get('type'), 'posts_count')
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        serializer = self.get_serializer(tags.trending(counter, limit), many=True)
+        return Response(serializer.data)
 
 
 class JobApplicationViewSet(viewsets.ReadOnlyModelViewSet):
@@ -199,7 +385,7 @@ class JobApplicationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = JobApplicationSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = ApplicationCursorPagination
     
     def get_queryset(self):
         # Students see their own applications
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
-    Post, Like, Comment, Follow, Story, StoryView,
-    JobCategory, JobListing, JobApplication
+    Post, Like, Comment, Follow,
+    JobCategory, JobListing, JobApplication, Tag, FollowSuggestion
 )
 
 @admin.register(Post)
@@ -11,6 +11,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     ordering = ('-created_at',)
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'posts_count', 'jobs_count', 'student_posts_count')
+    search_fields = ('slug',)
+    ordering = ('-posts_count',)
+    readonly_fields = ('posts_count', 'jobs_count', 'student_posts_count', 'created_at')
+
 @admin.register(JobCategory)
 class JobCategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug', 'icon')
@@ -47,13 +54,9 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('follower', 'following', 'created_at')
     list_filter = ('created_at',)
 
-@admin.register(Story)
-class StoryAdmin(admin.ModelAdmin):
-    list_display = ('user', 'text_content', 'created_at', 'expires_at')
-    list_filter = ('created_at', 'expires_at')
-    ordering = ('-created_at',)
-
-@admin.register(StoryView)
-class StoryViewAdmin(admin.ModelAdmin):
-    list_display = ('story', 'user', 'viewed_at')
-    list_filter = ('viewed_at',)
\ No newline at end of file
+@admin.register(FollowSuggestion)
+class FollowSuggestionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'suggested', 'score', 'reason', 'mutual_count', 'created_at')
+    list_filter = ('reason',)
+    search_fields = ('user__username', 'suggested__username')
+    raw_id_fields = ('user', 'suggested')
@@ -0,0 +1,75 @@
+"""
+Estatísticas das candidaturas por status (job_applications,
+manage_applications e /api/v1/jobs/{id}/stats/).
+
+O total e a contagem de cada status de JobApplication.STATUS_CHOICES saem de
+um único SELECT com agregação condicional (``Count(filter=Q(status=...))``).
+As estatísticas de uma vaga ficam no cache com a versão do escopo
+``applications:<vaga>``, incrementada quando uma candidatura da vaga é
+criada, muda de status ou é apagada; as de uma empresa (todas as vagas) são
+calculadas na hora, também em uma consulta só.
+
+Os status sem decisão (pendente, em análise, entrevista) formam o grupo
+``open``; ``approved`` e ``rejected`` são os finais.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache_versions import bump_version, versioned_key
+from .models import JobApplication, JobListing
+
+STATUSES = [value for value, _ in JobApplication.STATUS_CHOICES]
+
+# Status de candidaturas ainda sem decisão da empresa
+OPEN_STATUSES = ('pending', 'reviewing', 'interview')
+
+
+def scope(job_id):
+    return f'applications:{job_id}'
+
+
+def invalidate(job_id):
+    bump_version(scope(job_id))
+
+
+def _aggregates(prefix=''):
+    return dict(
+        total=Count(f'{prefix}id'),
+        **{
+            status: Count(f'{prefix}id', filter=Q(**{f'{prefix}status': status}))
+            for status in STATUSES
+        }
+    )
+
+
+def _result(row):
+    total = row['total']
+    by_status = {status: row[status] for status in STATUSES}
+    return {
+        'total': total,
+        'by_status': by_status,
+        'open': sum(by_status[status] for status in OPEN_STATUSES),
+        'percentages': {
+            status: round(count * 100 / total) if total else 0
+            for status, count in by_status.items()
+        },
+    }
+
+
+def for_job(job_id):
+    """``{'total', 'by_status', 'open', 'percentages'}`` das candidaturas da vaga (do cache)"""
+    key = versioned_key('application_stats', [scope(job_id)], job_id)
+    result = cache.get(key)
+    if result is None:
+        result = _result(JobApplication.objects.filter(job_id=job_id).aggregate(**_aggregates()))
+        cache.set(key, result, getattr(settings, 'APPLICATION_STATS_CACHE_TIMEOUT', 600))
+    return result
+
+
+def for_company(company):
+    """Estatísticas de todas as vagas da empresa, mais o total de vagas (``jobs``)"""
+    row = JobListing.objects.filter(company=company).aggregate(
+        jobs=Count('id', distinct=True), **_aggregates('applications__')
+    )
+    return dict(_result(row), jobs=row['jobs'])
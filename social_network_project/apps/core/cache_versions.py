@@ -0,0 +1,58 @@
+"""
+Invalidação de cache por versão.
+
+Em vez de apagar chaves (o que exige saber todas as combinações já
+cacheadas), cada "escopo" tem um número de versão no cache e as chaves
+incluem as versões dos escopos de que dependem. ``bump_version`` muda a
+versão e as chaves antigas simplesmente deixam de ser lidas, expirando
+sozinhas pelo timeout.
+
+Ex: a bandeja de stories de um usuário depende de ``stories`` (alguém
+publicou/apagou um story) e de ``story_views:<id>`` (o usuário viu um story).
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(scope):
+    return f'cache_version:{scope}'
+
+
+def _initial_version():
+    # Se a versão sumir do cache (eviction), a nova não colide com as antigas
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """Versões atuais de ``scopes``, na mesma ordem"""
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def get_version(scope):
+    return get_versions(scope)[0]
+
+
+def bump_version(*scopes):
+    """Invalida tudo que foi cacheado com a versão atual de ``scopes``"""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def versioned_key(prefix, scopes, *parts):
+    """Chave de cache que muda quando qualquer um dos ``scopes`` é invalidado"""
+    versions = '.'.join(str(version) for version in get_versions(*scopes))
+    return ':'.join([prefix, versions, *(str(part) for part in parts)])
@@ -0,0 +1,371 @@
+"""
+Escrita adiada (write-behind) de eventos de visualização e like.
+
+Em vez de um SELECT + INSERT/DELETE por clique, cada evento entra em um
+buffer e é aplicado em lote: as linhas novas com
+``bulk_create(ignore_conflicts=True)``, as removidas com um DELETE por lote
+e os contadores (``Post.likes_count``) com um UPDATE por valor de delta, não
+um por like. Em um post viral, centenas de likes viram poucas escritas.
+
+Backends (settings.EVENT_BUFFER_BACKEND):
+
+- ``'sync'``: aplica o evento na hora, no próprio request (padrão sem
+  cache compartilhado, e nos testes).
+- ``'memory'``: fila por processo, descarregada por uma thread com timer a
+  cada EVENT_FLUSH_MS milissegundos ou EVENT_BATCH_SIZE eventos. Um lote que
+  falha volta para o início da fila (até EVENT_MAX_ATTEMPTS tentativas), e a
+  fila é descarregada quando o processo termina (``atexit``). O overlay
+  fica no cache padrão, então com vários workers ele precisa ser
+  compartilhado (Redis); com o LocMemCache de cada processo o clique some
+  quando o próximo request cai em outro worker.
+- ``'redis'``: lista ``events:queue`` no Redis, drenada pelo comando
+  ``process_events``. Se o Redis não responder, cai para ``'sync'``.
+
+Enquanto um evento não é aplicado, quem o gerou continua vendo o próprio
+clique: ``pending``/``overlay_ids`` leem um overlay por usuário no cache,
+limpo quando o lote é gravado. As escritas no overlay de um usuário são
+serializadas por um lock no cache (``cache.add``), para cliques simultâneos
+não sobrescreverem um ao outro.
+
+Um evento é ``(tipo, user_id, target_id, ativo)``; ativo=False desfaz (ex:
+descurtir). Cada tipo é aplicado pela função registrada em EVENT_HANDLERS.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+
+from .models import Like, Post
+from . import render_cache
+
+logger = logging.getLogger(__name__)
+
+# Tipo de evento -> função que aplica ``{(user_id, target_id): ativo}``
+EVENT_HANDLERS = {
+    'like': 'apps.core.events.apply_likes',
+    'story_view': 'apps.messaging.playback.write_views',
+}
+
+
+def apply_likes(states):
+    """Aplica um lote de likes/descurtidas e acerta ``likes_count`` de cada post"""
+    user_ids = {user_id for user_id, _ in states}
+    post_ids = {post_id for _, post_id in states}
+    existing = {
+        (user_id, post_id): like_id
+        for like_id, user_id, post_id in Like.objects.filter(
+            user_id__in=user_ids,
+            post_id__in=post_ids
+        ).values_list('id', 'user_id', 'post_id')
+        if (user_id, post_id) in states
+    }
+    live_post_ids = set(Post.objects.filter(id__in=post_ids).values_list('id', flat=True))
+
+    added = [
+        (user_id, post_id) for (user_id, post_id), active in states.items()
+        if active and (user_id, post_id) not in existing and post_id in live_post_ids
+    ]
+    removed = [pair for pair, active in states.items() if not active and pair in existing]
+
+    Like.objects.bulk_create(
+        [Like(user_id=user_id, post_id=post_id) for user_id, post_id in added],
+        ignore_conflicts=True
+    )
+    if removed:
+        Like.objects.filter(id__in=[existing[pair] for pair in removed]).delete()
+
+    deltas = {}
+    for _, post_id in added:
+        deltas[post_id] = deltas.get(post_id, 0) + 1
+    for _, post_id in removed:
+        deltas[post_id] = deltas.get(post_id, 0) - 1
+
+    posts_by_delta = {}
+    for post_id, delta in deltas.items():
+        if delta:
+            posts_by_delta.setdefault(delta, []).append(post_id)
+    for delta, ids in posts_by_delta.items():
+        Post.objects.filter(id__in=ids).update(likes_count=Greatest(F('likes_count') + delta, 0))
+    # Contador e "curtido por" dos cards em cache
+    render_cache.bump('post', *{post_id for _, post_id in added + removed})
+
+
+def apply_events(events):
+    """Aplica um lote de eventos; para o mesmo (tipo, usuário, alvo) vale o último"""
+    states = {}
+    for kind, user_id, target_id, active in events:
+        states.setdefault(kind, {})[(user_id, target_id)] = active
+    for kind, kind_states in states.items():
+        import_string(EVENT_HANDLERS[kind])(kind_states)
+    _clear_overlay(events)
+
+
+# ---- Overlay (read-your-writes) ----
+
+def _overlay_key(user_id):
+    return f'event_overlay:{user_id}'
+
+
+# Quanto um lock do overlay dura (se o dono morrer) e quanto se espera por ele
+OVERLAY_LOCK_TIMEOUT = 5
+OVERLAY_LOCK_WAIT = 0.5
+
+
+@contextmanager
+def _overlay_lock(user_id):
+    key = f'{_overlay_key(user_id)}:lock'
+    deadline = time.monotonic() + OVERLAY_LOCK_WAIT
+    acquired = cache.add(key, 1, OVERLAY_LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.005)
+        acquired = cache.add(key, 1, OVERLAY_LOCK_TIMEOUT)
+    if not acquired:
+        # Segue sem o lock: melhor arriscar uma entrada do overlay do que travar o clique
+        logger.warning(f"Lock do overlay de eventos do usuário {user_id} ocupado")
+    try:
+        yield
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def _set_overlay(kind, user_id, target_id, active):
+    key = _overlay_key(user_id)
+    with _overlay_lock(user_id):
+        overlay = cache.get(key) or {}
+        overlay[f'{kind}:{target_id}'] = active
+        cache.set(key, overlay, getattr(settings, 'EVENT_OVERLAY_TIMEOUT', 300))
+
+
+def _clear_overlay(events):
+    written = {}
+    for kind, user_id, target_id, active in events:
+        written.setdefault(user_id, {})[f'{kind}:{target_id}'] = active
+
+    for user_id, entries in written.items():
+        key = _overlay_key(user_id)
+        with _overlay_lock(user_id):
+            overlay = cache.get(key)
+            if not overlay:
+                continue
+            # Só sai do overlay o que já foi gravado com o mesmo valor
+            for entry, active in entries.items():
+                if overlay.get(entry) == active:
+                    del overlay[entry]
+            if overlay:
+                cache.set(key, overlay, getattr(settings, 'EVENT_OVERLAY_TIMEOUT', 300))
+            else:
+                cache.delete(key)
+
+
+def pending(user_id, kind):
+    """Eventos de ``user_id`` ainda não gravados: ``{target_id: ativo}``"""
+    overlay = cache.get(_overlay_key(user_id)) or {}
+    prefix = f'{kind}:'
+    return {
+        int(key[len(prefix):]): active
+        for key, active in overlay.items() if key.startswith(prefix)
+    }
+
+
+def overlay_ids(user_id, kind, ids):
+    """``ids`` gravados + os ativados ainda pendentes - os desativados pendentes"""
+    ids = set(ids)
+    for target_id, active in pending(user_id, kind).items():
+        if active:
+            ids.add(target_id)
+        else:
+            ids.discard(target_id)
+    return ids
+
+
+# ---- Backends ----
+
+class SyncEventBuffer:
+    """Aplica cada evento na hora"""
+
+    buffered = False
+
+    def add(self, events):
+        apply_events(events)
+
+    def flush(self):
+        return 0
+
+
+class MemoryEventBuffer:
+    """Fila por processo descarregada por uma thread com timer"""
+
+    buffered = True
+
+    def __init__(self, flush_ms=None, batch_size=None, max_attempts=None):
+        self.flush_ms = flush_ms or getattr(settings, 'EVENT_FLUSH_MS', 500)
+        self.batch_size = batch_size or getattr(settings, 'EVENT_BATCH_SIZE', 1000)
+        self.max_attempts = max_attempts or getattr(settings, 'EVENT_MAX_ATTEMPTS', 5)
+        self._pending = []
+        self._failures = 0
+        self._closed = False
+        self._timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _schedule(self):
+        # Chamado com self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_ms / 1000, self._flush_in_thread)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def add(self, events):
+        with self._lock:
+            self._pending.extend(events)
+            flush_now = len(self._pending) >= self.batch_size
+            if not flush_now:
+                self._schedule()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return 0
+
+        try:
+            apply_events(batch)
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                if self._failures < self.max_attempts and not self._closed:
+                    # Volta para o início da fila (antes dos eventos mais novos) e tenta de novo
+                    logger.warning(f"Erro ao aplicar {len(batch)} eventos, tentando de novo: {e}")
+                    self._pending[:0] = batch
+                    self._schedule()
+                    return 0
+                self._failures = 0
+            logger.error(f"Erro ao aplicar {len(batch)} eventos, lote descartado: {e}", exc_info=True)
+            return 0
+        with self._lock:
+            self._failures = 0
+        return len(batch)
+
+    def close(self):
+        """Grava o que ainda está na fila (um worker reciclado chama isto ao sair)"""
+        with self._lock:
+            self._closed = True
+        return self.flush()
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            # A thread do timer tem a sua própria conexão
+            connection.close()
+
+
+class RedisEventBuffer:
+    """Lista no Redis drenada pelo comando process_events"""
+
+    buffered = True
+    key = 'events:queue'
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=getattr(settings, 'EVENT_REDIS_DB', 3),
+            socket_timeout=1,
+        )
+        self.batch_size = getattr(settings, 'EVENT_BATCH_SIZE', 1000)
+
+    def add(self, events):
+        self.client.rpush(self.key, *[json.dumps(event) for event in events])
+
+    def flush(self, batch_size=None):
+        batch_size = batch_size or self.batch_size
+        pipe = self.client.pipeline()
+        pipe.lrange(self.key, 0, batch_size - 1)
+        pipe.ltrim(self.key, batch_size, -1)
+        raw, _ = pipe.execute()
+        if not raw:
+            return 0
+
+        try:
+            apply_events([tuple(json.loads(item)) for item in raw])
+        except Exception:
+            # Devolve o lote para o início da fila antes de propagar o erro
+            self.client.lpush(self.key, *reversed(raw))
+            raise
+        return len(raw)
+
+
+_memory_buffer = None
+_redis_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _memory_buffer, _redis_buffer
+    name = getattr(settings, 'EVENT_BUFFER_BACKEND', 'sync')
+    if name == 'sync':
+        return SyncEventBuffer()
+
+    with _buffer_lock:
+        if name == 'redis':
+            # A conexão é reaproveitada entre requests; só é testada na primeira vez
+            if _redis_buffer is None:
+                try:
+                    backend = RedisEventBuffer()
+                    backend.client.ping()
+                except Exception as e:
+                    logger.warning(f"Redis indisponível para a fila de eventos, gravando na hora: {e}")
+                    return SyncEventBuffer()
+                _redis_buffer = backend
+            return _redis_buffer
+
+        if _memory_buffer is None:
+            if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+                logger.warning(
+                    "EVENT_BUFFER_BACKEND='memory' com LocMemCache: o overlay não é "
+                    "compartilhado entre workers (use um cache compartilhado ou 'sync')"
+                )
+            _memory_buffer = MemoryEventBuffer()
+        return _memory_buffer
+
+
+def record(kind, user_id, target_id, active=True):
+    """Registra um evento; retorna True se ele ficou pendente (não foi gravado ainda)"""
+    buffer = get_buffer()
+    if buffer.buffered:
+        _set_overlay(kind, user_id, target_id, active)
+    buffer.add([(kind, user_id, target_id, active)])
+    return buffer.buffered
+
+
+def toggle_like(user, post):
+    """
+    Alterna o like de ``user`` em ``post``.
+
+    Retorna ``(curtiu, likes_count)``; o contador já inclui o clique mesmo que
+    o evento ainda esteja na fila.
+    """
+    liked_in_db = Like.objects.filter(user=user, post=post).exists()
+    liked_now = pending(user.id, 'like').get(post.id, liked_in_db)
+
+    liked = not liked_now
+    record('like', user.id, post.id, liked)
+    return liked, max(post.likes_count + int(liked) - int(liked_in_db), 0)
@@ -0,0 +1,72 @@
+"""
+Grafo de seguidores.
+
+Quem cada usuário segue fica cacheado como um frozenset de ids, com chave
+versionada por usuário (core.cache_versions): seguir ou deixar de seguir
+invalida só o conjunto de quem seguiu. O feed, a bandeja de stories e a API
+leem daqui em vez de montar uma subquery em Follow a cada request.
+
+Os totais de seguidores/seguidos ficam em ``CustomUser.followers_count`` e
+``following_count``, ajustados com F() pelos signals de Follow e corrigidos
+por ``reconcile_counters``.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .cache_versions import bump_version, versioned_key
+from .models import Follow
+
+User = get_user_model()
+
+
+def scope(user_id):
+    return f'following:{user_id}'
+
+
+def following_ids(user_id):
+    """Ids de quem ``user_id`` segue"""
+    key = versioned_key('follow_graph', [scope(user_id)], user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True))
+        cache.set(key, ids, getattr(settings, 'FOLLOW_GRAPH_CACHE_TIMEOUT', 3600))
+    return ids
+
+
+def is_following(follower_id, followee_id):
+    return followee_id in following_ids(follower_id)
+
+
+def invalidate(user_id):
+    bump_version(scope(user_id))
+
+
+def adjust_counts(follower_id, followee_id, delta):
+    """Soma ``delta`` em following_count do seguidor e followers_count do seguido"""
+    User.objects.filter(pk=follower_id).update(following_count=Greatest(F('following_count') + delta, 0))
+    User.objects.filter(pk=followee_id).update(followers_count=Greatest(F('followers_count') + delta, 0))
+
+
+def toggle_follow(follower, followee):
+    """
+    Segue ou deixa de seguir ``followee``.
+
+    Retorna True se ``follower`` passou a seguir. Contadores e cache são
+    atualizados pelos signals de Follow; ``followee.followers_count`` é
+    recarregado.
+    """
+    deleted, _ = Follow.objects.filter(follower=follower, following=followee).delete()
+    following = not deleted
+    if following:
+        try:
+            with transaction.atomic():
+                Follow.objects.create(follower=follower, following=followee)
+        except IntegrityError:
+            # Outro request criou o mesmo Follow ao mesmo tempo
+            pass
+    followee.refresh_from_db(fields=['followers_count'])
+    return following
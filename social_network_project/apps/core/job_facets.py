@@ -0,0 +1,143 @@
+"""
+Facetas da navegação de vagas (vagas_list e /api/v1/jobs/facets/).
+
+As contagens de vagas ativas por categoria, tipo, nível e local saem de uma
+única agregação agrupada pelas quatro colunas, somada por faceta em Python,
+e ficam no cache com a versão do escopo ``jobs`` (core.render_cache), que é
+incrementada quando uma vaga é criada, salva (close/pause/activate
+incluídos) ou apagada, ou quando uma categoria muda.
+
+A faceta de categoria também resolve ``slug -> id``, para a lista filtrar
+por ``category_id`` sem join com JobCategory. Locais são agrupados sem
+diferenciar maiúsculas nem espaços nas pontas (``location_key``); as
+facetas guardam as grafias exatas de cada chave, e ``filter_location``
+filtra por elas (``location__in``), então cada opção devolve exatamente as
+vagas que contou.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.http import urlencode
+
+from .cache_versions import versioned_key
+from .models import JobCategory, JobListing
+from .render_cache import JOBS_SCOPE
+
+# Parâmetro da URL de cada faceta
+FACETS = ('category', 'job_type', 'experience_level', 'location')
+
+# Locais exibidos (os com mais vagas)
+LOCATION_FACET_SIZE = 20
+
+
+def location_key(location):
+    return (location or '').strip().lower()
+
+
+def filter_location(queryset, location, result=None):
+    """Vagas do local ``location`` (qualquer grafia com a mesma chave)"""
+    values = (result or facets())['location_values'].get(location_key(location))
+    return queryset.filter(location__in=values) if values else queryset.none()
+
+
+def _build():
+    rows = JobListing.objects.filter(status='active').values(
+        'category_id', 'job_type', 'experience_level', 'location'
+    ).annotate(total=Count('id')).order_by()
+
+    counts = {facet: Counter() for facet in FACETS}
+    # Grafias de cada local (com os espaços originais, para o filtro exato)
+    spellings = {}
+    total = 0
+    for row in rows:
+        total += row['total']
+        counts['category'][row['category_id']] += row['total']
+        counts['job_type'][row['job_type']] += row['total']
+        counts['experience_level'][row['experience_level']] += row['total']
+        counts['location'][location_key(row['location'])] += row['total']
+        spellings.setdefault(location_key(row['location']), Counter())[row['location']] += row['total']
+
+    return {
+        'total': total,
+        'category': [
+            {
+                'id': category.id,
+                'value': category.slug,
+                'label': category.name,
+                'icon': category.icon,
+                'count': counts['category'][category.id],
+            }
+            for category in JobCategory.objects.all()
+        ],
+        'job_type': [
+            {'value': value, 'label': label, 'count': counts['job_type'][value]}
+            for value, label in JobListing.JOB_TYPES
+        ],
+        'experience_level': [
+            {'value': value, 'label': label, 'count': counts['experience_level'][value]}
+            for value, label in JobListing.EXPERIENCE_LEVELS
+        ],
+        'location': [
+            {'value': location, 'label': spellings[location].most_common(1)[0][0].strip(), 'count': count}
+            for location, count in sorted(
+                counts['location'].items(), key=lambda item: (-item[1], item[0])
+            )[:LOCATION_FACET_SIZE]
+            if location
+        ],
+        'location_values': {location: sorted(values) for location, values in spellings.items()},
+    }
+
+
+def facets():
+    """Contagens de vagas ativas por faceta (do cache enquanto nenhuma vaga mudar)"""
+    key = versioned_key('job_facets', [JOBS_SCOPE])
+    result = cache.get(key)
+    if result is None:
+        result = _build()
+        cache.set(key, result, getattr(settings, 'JOB_FACETS_CACHE_TIMEOUT', 600))
+    return result
+
+
+def category_id(slug, result=None):
+    """Id da categoria ``slug`` pelas facetas, ou None se não existir"""
+    for option in (result or facets())['category']:
+        if option['value'] == slug:
+            return option['id']
+    return None
+
+
+def _current_filters(params):
+    current = {facet: params.get(facet) or '' for facet in FACETS}
+    current['location'] = location_key(current['location'])
+    for name in ('q', 'tag'):
+        if params.get(name):
+            current[name] = params[name]
+    return current
+
+
+def filter_querystring(params):
+    """Filtros ativos de ``params`` como query string (para a paginação)"""
+    return urlencode({name: value for name, value in _current_filters(params).items() if value})
+
+
+def with_selection(result, params):
+    """
+    Copia das facetas com ``selected`` e ``querystring`` (a URL que liga ou
+    desliga a opção mantendo os outros filtros) em cada opção.
+    """
+    current = _current_filters(params)
+    linked = {'total': result['total']}
+    for facet in FACETS:
+        options = []
+        for option in result[facet]:
+            selected = current[facet] == option['value']
+            query = dict(current, **{facet: '' if selected else option['value']})
+            options.append(dict(
+                option,
+                selected=selected,
+                querystring=urlencode({name: value for name, value in query.items() if value}),
+            ))
+        linked[facet] = options
+    return linked
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from apps.core import suggestions
+
+class Command(BaseCommand):
+    help = 'Recalcula as sugestões de quem seguir (só usuários marcados, ou todos com --all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recalcula para todos os usuários ativos')
+        parser.add_argument('--batch-size', type=int, default=None, help='Usuários por lote (padrão: SUGGESTIONS_BATCH_SIZE)')
+        parser.add_argument('--engine', choices=['auto', 'sparse', 'python'], default='auto',
+                            help="'sparse' precisa de scipy; 'auto' usa scipy se estiver instalado")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            user_count = suggestions.refresh(batch_size=options['batch_size'], engine=options['engine'])
+        else:
+            user_count = suggestions.refresh_stale(batch_size=options['batch_size'], engine=options['engine'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Sugestões recalculadas para {user_count} usuários"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.core import render_cache
+
+class Command(BaseCommand):
+    help = 'Mostra acertos, falhas e taxa de acerto do cache de cada fragmento de template'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zera os contadores depois de mostrar')
+
+    def handle(self, *args, **options):
+        stats = render_cache.fragment_stats()
+        if not stats:
+            self.stdout.write(self.style.WARNING("⚠️  Nenhum fragmento renderizado desde o último reset"))
+        for name, counts in stats.items():
+            self.stdout.write(
+                f"{name}: {counts['hits']} acertos, {counts['misses']} falhas ({counts['hit_rate']:.1%})"
+            )
+
+        if options['reset']:
+            render_cache.reset_fragment_stats()
+            self.stdout.write(self.style.SUCCESS("✅ Contadores zerados"))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from apps.core.models import JobListing, JobApplication, JobCategory
+from apps.core import application_stats
 from django.core.mail import send_mail
 from django.conf import settings
 import sys
@@ -201,14 +202,13 @@ Equipe InstaLab
 
     def show_statistics(self, user):
         """Mostra estatísticas da empresa"""
-        company_jobs = JobListing.objects.filter(company=user)
-        all_applications = JobApplication.objects.filter(job__in=company_jobs)
+        stats = application_stats.for_company(user)
         
-        total_jobs = company_jobs.count()
-        total_applications = all_applications.count()
-        pending_apps = all_applications.filter(status='applied').count()
-        accepted_apps = all_applications.filter(status='accepted').count()
-        rejected_apps = all_applications.filter(status='rejected').count()
+        total_jobs = stats['jobs']
+        total_applications = stats['total']
+        pending_apps = stats['open']
+        accepted_apps = stats['by_status']['approved']
+        rejected_apps = stats['by_status']['rejected']
         
         self.stdout.write(f'\n📊 Estatísticas de {user.company_name or user.username}')
         self.stdout.write('-' * 50)
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.core import events
+
+class Command(BaseCommand):
+    help = 'Aplica os eventos de like e visualização da fila do Redis (EVENT_BUFFER_BACKEND = redis)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Eventos por lote (padrão: EVENT_BATCH_SIZE)')
+        parser.add_argument('--sleep-ms', type=int, default=200, help='Espera quando a fila está vazia')
+        parser.add_argument('--once', action='store_true', help='Esvazia a fila uma vez e termina')
+
+    def handle(self, *args, **options):
+        buffer = events.get_buffer()
+        if not isinstance(buffer, events.RedisEventBuffer):
+            applied_count = buffer.flush()
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  EVENT_BUFFER_BACKEND não é 'redis'; {applied_count} eventos deste processo aplicados"
+            ))
+            return
+
+        applied_count = 0
+        while True:
+            applied = buffer.flush(options['batch_size'])
+            applied_count += applied
+            if not applied:
+                if options['once']:
+                    break
+                time.sleep(options['sleep_ms'] / 1000)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {applied_count} eventos aplicados"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.core import search
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice full-text das vagas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Vagas por lote')
+
+    def handle(self, *args, **options):
+        indexed_count = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {indexed_count} vagas indexadas ({search.get_backend().__class__.__name__})")
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.core import tags
+
+class Command(BaseCommand):
+    help = 'Reconstrói as tags normalizadas e os contadores por tag a partir dos campos de texto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Itens por lote')
+        parser.add_argument('--counts-only', action='store_true', help='Apenas recalcula os contadores')
+
+    def handle(self, *args, **options):
+        if options['counts_only']:
+            tags.recount()
+            self.stdout.write(self.style.SUCCESS("✅ Contadores das tags recalculados"))
+            return
+
+        processed_count = tags.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {processed_count} itens processados, {tags.Tag.objects.count()} tags")
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from apps.core import timeline
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Reconstrói as timelines materializadas do feed a partir de Follow e Post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Username de um usuário específico')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+
+        rebuilt_count = 0
+        for user in users.iterator():
+            timeline.rebuild(user)
+            rebuilt_count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {rebuilt_count} timelines reconstruídas!")
+        )
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from apps.core.models import Post
+from apps.messaging.models import StudentPost, StudyGroup
+
+# Contador desnormalizado -> relação reversa que ele resume
+COUNTERS = {
+    'likes_count': 'likes',
+    'comments_count': 'comments',
+}
+
+FOLLOW_COUNTERS = {
+    'followers_count': 'followers',
+    'following_count': 'following',
+}
+
+GROUP_COUNTERS = {
+    'members_count': 'members',
+}
+
+class Command(BaseCommand):
+    help = 'Corrige divergências nos contadores de curtidas, comentários, seguidores e membros de grupos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts por lote')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas mostra o que seria corrigido')
+
+    def handle(self, *args, **options):
+        targets = [(Post, COUNTERS), (StudentPost, COUNTERS), (get_user_model(), FOLLOW_COUNTERS),
+                   (StudyGroup, GROUP_COUNTERS)]
+        for model, counters in targets:
+            fixed_count = self.reconcile(model, counters, options['batch_size'], options['dry_run'])
+            label = model._meta.verbose_name_plural
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f"⚠️  {fixed_count} {label} com contadores divergentes"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✅ {fixed_count} {label} corrigidos"))
+
+    def real_count(self, model, relation):
+        """Subquery com a contagem real de uma relação reversa (ou de um ManyToManyField)"""
+        field = model._meta.get_field(relation)
+        if field.many_to_many and not field.auto_created:
+            source = field.m2m_field_name()
+            related = field.remote_field.through.objects.filter(
+                **{source: OuterRef('pk')}
+            ).order_by().values(source).annotate(total=Count('pk')).values('total')
+            return Coalesce(Subquery(related), Value(0))
+        related = field.related_model.objects.filter(
+            **{field.field.name: OuterRef('pk')}
+        ).order_by().values(field.field.name).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(related), Value(0))
+
+    def reconcile(self, model, counters, batch_size, dry_run):
+        annotations = {
+            f'real_{counter}': self.real_count(model, relation)
+            for counter, relation in counters.items()
+        }
+
+        fixed_count = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                    'pk', *counters
+                ).annotate(**annotations)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            drifted = []
+            for obj in batch:
+                changed = False
+                for counter in counters:
+                    real = getattr(obj, f'real_{counter}')
+                    if getattr(obj, counter) != real:
+                        setattr(obj, counter, real)
+                        changed = True
+                if changed:
+                    drifted.append(obj)
+
+            if drifted and not dry_run:
+                model.objects.bulk_update(drifted, list(counters))
+            fixed_count += len(drifted)
+
+        return fixed_count
@@ -0,0 +1,146 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_story_alter_jobcategory_options_alter_post_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='applied_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('reviewing', 'Em análise'), ('interview', 'Entrevista'), ('approved', 'Aprovado'), ('rejected', 'Rejeitado')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='joblisting',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='joblisting',
+            name='job_type',
+            field=models.CharField(choices=[('internship', 'Estágio'), ('part_time', 'Meio período'), ('full_time', 'Tempo integral'), ('contract', 'Contrato'), ('freelance', 'Freelance')], db_index=True, default='full_time', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='joblisting',
+            name='location',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='joblisting',
+            name='status',
+            field=models.CharField(choices=[('active', 'Ativo'), ('paused', 'Pausado'), ('closed', 'Fechado')], db_index=True, default='active', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='joblisting',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='post_type',
+            field=models.CharField(choices=[('photo', 'Foto'), ('video', 'Vídeo'), ('text', 'Texto'), ('job', 'Vaga'), ('project', 'Projeto')], db_index=True, default='photo', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at'], name='core_commen_post_id_0d7c44_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['job', 'status'], name='core_jobapp_job_id_19463c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['applicant', '-applied_at'], name='core_jobapp_applica_dd22b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='joblisting',
+            index=models.Index(fields=['status', '-created_at'], name='core_joblis_status_29c3c8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='joblisting',
+            index=models.Index(fields=['company', 'status'], name='core_joblis_company_0bfd54_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='joblisting',
+            index=models.Index(fields=['category', 'status', '-created_at'], name='core_joblis_categor_050fe3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', '-created_at'], name='core_like_post_id_bd3e25_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', 'is_active'], name='core_post_created_4c04a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at'], name='core_post_author__dc61ce_idx'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='core.post'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-created_at', '-post'], name='core_timeli_user_id_e2499e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='core_timeli_user_id_cb23d5_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('user', 'post')},
+        ),
+    ]
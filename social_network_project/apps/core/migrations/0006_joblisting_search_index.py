@@ -0,0 +1,51 @@
+from django.db import migrations
+
+FTS_TABLE = 'core_joblisting_fts'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE core_joblisting ADD COLUMN search_document tsvector')
+        schema_editor.execute(
+            'CREATE INDEX core_joblisting_search_gin ON core_joblisting USING GIN (search_document)'
+        )
+        schema_editor.execute(
+            "UPDATE core_joblisting j SET search_document = "
+            "setweight(to_tsvector('portuguese', coalesce(j.title, '')), 'A') || "
+            "setweight(to_tsvector('portuguese', coalesce(j.tags, '')), 'B') || "
+            "setweight(to_tsvector('portuguese', coalesce(u.company_name, '')), 'C') || "
+            "setweight(to_tsvector('portuguese', coalesce(j.description, '')), 'D') "
+            "FROM accounts_customuser u WHERE u.id = j.company_id"
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            f"title, tags, company, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, tags, company, description) '
+            f"SELECT j.id, j.title, j.tags, coalesce(u.company_name, ''), j.description "
+            f'FROM core_joblisting j JOIN accounts_customuser u ON u.id = j.company_id'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS core_joblisting_search_gin')
+        schema_editor.execute('ALTER TABLE core_joblisting DROP COLUMN IF EXISTS search_document')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_customuser_avatar_customuser_bio'),
+        ('core', '0005_post_comments_count_post_likes_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_joblisting_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.CharField(max_length=100, unique=True)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('jobs_count', models.PositiveIntegerField(default=0)),
+                ('student_posts_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['slug'],
+                'indexes': [models.Index(fields=['-posts_count'], name='core_tag_posts_c_97826b_idx'), models.Index(fields=['-jobs_count'], name='core_tag_jobs_co_2555a6_idx'), models.Index(fields=['-student_posts_count'], name='core_tag_student_7da76c_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='joblisting',
+            name='normalized_tags',
+            field=models.ManyToManyField(blank=True, related_name='jobs', to='core.tag'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='normalized_tags',
+            field=models.ManyToManyField(blank=True, related_name='posts', to='core.tag'),
+        ),
+    ]
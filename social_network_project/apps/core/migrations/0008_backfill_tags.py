@@ -0,0 +1,75 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:14
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# (app, model, campo de texto, contador em Tag)
+TAG_SOURCES = [
+    ('core', 'Post', 'hashtags', 'posts_count'),
+    ('core', 'JobListing', 'tags', 'jobs_count'),
+    ('messaging', 'StudentPost', 'tags', 'student_posts_count'),
+]
+
+
+def parse_tags(text):
+    tags = {}
+    for raw in (text or '').split(','):
+        slug = ' '.join(raw.strip().lstrip('#').split()).lower()[:100]
+        if slug and slug not in tags:
+            tags[slug] = raw.strip().lstrip('#').strip()[:100]
+    return tags
+
+
+def backfill_tags(apps, schema_editor):
+    Tag = apps.get_model('core', 'Tag')
+
+    counters = {}
+    for app_label, model_name, text_field, counter in TAG_SOURCES:
+        model = apps.get_model(app_label, model_name)
+        through = model.normalized_tags.through
+        source_column = model._meta.model_name + '_id'
+
+        parsed = {
+            pk: parse_tags(text)
+            for pk, text in model.objects.exclude(**{text_field: ''}).values_list('pk', text_field)
+        }
+        names_by_slug = {}
+        for tags in parsed.values():
+            for slug, name in tags.items():
+                names_by_slug.setdefault(slug, name)
+
+        Tag.objects.bulk_create(
+            [Tag(slug=slug, name=name) for slug, name in names_by_slug.items()],
+            ignore_conflicts=True,
+            batch_size=500
+        )
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        through.objects.bulk_create(
+            [
+                through(**{source_column: pk, 'tag_id': tag_ids[slug]})
+                for pk, tags in parsed.items() for slug in tags
+            ],
+            ignore_conflicts=True,
+            batch_size=1000
+        )
+
+        counters[counter] = Coalesce(Subquery(
+            through.objects.filter(tag_id=OuterRef('pk')).order_by().values('tag_id').annotate(
+                total=Count('pk')
+            ).values('total')
+        ), Value(0))
+
+    Tag.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tag_joblisting_normalized_tags_post_normalized_tags'),
+        ('messaging', '0005_studentpost_normalized_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
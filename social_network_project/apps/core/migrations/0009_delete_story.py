@@ -0,0 +1,32 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_backfill_tags'),
+        ('messaging', '0012_merge_core_stories'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='storyview',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='storyview',
+            name='story',
+        ),
+        migrations.RemoveField(
+            model_name='storyview',
+            name='user',
+        ),
+        migrations.DeleteModel(
+            name='Story',
+        ),
+        migrations.DeleteModel(
+            name='StoryView',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-18 11:02
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counts(apps, schema_editor):
+    User = apps.get_model('accounts', 'CustomUser')
+    Follow = apps.get_model('core', 'Follow')
+
+    def total(field):
+        return Coalesce(Subquery(
+            Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ), Value(0))
+
+    User.objects.update(followers_count=total('following'), following_count=total('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customuser_followers_count_and_more'),
+        ('core', '0009_delete_story'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
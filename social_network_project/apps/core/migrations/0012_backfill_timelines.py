@@ -0,0 +1,63 @@
+# Generated by Django 4.2.9 on 2026-10-18 14:20
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    Preenche as timelines dos usuários que já existiam antes da 0004, como
+    ``rebuild_timelines``: os posts recentes do próprio usuário e de quem ele
+    segue (menos as empresas no modo de leitura, puxadas ao ler o feed).
+    """
+    User = apps.get_model('accounts', 'CustomUser')
+    Follow = apps.get_model('core', 'Follow')
+    Post = apps.get_model('core', 'Post')
+    TimelineEntry = apps.get_model('core', 'TimelineEntry')
+
+    backfill_size = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 50)
+    pull_author_ids = set(User.objects.filter(
+        user_type='company',
+        followers_count__gte=getattr(settings, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 5000)
+    ).values_list('id', flat=True))
+
+    # Os ``backfill_size`` posts ativos mais recentes de cada autor
+    recent_posts = defaultdict(list)
+    posts = Post.objects.filter(is_active=True).order_by('author_id', '-created_at', '-id').values_list(
+        'id', 'author_id', 'created_at'
+    )
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        if len(recent_posts[post[1]]) < backfill_size:
+            recent_posts[post[1]].append(post)
+
+    batch = []
+
+    def add(user_id, author_id):
+        for post_id, _, created_at in recent_posts.get(author_id, ()):
+            batch.append(TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id, created_at=created_at))
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch.clear()
+
+    for author_id in list(recent_posts):
+        add(author_id, author_id)
+    follows = Follow.objects.exclude(following_id__in=pull_author_ids).values_list('follower_id', 'following_id')
+    for follower_id, following_id in follows.iterator(chunk_size=BATCH_SIZE):
+        add(follower_id, following_id)
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customuser_followers_count_and_more'),
+        ('core', '0011_followsuggestion_suggestionrefresh'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
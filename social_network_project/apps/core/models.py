@@ -1,10 +1,66 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
-from django.utils import timezone
-from datetime import timedelta
+
+from . import render_cache
 
 User = get_user_model()
 
+
+def adjust_counters(instance, refresh=True, **deltas):
+    """
+    Aplica incrementos atômicos (F()) nos contadores desnormalizados de uma instância.
+    
+    Ex: adjust_counters(post, likes_count=1). Os valores nunca ficam negativos;
+    com ``refresh`` os campos alterados são recarregados na instância.
+    """
+    updates = {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items() if delta
+    }
+    if not updates:
+        return
+    type(instance).objects.filter(pk=instance.pk).update(**updates)
+    render_cache.bump_instance(instance)
+    if refresh:
+        instance.refresh_from_db(fields=list(updates))
+
+
+def normalize_tag(name):
+    """Forma canônica de uma tag: sem '#', minúscula e com espaços simples"""
+    return ' '.join(name.strip().lstrip('#').split()).lower()
+
+
+class Tag(models.Model):
+    """
+    Tag normalizada compartilhada por Post, JobListing e StudentPost.
+    
+    Os campos de texto (hashtags/tags) continuam sendo a entrada do usuário;
+    as tabelas de ligação são sincronizadas por core.tags. Os contadores por
+    tipo de conteúdo alimentam as listas de tags em alta.
+    """
+    name = models.CharField(max_length=100)
+    slug = models.CharField(max_length=100, unique=True)
+    
+    posts_count = models.PositiveIntegerField(default=0)
+    jobs_count = models.PositiveIntegerField(default=0)
+    student_posts_count = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['slug']
+        indexes = [
+            models.Index(fields=['-posts_count']),
+            models.Index(fields=['-jobs_count']),
+            models.Index(fields=['-student_posts_count']),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+
 class Post(models.Model):
     """Model para posts do feed estilo Instagram"""
     POST_TYPES = [
@@ -31,6 +87,11 @@ class Post(models.Model):
     
     # Tags
     hashtags = models.TextField(blank=True, help_text="Hashtags separadas por vírgula")
+    normalized_tags = models.ManyToManyField(Tag, related_name='posts', blank=True)
+    
+    # Contadores desnormalizados (ver adjust_counters e reconcile_counters)
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-created_at']
@@ -54,23 +115,21 @@ class Post(models.Model):
         if self.post_type == 'video' and not self.video:
             raise ValidationError('Posts de tipo "Vídeo" devem ter um vídeo.')
     
-    @property
-    def likes_count(self):
-        return self.likes.count()
-    
-    @property
-    def comments_count(self):
-        return self.comments.count()
-    
     def get_hashtags_list(self):
-        if self.hashtags:
-            return [tag.strip() for tag in self.hashtags.split(',') if tag.strip()]
-        return []
+        # Use prefetch_related('normalized_tags') em listas
+        return [tag.name for tag in self.normalized_tags.all()]
     
     def toggle_active(self):
         """Toggle the active status of the post"""
+        from .timeline import fanout_post, remove_post
+        
         self.is_active = not self.is_active
         self.save(update_fields=['is_active'])
+        
+        if self.is_active:
+            fanout_post(self)
+        else:
+            remove_post(self)
 
 
 class Like(models.Model):
@@ -129,52 +188,57 @@ class Follow(models.Model):
         return f"{self.follower.username} follows {self.following.username}"
 
 
-class Story(models.Model):
-    """Model para Stories estilo Instagram"""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_stories')
-    image = models.ImageField(upload_to='stories/', blank=True, null=True)
-    video = models.FileField(upload_to='stories/videos/', blank=True, null=True)
-    text_content = models.TextField(blank=True)
-    
-    # Configurações
-    background_color = models.CharField(max_length=7, default='#000000')
-    text_color = models.CharField(max_length=7, default='#FFFFFF')
-    
-    created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField()
+class TimelineEntry(models.Model):
+    """Timeline materializada: posts já espalhados para o feed de cada usuário"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
     
-    # Link externo (para empresas)
-    external_link = models.URLField(blank=True, null=True)
-    link_text = models.CharField(max_length=50, blank=True)
+    # Cópia de post.created_at para ordenar a timeline sem join
+    created_at = models.DateTimeField()
     
     class Meta:
-        ordering = ['-created_at']
-        verbose_name_plural = "Stories"
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
     
-    def save(self, *args, **kwargs):
-        if not self.expires_at:
-            self.expires_at = timezone.now() + timedelta(hours=24)
-        super().save(*args, **kwargs)
+    def __str__(self):
+        return f"Post {self.post_id} na timeline de {self.user_id}"
+
+
+class FollowSuggestion(models.Model):
+    """Sugestões de quem seguir (top-K por usuário), calculadas por core.suggestions"""
+    REASONS = [
+        ('mutual', 'Seguido por quem você segue'),
+        ('group', 'Grupo de estudo em comum'),
+        ('course', 'Mesmo curso'),
+        ('university', 'Mesma universidade'),
+    ]
     
-    def is_expired(self):
-        return timezone.now() > self.expires_at
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follow_suggestions')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    reason = models.CharField(max_length=20, choices=REASONS)
+    mutual_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
     
-    @property
-    def is_active(self):
-        return not self.is_expired()
+    class Meta:
+        ordering = ['-score']
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
     
     def __str__(self):
-        return f"Story by {self.user.username} - {self.created_at.strftime('%d/%m/%Y %H:%M')}"
+        return f"Sugerir {self.suggested_id} para {self.user_id} ({self.score:.1f})"
 
 
-class StoryView(models.Model):
-    """Model para visualizações de stories"""
-    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='views')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_story_views')
-    viewed_at = models.DateTimeField(auto_now_add=True)
-    
-    class Meta:
-        unique_together = ('story', 'user')
+class SuggestionRefresh(models.Model):
+    """Usuários cujo grafo mudou e que precisam de sugestões novas"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    marked_at = models.DateTimeField(auto_now=True)
 
 
 class JobCategory(models.Model):
@@ -234,6 +298,7 @@ class JobListing(models.Model):
     
     # Metadados
     tags = models.CharField(max_length=500, blank=True, help_text="Tags separadas por vírgula")
+    normalized_tags = models.ManyToManyField(Tag, related_name='jobs', blank=True)
     
     class Meta:
         ordering = ['-created_at']
@@ -259,6 +324,10 @@ class JobListing(models.Model):
     def applications_count(self):
         return self.applications.count()
     
+    def get_tags_list(self):
+        # Use prefetch_related('normalized_tags') em listas
+        return [tag.name for tag in self.normalized_tags.all()]
+    
     @property
     def is_active(self):
         return self.status == 'active'
@@ -0,0 +1,150 @@
+"""
+Paginação por chave (keyset) para feeds e listas ordenadas por data.
+
+Em vez de ``COUNT(*)`` + ``OFFSET``, cada página filtra os itens "depois do
+último já exibido" na mesma ordenação dos índices compostos (por exemplo
+``(-created_at, -id)``). A página N custa o mesmo que a primeira e itens
+novos não deslocam as páginas enquanto o usuário rola o feed.
+
+O cursor exposto para o cliente é opaco: os valores da chave do último item
+serializados em JSON e codificados em base64 urlsafe.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        parsed = parse_datetime(value['dt'])
+        if parsed is None:
+            raise InvalidCursor(value['dt'])
+        return parsed
+    return value
+
+
+def encode_cursor(values):
+    """Codifica a chave de um item (ex: ``(created_at, id)``) em um cursor opaco"""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverso de encode_cursor; levanta InvalidCursor para cursores adulterados"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(token) from e
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return tuple(_decode_value(value) for value in values)
+
+
+def keyset_filter(ordering, values):
+    """
+    Condição "depois de ``values``" para uma ordenação lexicográfica.
+
+    Para ``('-created_at', '-id')`` gera
+    ``created_at < v0 OR (created_at = v0 AND id < v1)``.
+    """
+    condition = Q()
+    equal_prefix = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+        equal_prefix &= Q(**{name: value})
+    return condition
+
+
+class KeysetPage:
+    """Página de resultados com a mesma interface básica de django.core.paginator.Page"""
+
+    def __init__(self, object_list, next_cursor, cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Pagina um queryset pela chave ``ordering`` sem COUNT nem OFFSET.
+
+    A ordenação deve terminar em um campo único (normalmente ``id``) e
+    coincidir com um índice para que cada página seja uma busca no índice.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+
+    def _key(self, obj):
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(obj, dict):
+            return [obj[name] for name in names]
+        return [getattr(obj, name) for name in names]
+
+    def page(self, cursor=None):
+        """Busca a página após ``cursor``; levanta InvalidCursor se ele for inválido"""
+        queryset = self.queryset
+        try:
+            if cursor:
+                values = decode_cursor(cursor)
+                if len(values) != len(self.ordering):
+                    raise InvalidCursor(cursor)
+                queryset = queryset.filter(keyset_filter(self.ordering, values))
+
+            # Um item a mais indica se existe próxima página, sem COUNT
+            object_list = list(queryset[:self.per_page + 1])
+        except (TypeError, ValidationError) as e:
+            # Cursor de outra ordenação (ex: busca por relevância x por data)
+            raise InvalidCursor(cursor) from e
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = encode_cursor(self._key(object_list[-1]))
+        return KeysetPage(object_list, next_cursor, cursor or None)
+
+    def get_page(self, cursor=None):
+        """Como page(), mas volta para a primeira página se o cursor for inválido"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
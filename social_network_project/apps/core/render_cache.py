@@ -0,0 +1,141 @@
+"""
+Cache de HTML renderizado: fragmentos e páginas anônimas.
+
+Cada entidade exibida em um card (``post:<id>``, ``job:<id>``,
+``user:<id>``) é um escopo de core.cache_versions, incrementado quando a
+entidade muda: signals de save/delete, ``adjust_counters`` e o lote de likes
+de core.events. O fragmento é cacheado com as versões dos escopos de que
+depende, então um card só é renderizado de novo quando algo dele mudou.
+
+Nos templates::
+
+    {% load render_cache %}
+    {% cachefragment 'post_card' post=post.id user=post.author_id liked=post.user_liked %}
+        ...
+    {% endcachefragment %}
+
+Argumentos com nome de entidade viram escopos; ``scopes=`` recebe uma lista
+de escopos prontos; ``timeout=`` troca FRAGMENT_CACHE_TIMEOUT; os demais só
+diferenciam a chave (ex: o coração preenchido para quem curtiu).
+
+Acertos e falhas são contados por fragmento (``fragment_stats``, comando
+``fragment_stats``).
+
+``cache_anonymous_page`` cacheia a página inteira para visitantes não
+logados, com as versões de ``scopes`` no prefixo da chave (ex: ``jobs`` é
+incrementado a cada vaga salva ou apagada).
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.cache import cache_page
+
+from .cache_versions import bump_version, get_versions, versioned_key
+
+# Entidades que os fragmentos podem declarar como dependência
+ENTITIES = ('post', 'job', 'user')
+
+# Modelo (label_lower) -> entidade, para bump_instance
+MODEL_ENTITIES = {
+    'core.post': 'post',
+    'core.joblisting': 'job',
+    'accounts.customuser': 'user',
+}
+
+# Escopo de qualquer mudança nas vagas (cache da lista pública)
+JOBS_SCOPE = 'jobs'
+
+
+def entity_scope(entity, pk):
+    return f'{entity}:{pk}'
+
+
+def bump(entity, *pks):
+    """Invalida os fragmentos que dependem das entidades ``pks``"""
+    bump_version(*[entity_scope(entity, pk) for pk in pks])
+
+
+def bump_instance(instance):
+    entity = MODEL_ENTITIES.get(instance._meta.label_lower)
+    if entity:
+        bump(entity, instance.pk)
+
+
+# ---- Fragmentos ----
+
+STATS_NAMES_KEY = 'fragment_stats:names'
+
+
+def _stats_key(name, outcome):
+    return f'fragment_stats:{name}:{outcome}'
+
+
+def _count(name, outcome):
+    if not getattr(settings, 'FRAGMENT_CACHE_STATS', True):
+        return
+    key = _stats_key(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Primeiro acerto/falha do fragmento desde o reset: registra o nome
+        cache.set(key, 1, None)
+        cache.set(STATS_NAMES_KEY, (cache.get(STATS_NAMES_KEY) or set()) | {name}, None)
+
+
+def fragment(name, scopes, vary, render, timeout=None):
+    """HTML do fragmento ``name`` do cache, ou ``render()`` gravado no cache"""
+    # As versões dos escopos não identificam a entidade (dois posts podem ter
+    # a mesma versão), então os nomes dos escopos também entram na chave
+    digest = hashlib.md5('|'.join(str(value) for value in [*scopes, *vary]).encode()).hexdigest()
+    key = versioned_key(f'fragment:{name}', scopes, digest) if scopes else f'fragment:{name}:{digest}'
+
+    html = cache.get(key)
+    if html is not None:
+        _count(name, 'hits')
+        return html
+
+    _count(name, 'misses')
+    html = render()
+    cache.set(key, html, timeout or getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 300))
+    return html
+
+
+def fragment_stats():
+    """``{fragmento: {'hits', 'misses', 'hit_rate'}}`` desde o último reset"""
+    names = sorted(cache.get(STATS_NAMES_KEY) or ())
+    counts = cache.get_many([_stats_key(name, outcome) for name in names for outcome in ('hits', 'misses')])
+    stats = {}
+    for name in names:
+        hits = counts.get(_stats_key(name, 'hits'), 0)
+        misses = counts.get(_stats_key(name, 'misses'), 0)
+        total = hits + misses
+        stats[name] = {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+    return stats
+
+
+def reset_fragment_stats():
+    names = cache.get(STATS_NAMES_KEY) or ()
+    cache.delete_many([_stats_key(name, outcome) for name in names for outcome in ('hits', 'misses')])
+    cache.delete(STATS_NAMES_KEY)
+
+
+# ---- Páginas ----
+
+def cache_anonymous_page(timeout, *scopes):
+    """
+    Cacheia a página para visitantes não logados (GET/HEAD); usuários
+    logados sempre recebem a view renderizada na hora.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.user.is_authenticated or request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = '.'.join(str(version) for version in get_versions(*scopes))
+            return cache_page(timeout, key_prefix=f'page:{view.__name__}:{versions}')(view)(
+                request, *args, **kwargs
+            )
+        return wrapped
+    return decorator
@@ -0,0 +1,185 @@
+"""
+Busca full-text das vagas.
+
+O documento de busca de cada vaga é ponderado: título > tags > empresa >
+descrição. A mesma API (index_jobs, remove_jobs, rebuild_index e
+search_jobs) é atendida por um backend escolhido pelo banco em uso:
+
+- PostgreSQL: coluna ``search_document`` (tsvector com o dicionário
+  'portuguese', com stemming) indexada com GIN e ordenada por ``ts_rank``.
+- SQLite: tabela virtual FTS5 ``core_joblisting_fts`` ordenada por ``bm25``
+  com os mesmos pesos. O FTS5 não tem stemmer de português, então os
+  termos da busca passam por um radical simples e viram busca por prefixo.
+- Outros bancos: ``icontains`` nos mesmos campos, como antes.
+
+A coluna/tabela é criada pela migração 0006 e mantida pelos sinais em
+core.signals; ``rebuild_search_index`` reconstrói tudo em lotes.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import JobListing
+
+# Pesos de title, tags, company e description, nessa ordem
+FTS_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+FTS_TABLE = 'core_joblisting_fts'
+PG_CONFIG = 'portuguese'
+
+# Sufixos removidos dos termos da busca no SQLite (plural, -ção, -mente...)
+PT_SUFFIXES = ('mente', 'ções', 'ção', 'ões', 'ão', 'es', 's')
+
+
+def _job_table():
+    return JobListing._meta.db_table
+
+
+class PostgresJobSearch:
+    """tsvector ponderado + índice GIN"""
+
+    document = (
+        "setweight(to_tsvector('{config}', coalesce(j.title, '')), 'A') || "
+        "setweight(to_tsvector('{config}', coalesce(j.tags, '')), 'B') || "
+        "setweight(to_tsvector('{config}', coalesce(u.company_name, '')), 'C') || "
+        "setweight(to_tsvector('{config}', coalesce(j.description, '')), 'D')"
+    ).format(config=PG_CONFIG)
+
+    def index_jobs(self, job_ids):
+        user_table = JobListing._meta.get_field('company').related_model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {_job_table()} j SET search_document = {self.document} "
+                f"FROM {user_table} u WHERE u.id = j.company_id AND j.id = ANY(%s)",
+                [list(job_ids)]
+            )
+
+    def remove_jobs(self, job_ids):
+        # O documento vive na própria linha da vaga
+        pass
+
+    def search(self, queryset, query):
+        tsquery = f"websearch_to_tsquery('{PG_CONFIG}', %s)"
+        document = f'{_job_table()}.search_document'
+        return queryset.filter(
+            RawSQL(f'{document} @@ {tsquery}', [query], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank('{{0.1, 0.3, 0.5, 1.0}}', {document}, {tsquery})",
+                [query],
+                output_field=FloatField()
+            )
+        )
+
+
+class SQLiteJobSearch:
+    """Tabela virtual FTS5 com bm25 ponderado"""
+
+    def index_jobs(self, job_ids):
+        job_ids = list(job_ids)
+        rows = JobListing.objects.filter(id__in=job_ids).values_list(
+            'id', 'title', 'tags', 'company__company_name', 'description'
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(i,) for i in job_ids])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, tags, company, description) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                [(job_id, title, tags, company or '', description) for job_id, title, tags, company, description in rows]
+            )
+
+    def remove_jobs(self, job_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(i,) for i in job_ids])
+
+    @staticmethod
+    def _stem(term):
+        for suffix in PT_SUFFIXES:
+            if term.endswith(suffix) and len(term) - len(suffix) >= 4:
+                return term[:-len(suffix)]
+        return term
+
+    def match_expression(self, query):
+        """Converte o texto livre em termos FTS5 com prefixo, ex: "desenvolvedor"*"""
+        terms = re.findall(r'\w+', query.lower())
+        return ' '.join(f'"{self._stem(term)}"*' for term in terms)
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return queryset.filter(
+            RawSQL(
+                f'{_job_table()}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+                [match],
+                output_field=BooleanField()
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = {_job_table()}.id',
+                [match],
+                output_field=FloatField()
+            )
+        )
+
+
+class IContainsJobSearch:
+    """Sem índice full-text: mantém o comportamento antigo"""
+
+    def index_jobs(self, job_ids):
+        pass
+
+    def remove_jobs(self, job_ids):
+        pass
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(company__company_name__icontains=query) |
+            Q(tags__icontains=query)
+        ).annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+
+
+BACKENDS = {
+    'postgresql': PostgresJobSearch,
+    'sqlite': SQLiteJobSearch,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, IContainsJobSearch)()
+
+
+def index_jobs(job_ids):
+    get_backend().index_jobs(job_ids)
+
+
+def remove_jobs(job_ids):
+    get_backend().remove_jobs(job_ids)
+
+
+def rebuild_index(batch_size=1000):
+    """Reindexa todas as vagas em lotes; retorna quantas foram indexadas"""
+    backend = get_backend()
+    indexed_count = 0
+    last_id = 0
+    while True:
+        job_ids = list(
+            JobListing.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not job_ids:
+            break
+        backend.index_jobs(job_ids)
+        indexed_count += len(job_ids)
+        last_id = job_ids[-1]
+    return indexed_count
+
+
+def search_jobs(queryset, query):
+    """Filtra ``queryset`` pela busca e anota ``search_rank`` (maior = mais relevante)"""
+    return get_backend().search(queryset, query)
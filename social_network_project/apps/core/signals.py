@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .cache_versions import bump_version
+from .models import Follow, JobApplication, JobCategory, JobListing, Post
+from . import application_stats, follow_graph, render_cache, search, suggestions, tags
+
+User = get_user_model()
+
+# Campos que compõem o documento de busca de uma vaga
+SEARCH_FIELDS = {'title', 'tags', 'description', 'company'}
+
+
+@receiver(post_save, sender=JobListing)
+def index_job_listing(sender, instance, update_fields=None, **kwargs):
+    """Mantém o índice full-text em dia (close/pause/activate não alteram o texto)"""
+    if update_fields and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    search.index_jobs([instance.id])
+
+
+@receiver(post_delete, sender=JobListing)
+def unindex_job_listing(sender, instance, **kwargs):
+    search.remove_jobs([instance.id])
+
+
+@receiver(post_save, sender=User)
+def reindex_company_jobs(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """O nome da empresa faz parte do documento de busca das vagas dela"""
+    if created or raw or not instance.is_company():
+        return
+    if update_fields and 'company_name' not in update_fields:
+        return
+    job_ids = list(JobListing.objects.filter(company=instance).values_list('id', flat=True))
+    if job_ids:
+        search.index_jobs(job_ids)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=JobListing)
+def sync_normalized_tags(sender, instance, update_fields=None, **kwargs):
+    """Sincroniza normalized_tags quando o texto das tags pode ter mudado"""
+    text_field, _ = tags.TAG_SOURCES[sender._meta.label_lower]
+    if update_fields and text_field not in update_fields:
+        return
+    tags.sync_tags(instance)
+
+
+@receiver(pre_delete, sender=Post)
+@receiver(pre_delete, sender=JobListing)
+def release_normalized_tags(sender, instance, **kwargs):
+    tags.release_tags(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.adjust_counts(instance.follower_id, instance.following_id, 1)
+        follow_graph.invalidate(instance.follower_id)
+        suggestions.mark_stale([instance.follower_id, instance.following_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follow_graph.adjust_counts(instance.follower_id, instance.following_id, -1)
+    follow_graph.invalidate(instance.follower_id)
+    suggestions.mark_stale([instance.follower_id, instance.following_id])
+
+
+@receiver(post_save, sender=User)
+def mark_new_user_suggestions(sender, instance, created, raw=False, **kwargs):
+    """Usuário novo entra no próximo build_suggestions (curso/universidade já contam)"""
+    if created and not raw:
+        suggestions.mark_stale([instance.id])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=JobListing)
+@receiver(post_delete, sender=JobListing)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_rendered_fragments(sender, instance, **kwargs):
+    """Cards em cache do objeto (e a lista pública de vagas) deixam de valer"""
+    render_cache.bump_instance(instance)
+    if sender is JobListing:
+        bump_version(render_cache.JOBS_SCOPE)
+
+
+@receiver(post_save, sender=JobCategory)
+@receiver(post_delete, sender=JobCategory)
+def invalidate_job_facets(sender, **kwargs):
+    """As facetas de vagas (core.job_facets) guardam nome, slug e ícone das categorias"""
+    bump_version(render_cache.JOBS_SCOPE)
+
+
+@receiver(post_save, sender=JobApplication)
+@receiver(post_delete, sender=JobApplication)
+def invalidate_application_stats(sender, instance, **kwargs):
+    """Nova candidatura, mudança de status ou exclusão mudam as estatísticas da vaga"""
+    application_stats.invalidate(instance.job_id)
@@ -0,0 +1,403 @@
+"""
+Sugestões de quem seguir.
+
+Um job em lote (comando ``build_suggestions``) calcula, para cada usuário,
+as SUGGESTIONS_PER_USER melhores sugestões e grava em FollowSuggestion; o
+feed e a API só leem essas linhas pelo índice ``(user, -score)``.
+
+O score de um candidato ``v`` para o usuário ``u`` soma:
+
+- ``mutual``: caminhos u -> w -> v no grafo de Follow + StudentConnection
+  aceitas (amigos de amigos);
+- ``group``: grupos de estudo ativos em comum;
+- ``course``/``university``: mesmo curso/universidade. Além dos candidatos
+  do grafo, os POPULAR_PER_AFFINITY membros mais seguidos de cada curso e
+  universidade entram como candidatos (ajuda quem ainda não segue ninguém).
+
+Quem o usuário já segue ou com quem já tem conexão aceita não é sugerido.
+
+O cálculo é vetorizado em produtos de matrizes esparsas por lote de
+usuários (``A[lote] @ A``, ``G[lote] @ G.T``), com numpy e scipy (em
+requirements.txt); o motor ``python`` calcula o mesmo score com dicionários,
+usuário por usuário, e só é usado pelo ``auto`` se o scipy faltar (com aviso
+no log).
+
+Os signals marcam em SuggestionRefresh só as pontas das arestas que mudaram;
+sem ``--all`` o comando recalcula esses usuários e quem chega a eles por uma
+aresta (os amigos de amigos dessas pessoas passam pela aresta nova),
+carregando só a vizinhança de dois passos deles.
+"""
+import logging
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Follow, FollowSuggestion, SuggestionRefresh
+from . import follow_graph
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# Peso de cada sinal no score, na ordem de desempate do motivo exibido
+WEIGHTS = {
+    'mutual': 1.0,
+    'group': 2.0,
+    'course': 3.0,
+    'university': 1.0,
+}
+
+# Membros mais seguidos de cada curso/universidade que viram candidatos
+POPULAR_PER_AFFINITY = 50
+
+
+def _per_user():
+    return getattr(settings, 'SUGGESTIONS_PER_USER', 20)
+
+
+def _normalize(text):
+    return ' '.join((text or '').split()).lower()
+
+
+def _chunks(ids, size=5000):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class SocialGraph:
+    """Usuários ativos e arestas do grafo, carregados uma vez por execução"""
+
+    def __init__(self):
+        self.user_ids = []
+        self.affinity = {'course': {}, 'university': {}}
+        self.edges = defaultdict(set)
+        self.groups = defaultdict(set)
+        self.members = defaultdict(set)
+        self.popular = {}
+
+    @classmethod
+    def load(cls, user_ids=None):
+        """
+        Grafo de todos os usuários ativos ou, com ``user_ids``, só o necessário
+        para pontuar esses usuários: as arestas deles e dos vizinhos deles e os
+        membros dos grupos deles (curso/universidade vêm sempre de todos).
+        """
+        graph = cls()
+        followers_count = {}
+        users = User.objects.filter(is_active=True).values_list(
+            'id', 'course', 'university', 'followers_count'
+        ).order_by('id')
+        for user_id, course, university, followers in users.iterator(chunk_size=5000):
+            graph.user_ids.append(user_id)
+            followers_count[user_id] = followers
+            for kind, value in (('course', course), ('university', university)):
+                value = _normalize(value)
+                if value:
+                    graph.affinity[kind][user_id] = value
+        active = set(graph.user_ids)
+
+        if user_ids is None:
+            graph._load_edges(active)
+            graph._load_memberships(active)
+        else:
+            targets = set(user_ids) & active
+            graph._load_edges(active, targets)
+            neighbours = set().union(*(graph.edges.get(user_id, ()) for user_id in targets)) - targets
+            graph._load_edges(active, neighbours)
+            graph._load_memberships(active, targets)
+
+        for kind, values in graph.affinity.items():
+            buckets = defaultdict(list)
+            for user_id, value in values.items():
+                buckets[value].append(user_id)
+            for value, members in buckets.items():
+                members.sort(key=lambda user_id: (-followers_count[user_id], user_id))
+                graph.popular[(kind, value)] = members[:POPULAR_PER_AFFINITY]
+        return graph
+
+    def _load_edges(self, active, sources=None):
+        """Todas as arestas que saem de ``sources`` (de todos os usuários, se None)"""
+        StudentConnection = apps.get_model('messaging', 'StudentConnection')
+        follows = Follow.objects.values_list('follower_id', 'following_id')
+        connections = StudentConnection.objects.filter(status='accepted').values_list(
+            'from_student_id', 'to_student_id'
+        )
+        if sources is None:
+            queries = [(follows, False), (connections, True)]
+        else:
+            queries = []
+            for chunk in _chunks(sources):
+                queries += [
+                    (follows.filter(follower_id__in=chunk), False),
+                    (connections.filter(from_student_id__in=chunk), True),
+                    (connections.filter(to_student_id__in=chunk), True),
+                ]
+
+        for queryset, undirected in queries:
+            for from_id, to_id in queryset.iterator(chunk_size=5000):
+                if from_id in active and to_id in active:
+                    self.edges[from_id].add(to_id)
+                    if undirected:
+                        self.edges[to_id].add(from_id)
+
+    def _load_memberships(self, active, user_ids=None):
+        """Grupos ativos (todos, ou os de ``user_ids``) com todos os seus membros"""
+        Membership = apps.get_model('messaging', 'StudyGroup').members.through
+        memberships = Membership.objects.filter(studygroup__is_active=True)
+        if user_ids is not None:
+            group_ids = set()
+            for chunk in _chunks(user_ids):
+                group_ids.update(memberships.filter(customuser_id__in=chunk).values_list('studygroup_id', flat=True))
+            memberships = memberships.filter(studygroup_id__in=group_ids)
+
+        for group_id, user_id in memberships.values_list('studygroup_id', 'customuser_id').iterator(chunk_size=5000):
+            if user_id in active:
+                self.groups[user_id].add(group_id)
+                self.members[group_id].add(user_id)
+
+
+def score_python(graph, user_ids, limit):
+    """``{user_id: [(sugerido, score, motivo, mutual_count)]}`` calculado com dicionários"""
+    active = set(graph.user_ids)
+    results = {}
+    for user_id in user_ids:
+        neighbours = graph.edges.get(user_id, set())
+        mutual = Counter()
+        for neighbour_id in neighbours:
+            mutual.update(graph.edges.get(neighbour_id, ()))
+        groups = Counter()
+        for group_id in graph.groups.get(user_id, ()):
+            groups.update(graph.members[group_id])
+
+        candidates = set(mutual) | set(groups)
+        for kind, values in graph.affinity.items():
+            if user_id in values:
+                candidates.update(graph.popular[(kind, values[user_id])])
+
+        scored = []
+        for candidate_id in candidates:
+            if candidate_id == user_id or candidate_id in neighbours or candidate_id not in active:
+                continue
+            components = {
+                'mutual': WEIGHTS['mutual'] * mutual[candidate_id],
+                'group': WEIGHTS['group'] * groups[candidate_id],
+            }
+            for kind, values in graph.affinity.items():
+                same = user_id in values and values.get(candidate_id) == values[user_id]
+                components[kind] = WEIGHTS[kind] if same else 0.0
+            score = sum(components.values())
+            if score > 0:
+                reason = max(components, key=components.get)
+                scored.append((candidate_id, score, reason, mutual[candidate_id]))
+
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        results[user_id] = scored[:limit]
+    return results
+
+
+class SparseScorer:
+    """O mesmo score de ``score_python`` em produtos de matrizes esparsas (scipy)"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.ids = np.array(graph.user_ids, dtype=np.int64)
+        self.index = {user_id: position for position, user_id in enumerate(graph.user_ids)}
+        n = len(self.ids)
+
+        rows, cols = [], []
+        for user_id, neighbours in graph.edges.items():
+            for neighbour_id in neighbours:
+                rows.append(self.index[user_id])
+                cols.append(self.index[neighbour_id])
+        self.adjacency = self._binary(rows, cols, (n, n))
+
+        group_index = {group_id: position for position, group_id in enumerate(graph.members)}
+        rows, cols = [], []
+        for group_id, members in graph.members.items():
+            for user_id in members:
+                rows.append(self.index[user_id])
+                cols.append(group_index[group_id])
+        self.membership = self._binary(rows, cols, (n, len(group_index)))
+
+        # Por afinidade: código de cada usuário (-1 sem valor), one-hot e os populares de cada valor
+        self.codes = {}
+        self.one_hot = {}
+        self.popular = {}
+        for kind, values in graph.affinity.items():
+            value_index = {value: position for position, value in enumerate(sorted(set(values.values())))}
+            codes = np.full(n, -1, dtype=np.int64)
+            for user_id, value in values.items():
+                codes[self.index[user_id]] = value_index[value]
+            self.codes[kind] = codes
+
+            has_value = np.flatnonzero(codes >= 0)
+            self.one_hot[kind] = self._binary(has_value, codes[has_value], (n, len(value_index)))
+            rows, cols = [], []
+            for value, position in value_index.items():
+                for user_id in graph.popular[(kind, value)]:
+                    rows.append(position)
+                    cols.append(self.index[user_id])
+            self.popular[kind] = self._binary(rows, cols, (len(value_index), n))
+
+    @staticmethod
+    def _binary(rows, cols, shape):
+        data = np.ones(len(rows), dtype=np.float64)
+        return sparse.csr_matrix((data, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))), shape=shape)
+
+    def score(self, user_ids, limit):
+        n = len(self.ids)
+        rows = np.array([self.index[user_id] for user_id in user_ids], dtype=np.int64)
+        if not len(rows) or not n:
+            return {user_id: [] for user_id in user_ids}
+
+        mutual = (self.adjacency[rows] @ self.adjacency).tocoo()
+        groups = (self.membership[rows] @ self.membership.T).tocoo()
+        affinity = sum(
+            (self.one_hot[kind][rows] @ self.popular[kind] for kind in self.one_hot),
+            sparse.csr_matrix((len(rows), n))
+        ).tocoo()
+
+        # Junta os candidatos das três matrizes em chaves linha * n + coluna
+        parts = [mutual, groups, affinity]
+        keys = np.concatenate([part.row.astype(np.int64) * n + part.col for part in parts])
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        offsets = np.cumsum([0] + [part.nnz for part in parts])
+        mutual_count = np.bincount(inverse[offsets[0]:offsets[1]], weights=mutual.data, minlength=len(unique_keys))
+        group_count = np.bincount(inverse[offsets[1]:offsets[2]], weights=groups.data, minlength=len(unique_keys))
+
+        row = unique_keys // n
+        col = unique_keys % n
+        target = rows[row]
+        components = [WEIGHTS['mutual'] * mutual_count, WEIGHTS['group'] * group_count]
+        for kind in ('course', 'university'):
+            codes = self.codes[kind]
+            same = (codes[col] >= 0) & (codes[col] == codes[target])
+            components.append(WEIGHTS[kind] * same)
+        components = np.column_stack(components)
+        score = components.sum(axis=1)
+
+        known = self.adjacency[rows].tocoo()
+        excluded = known.row.astype(np.int64) * n + known.col
+        keep = (col != target) & (score > 0) & ~np.isin(unique_keys, excluded)
+        row, col, score = row[keep], col[keep], score[keep]
+        components, mutual_count = components[keep], mutual_count[keep]
+
+        # Top-K por linha: ordena por (linha, -score, id) e corta pela posição dentro da linha
+        order = np.lexsort((self.ids[col], -score, row))
+        row, col, score = row[order], col[order], score[order]
+        components, mutual_count = components[order], mutual_count[order]
+        rank = np.arange(len(row)) - np.searchsorted(row, row, side='left')
+        top = rank < limit
+
+        reasons = np.array(list(WEIGHTS))[components[top].argmax(axis=1)]
+        results = {user_id: [] for user_id in user_ids}
+        for position, candidate, value, reason, count in zip(
+            row[top], col[top], score[top], reasons, mutual_count[top]
+        ):
+            results[user_ids[position]].append((int(self.ids[candidate]), float(value), str(reason), int(count)))
+        return results
+
+
+def _engine(name):
+    if name == 'auto':
+        if sparse is not None:
+            return 'sparse'
+        logger.warning("numpy/scipy não instalados: sugestões calculadas pelo motor 'python', bem mais lento")
+        return 'python'
+    if name == 'sparse' and sparse is None:
+        raise ImproperlyConfigured("O motor 'sparse' precisa de numpy e scipy instalados")
+    return name
+
+
+def refresh(user_ids=None, batch_size=None, engine='auto'):
+    """
+    Recalcula as sugestões de ``user_ids`` (de todos os usuários ativos, se
+    None) em lotes; retorna quantos usuários foram processados.
+    """
+    batch_size = batch_size or getattr(settings, 'SUGGESTIONS_BATCH_SIZE', 2000)
+    limit = _per_user()
+    started_at = timezone.now()
+    graph = SocialGraph.load(user_ids)
+
+    active = set(graph.user_ids)
+    targets = graph.user_ids if user_ids is None else sorted(set(user_ids) & active)
+    scorer = SparseScorer(graph) if _engine(engine) == 'sparse' else None
+
+    for start in range(0, len(targets), batch_size):
+        batch = targets[start:start + batch_size]
+        results = scorer.score(batch, limit) if scorer else score_python(graph, batch, limit)
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=batch).delete()
+            FollowSuggestion.objects.bulk_create([
+                FollowSuggestion(
+                    user_id=user_id,
+                    suggested_id=suggested_id,
+                    score=score,
+                    reason=reason,
+                    mutual_count=mutual_count
+                )
+                for user_id, suggestions in results.items()
+                for suggested_id, score, reason, mutual_count in suggestions
+            ], batch_size=1000)
+
+    # Marcas feitas depois do início continuam para a próxima execução
+    stale = SuggestionRefresh.objects.filter(marked_at__lte=started_at)
+    if user_ids is not None:
+        stale = stale.filter(user_id__in=list(user_ids))
+    stale.delete()
+    return len(targets)
+
+
+def refresh_stale(batch_size=None, engine='auto'):
+    """Recalcula só os usuários marcados em SuggestionRefresh"""
+    user_ids = list(SuggestionRefresh.objects.values_list('user_id', flat=True))
+    if not user_ids:
+        return 0
+    # Os signals marcam só as pontas da aresta; a vizinhança é expandida aqui, fora do request
+    return refresh(_with_in_neighbours(user_ids), batch_size=batch_size, engine=engine)
+
+
+def mark_stale(user_ids):
+    """Marca usuários para o próximo ``build_suggestions``"""
+    SuggestionRefresh.objects.bulk_create(
+        [SuggestionRefresh(user_id=user_id) for user_id in set(user_ids)],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['marked_at']
+    )
+
+
+def _with_in_neighbours(user_ids):
+    """
+    ``user_ids`` e quem tem aresta para eles (seguidores e conexões aceitas):
+    uma aresta nova ``u -> v`` muda os amigos de amigos de quem chega a ``u``.
+    """
+    StudentConnection = apps.get_model('messaging', 'StudentConnection')
+    expanded = set(user_ids)
+    for chunk in _chunks(user_ids):
+        expanded.update(Follow.objects.filter(following_id__in=chunk).values_list('follower_id', flat=True))
+        connections = StudentConnection.objects.filter(status='accepted')
+        expanded.update(connections.filter(to_student_id__in=chunk).values_list('from_student_id', flat=True))
+        expanded.update(connections.filter(from_student_id__in=chunk).values_list('to_student_id', flat=True))
+    return expanded
+
+
+def suggestions_for(user, limit=None):
+    """Sugestões gravadas para ``user``, sem quem ele passou a seguir depois do cálculo"""
+    limit = limit or _per_user()
+    following = follow_graph.following_ids(user.id)
+    rows = FollowSuggestion.objects.filter(user=user).select_related('suggested').order_by('-score', 'suggested_id')
+    return [row for row in rows[:_per_user()] if row.suggested_id not in following][:limit]
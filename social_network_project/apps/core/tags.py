@@ -0,0 +1,140 @@
+"""
+Tags normalizadas de posts, vagas e posts de estudantes.
+
+Os usuários continuam digitando as tags como texto separado por vírgula
+(``Post.hashtags``, ``JobListing.tags`` e ``StudentPost.tags``). A cada save
+o texto é normalizado (core.models.normalize_tag) e sincronizado com a
+tabela de ligação ``normalized_tags``, o que transforma "vagas com a tag
+React" em uma busca no índice ``(tag_id, ...)`` em vez de um ``icontains``.
+
+Cada Tag guarda quantos itens de cada tipo a usam (posts_count, jobs_count e
+student_posts_count), mantidos com F() aqui e reconstruídos por ``rebuild``.
+"""
+from django.apps import apps
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Tag, normalize_tag
+
+# Model -> (campo de texto com as tags, contador em Tag)
+TAG_SOURCES = {
+    'core.post': ('hashtags', 'posts_count'),
+    'core.joblisting': ('tags', 'jobs_count'),
+    'messaging.studentpost': ('tags', 'student_posts_count'),
+}
+
+MAX_TAG_LENGTH = Tag._meta.get_field('slug').max_length
+
+
+def parse_tags(text):
+    """Texto separado por vírgula -> ``{slug: nome}`` sem repetições, na ordem digitada"""
+    tags = {}
+    for raw in (text or '').split(','):
+        slug = normalize_tag(raw)[:MAX_TAG_LENGTH]
+        if slug and slug not in tags:
+            tags[slug] = raw.strip().lstrip('#').strip()[:MAX_TAG_LENGTH]
+    return tags
+
+
+def _source(model):
+    return TAG_SOURCES[model._meta.label_lower]
+
+
+def get_or_create_tags(names_by_slug):
+    """Garante que as tags existem (sem corrida entre requests) e retorna ``{slug: Tag}``"""
+    if not names_by_slug:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(slug=slug, name=name) for slug, name in names_by_slug.items()],
+        ignore_conflicts=True
+    )
+    return {tag.slug: tag for tag in Tag.objects.filter(slug__in=list(names_by_slug))}
+
+
+def _adjust(tag_ids, counter, delta):
+    if tag_ids:
+        Tag.objects.filter(id__in=tag_ids).update(**{counter: Greatest(F(counter) + delta, 0)})
+
+
+def sync_tags(instance):
+    """Sincroniza a tabela de ligação de ``instance`` com o seu campo de texto"""
+    text_field, counter = _source(type(instance))
+    wanted = get_or_create_tags(parse_tags(getattr(instance, text_field)))
+
+    current_ids = set(instance.normalized_tags.values_list('id', flat=True))
+    wanted_ids = {tag.id for tag in wanted.values()}
+
+    added_ids = wanted_ids - current_ids
+    removed_ids = current_ids - wanted_ids
+    if added_ids:
+        instance.normalized_tags.add(*added_ids)
+        _adjust(added_ids, counter, 1)
+    if removed_ids:
+        instance.normalized_tags.remove(*removed_ids)
+        _adjust(removed_ids, counter, -1)
+
+
+def release_tags(instance):
+    """Desconta as tags de um item que vai ser apagado (as ligações caem em cascata)"""
+    _, counter = _source(type(instance))
+    _adjust(list(instance.normalized_tags.values_list('id', flat=True)), counter, -1)
+
+
+def filter_by_tag(queryset, name):
+    """Itens de ``queryset`` com a tag ``name`` (com ou sem '#', qualquer caixa)"""
+    return queryset.filter(normalized_tags__slug=normalize_tag(name))
+
+
+def trending(counter='posts_count', limit=10):
+    """Tags mais usadas por um tipo de conteúdo (usa o índice do contador)"""
+    return Tag.objects.filter(**{f'{counter}__gt': 0}).order_by(f'-{counter}', 'slug')[:limit]
+
+
+def _relink(model, text_field, batch):
+    through = model.normalized_tags.through
+    source_column = model._meta.model_name + '_id'
+
+    parsed = {obj.pk: parse_tags(getattr(obj, text_field)) for obj in batch}
+    names_by_slug = {}
+    for tags in parsed.values():
+        for slug, name in tags.items():
+            names_by_slug.setdefault(slug, name)
+    tags_by_slug = get_or_create_tags(names_by_slug)
+
+    through.objects.filter(**{f'{source_column}__in': list(parsed)}).delete()
+    through.objects.bulk_create([
+        through(**{source_column: pk, 'tag_id': tags_by_slug[slug].id})
+        for pk, tags in parsed.items() for slug in tags
+    ])
+
+
+def recount():
+    """Recalcula os contadores de todas as tags a partir das tabelas de ligação"""
+    updates = {}
+    for label, (_, counter) in TAG_SOURCES.items():
+        through = apps.get_model(label).normalized_tags.through
+        updates[counter] = Coalesce(Subquery(
+            through.objects.filter(tag_id=OuterRef('pk')).order_by().values('tag_id').annotate(
+                total=Count('pk')
+            ).values('total')
+        ), Value(0))
+    Tag.objects.update(**updates)
+
+
+def rebuild(batch_size=500):
+    """Refaz todas as ligações a partir dos campos de texto; retorna quantos itens foram processados"""
+    processed_count = 0
+    for label, (text_field, _) in TAG_SOURCES.items():
+        model = apps.get_model(label)
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', text_field)[:batch_size]
+            )
+            if not batch:
+                break
+            _relink(model, text_field, batch)
+            processed_count += len(batch)
+            last_pk = batch[-1].pk
+    recount()
+    return processed_count
@@ -0,0 +1,44 @@
+from django import template
+
+from apps.core import render_cache
+
+register = template.Library()
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, kwargs):
+        self.nodelist = nodelist
+        self.name = name
+        self.kwargs = kwargs
+
+    def render(self, context):
+        values = {key: value.resolve(context) for key, value in self.kwargs.items()}
+        timeout = values.pop('timeout', None)
+        scopes = list(values.pop('scopes', None) or [])
+        vary = []
+        for key, value in sorted(values.items()):
+            if key in render_cache.ENTITIES:
+                scopes.append(render_cache.entity_scope(key, value))
+            else:
+                vary.append(f'{key}={value}')
+        return render_cache.fragment(
+            self.name.resolve(context), scopes, vary, lambda: self.nodelist.render(context), timeout
+        )
+
+
+@register.tag
+def cachefragment(parser, token):
+    """
+    {% cachefragment 'post_card' post=post.id user=post.author_id liked=post.user_liked %}
+    ...
+    {% endcachefragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError("'cachefragment' precisa do nome do fragmento")
+    kwargs = template.base.token_kwargs(bits[2:], parser)
+    if len(kwargs) != len(bits) - 2:
+        raise template.TemplateSyntaxError("'cachefragment' aceita só argumentos nome=valor depois do nome")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return CacheFragmentNode(nodelist, parser.compile_filter(bits[1]), kwargs)
@@ -1,7 +1,18 @@
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from apps.core.models import JobListing, JobApplication, JobCategory, Post, Like, Comment
+from django.test import override_settings
+from django.core.management import call_command
+from io import StringIO
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.utils import dateformat, timezone
+from apps.core.models import (
+    JobListing, JobApplication, JobCategory, Post, Like, Comment, Follow, TimelineEntry, Tag,
+    FollowSuggestion, SuggestionRefresh, adjust_counters
+)
+from apps.core import application_stats, events, follow_graph, job_facets, render_cache, search, suggestions, tags, timeline
+from apps.core.pagination import KeysetPaginator, InvalidCursor, encode_cursor, decode_cursor
 
 User = get_user_model()
 
@@ -178,6 +189,7 @@ class PostModelTest(TestCase):
         self.assertEqual(self.post.likes_count, 0)
         
         Like.objects.create(user=self.user, post=self.post)
+        adjust_counters(self.post, likes_count=1)
         self.assertEqual(self.post.likes_count, 1)
     
     def test_post_comments(self):
@@ -189,6 +201,7 @@ class PostModelTest(TestCase):
             post=self.post,
             content='Test comment'
         )
+        adjust_counters(self.post, comments_count=1)
         self.assertEqual(self.post.comments_count, 1)
     
     def test_hashtags(self):
@@ -198,4 +211,740 @@ class PostModelTest(TestCase):
         
         tags = self.post.get_hashtags_list()
         self.assertEqual(len(tags), 3)
-        self.assertIn('python', tags)
\ No newline at end of file
+        self.assertIn('python', tags)
+
+
+@override_settings(EVENT_BUFFER_BACKEND='sync')
+class PostCounterTest(TestCase):
+    """Tests for the denormalized like/comment counters"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='counter',
+            nickname='counter',
+            email='counter@test.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(author=self.user, content='Contadores', post_type='text')
+        self.client.force_login(self.user)
+    
+    def test_like_and_comment_views_update_counters(self):
+        """Views increment and decrement the stored counters"""
+        response = self.client.post(reverse('core:like_post', args=[self.post.id]))
+        self.assertEqual(response.json()['likes_count'], 1)
+        
+        response = self.client.post(reverse('core:like_post', args=[self.post.id]))
+        self.assertEqual(response.json()['likes_count'], 0)
+        
+        self.client.post(reverse('core:add_comment', args=[self.post.id]), {'content': 'Legal!'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+    
+    def test_reconcile_counters(self):
+        """reconcile_counters repairs drifted counters"""
+        Like.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=7)
+        
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class JobSearchTest(TestCase):
+    """Tests for the full-text job search"""
+    
+    def setUp(self):
+        self.company = User.objects.create_user(
+            username='searchco',
+            nickname='searchco',
+            email='searchco@test.com',
+            password='testpass123',
+            user_type='company',
+            company_name='Labs Júnior'
+        )
+        self.title_match = self.create_job('Desenvolvedor Python', 'Trabalho com APIs e bancos de dados. ' * 3)
+        self.description_match = self.create_job('Analista de Dados', 'Uso diário de Python e SQL no time. ' * 3)
+        self.other = self.create_job('Designer de Produto', 'Criação de interfaces e protótipos. ' * 3, tags='figma')
+    
+    def create_job(self, title, description, tags='backend'):
+        return JobListing.objects.create(
+            company=self.company,
+            title=title,
+            description=description,
+            requirements='Requisitos',
+            location='Florianópolis',
+            tags=tags
+        )
+    
+    def search(self, query):
+        results = search.search_jobs(JobListing.objects.all(), query).order_by('-search_rank', '-id')
+        return [job.id for job in results]
+    
+    def test_title_ranks_above_description(self):
+        """Title matches outrank description matches"""
+        self.assertEqual(self.search('python'), [self.title_match.id, self.description_match.id])
+    
+    def test_plural_accents_and_company(self):
+        """Plurals, accents and the company name are searchable"""
+        self.assertEqual(self.search('desenvolvedores'), [self.title_match.id])
+        self.assertEqual(self.search('criacao'), [self.other.id])
+        self.assertEqual(len(self.search('labs junior')), 3)
+    
+    def test_index_follows_updates_and_deletes(self):
+        """Saving and deleting a job keeps the index in sync"""
+        self.other.title = 'Desenvolvedor Frontend'
+        self.other.save()
+        self.assertIn(self.other.id, self.search('desenvolvedor'))
+        
+        self.other.delete()
+        self.assertNotIn(self.other.id, self.search('desenvolvedor'))
+    
+    def test_company_rename_reindexes_its_jobs(self):
+        """The company name is part of each job's document"""
+        self.company.company_name = 'Nuvem Tecnologia'
+        self.company.save()
+        self.assertEqual(len(self.search('nuvem')), 3)
+        self.assertEqual(self.search('labs'), [])
+    
+    def test_api_search_is_ranked(self):
+        """?search= results come back by relevance, not by date"""
+        self.client.force_login(self.company)
+        response = self.client.get('/api/v1/jobs/', {'search': 'python', 'page_size': 1})
+        self.assertEqual([job['id'] for job in response.json()['results']], [self.title_match.id])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([job['id'] for job in response.json()['results']], [self.description_match.id])
+        self.assertIsNone(response.json()['next'])
+
+
+class TagTest(TestCase):
+    """Tests for the normalized tag tables"""
+    
+    def setUp(self):
+        self.company = User.objects.create_user(
+            username='tagco',
+            nickname='tagco',
+            email='tagco@test.com',
+            password='testpass123',
+            user_type='company',
+            company_name='Tag Co'
+        )
+        self.job = JobListing.objects.create(
+            company=self.company,
+            title='Desenvolvedor Frontend',
+            description='Descrição',
+            requirements='Requisitos',
+            location='Remoto',
+            tags='React, TypeScript, react'
+        )
+        self.post = Post.objects.create(author=self.company, content='Vagas abertas', hashtags='#React, #vagas')
+    
+    def test_tags_are_normalized_and_linked(self):
+        """Case, '#' and duplicates collapse into one tag per slug"""
+        self.assertEqual(sorted(self.job.normalized_tags.values_list('slug', flat=True)), ['react', 'typescript'])
+        react = Tag.objects.get(slug='react')
+        self.assertEqual(react.name, 'React')
+        self.assertEqual((react.jobs_count, react.posts_count), (1, 1))
+        self.assertEqual(list(tags.filter_by_tag(JobListing.objects.all(), '#REACT')), [self.job])
+        self.assertEqual(list(tags.filter_by_tag(Post.objects.all(), 'vagas')), [self.post])
+    
+    def test_edits_and_deletes_update_counts(self):
+        """Editing the text and deleting items keep the per-tag counts in sync"""
+        self.job.tags = 'Python'
+        self.job.save()
+        self.assertEqual(Tag.objects.get(slug='react').jobs_count, 0)
+        self.assertEqual(Tag.objects.get(slug='python').jobs_count, 1)
+        
+        self.post.delete()
+        self.assertEqual(Tag.objects.get(slug='react').posts_count, 0)
+        self.assertEqual(list(tags.trending('jobs_count')), [Tag.objects.get(slug='python')])
+    
+    def test_rebuild_tags_command(self):
+        """rebuild_tags restores links and counts from the text fields"""
+        Post.normalized_tags.through.objects.all().delete()
+        Tag.objects.update(posts_count=0, jobs_count=0)
+        
+        call_command('rebuild_tags', stdout=StringIO())
+        
+        self.assertEqual(Tag.objects.get(slug='react').posts_count, 1)
+        self.assertEqual(Tag.objects.get(slug='typescript').jobs_count, 1)
+        self.assertEqual(list(self.post.normalized_tags.order_by('slug').values_list('slug', flat=True)), ['react', 'vagas'])
+
+
+class KeysetPaginationTest(TestCase):
+    """Tests for the keyset (cursor) paginator"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='pager',
+            nickname='pager',
+            email='pager@test.com',
+            password='testpass123'
+        )
+        self.posts = [
+            Post.objects.create(author=self.user, content=f'Post {i}', post_type='text')
+            for i in range(5)
+        ]
+    
+    def test_pages_follow_cursor(self):
+        """Each page continues after the previous cursor without overlap"""
+        paginator = KeysetPaginator(Post.objects.all(), 2)
+        seen = []
+        page = paginator.page()
+        self.assertFalse(page.has_previous)
+        while True:
+            seen.extend(post.id for post in page)
+            if not page.has_next:
+                break
+            page = paginator.page(page.next_cursor)
+        
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+    
+    def test_new_rows_do_not_shift_pages(self):
+        """Rows created after the first page do not leak into the next one"""
+        paginator = KeysetPaginator(Post.objects.all(), 2)
+        first_page = paginator.page()
+        Post.objects.create(author=self.user, content='Novo', post_type='text')
+        
+        second_page = paginator.page(first_page.next_cursor)
+        self.assertEqual([p.id for p in second_page], [self.posts[2].id, self.posts[1].id])
+    
+    def test_invalid_cursor(self):
+        """Tampered cursors are rejected, get_page falls back to the first page"""
+        paginator = KeysetPaginator(Post.objects.all(), 2)
+        self.assertRaises(InvalidCursor, paginator.page, 'nao-e-um-cursor')
+        self.assertEqual(list(paginator.get_page('nao-e-um-cursor')), list(paginator.page()))
+        
+        created_at = self.posts[0].created_at
+        self.assertEqual(decode_cursor(encode_cursor([created_at, 1])), (created_at, 1))
+
+
+class TimelineTest(TestCase):
+    """Tests for the fan-out-on-write home timeline"""
+    
+    def setUp(self):
+        self.reader = User.objects.create_user(
+            username='reader',
+            nickname='reader',
+            email='reader@test.com',
+            password='testpass123'
+        )
+        self.author = User.objects.create_user(
+            username='author',
+            nickname='author',
+            email='author@test.com',
+            password='testpass123'
+        )
+        self.company = User.objects.create_user(
+            username='bigcompany',
+            nickname='bigcompany',
+            email='bigcompany@test.com',
+            password='testpass123',
+            user_type='company'
+        )
+    
+    def create_post(self, author, content):
+        post = Post.objects.create(author=author, content=content, post_type='text')
+        timeline.fanout_post(post)
+        return post
+    
+    def test_follow_fanout_and_unfollow(self):
+        """Posts reach followers on write and leave on unfollow"""
+        old_post = self.create_post(self.author, 'Antes de seguir')
+        
+        Follow.objects.create(follower=self.reader, following=self.author)
+        timeline.follow(self.reader, self.author)
+        new_post = self.create_post(self.author, 'Depois de seguir')
+        
+        posts, next_cursor = timeline.read_timeline(self.reader)
+        self.assertEqual([p.id for p in posts], [new_post.id, old_post.id])
+        self.assertIsNone(next_cursor)
+        
+        new_post.toggle_active()
+        self.assertFalse(TimelineEntry.objects.filter(post=new_post).exists())
+        
+        timeline.unfollow(self.reader, self.author)
+        posts, _ = timeline.read_timeline(self.reader)
+        self.assertEqual(posts, [])
+    
+    def test_read_timeline_pages(self):
+        """Reading returns page-sized slices with a continuation key"""
+        Follow.objects.create(follower=self.reader, following=self.author)
+        created = [self.create_post(self.author, f'Post {i}') for i in range(5)]
+        
+        first_page, next_cursor = timeline.read_timeline(self.reader, limit=3)
+        second_page, last_cursor = timeline.read_timeline(self.reader, cursor=next_cursor, limit=3)
+        
+        self.assertEqual([p.id for p in first_page], [p.id for p in reversed(created)][:3])
+        self.assertEqual([p.id for p in second_page], [p.id for p in reversed(created)][3:])
+        self.assertIsNone(last_cursor)
+    
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_high_follower_company_is_pulled_on_read(self):
+        """Posts from very popular companies are merged at read time"""
+        Follow.objects.create(follower=self.reader, following=self.company)
+        post = self.create_post(self.company, 'Vaga aberta')
+        
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+        posts, _ = timeline.read_timeline(self.reader)
+        self.assertEqual([p.id for p in posts], [post.id])
+    
+    def test_hydrate_loads_capped_previews(self):
+        """Cards carry the latest comments/likes only and one liked-set query"""
+        post = self.create_post(self.author, 'Muito comentado')
+        comments = [
+            Comment.objects.create(user=self.reader, post=post, content=f'Comentário {i}')
+            for i in range(5)
+        ]
+        for user in (self.reader, self.author, self.company):
+            Like.objects.create(user=user, post=post)
+        
+        with self.assertNumQueries(4):
+            posts = timeline.hydrate_posts([post.id], self.reader)
+        
+        self.assertTrue(posts[0].user_liked)
+        self.assertEqual(
+            [c.id for c in posts[0].preview_comments],
+            [c.id for c in comments[-timeline.COMMENT_PREVIEW_SIZE:]]
+        )
+        self.assertEqual(len(posts[0].preview_likes), 3)
+
+
+class EventBufferTest(TestCase):
+    """Tests for the write-behind like/view buffer"""
+    
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='viral', nickname='viral', email='viral@test.com', password='testpass123')
+        self.fans = [
+            User.objects.create_user(username=f'fan{i}', nickname=f'fan{i}', email=f'fan{i}@test.com', password='testpass123')
+            for i in range(20)
+        ]
+        self.post = Post.objects.create(author=self.author, content='Post viral', post_type='text')
+        self.buffer = events.MemoryEventBuffer(flush_ms=60000)
+    
+    def test_likes_are_applied_in_one_batch(self):
+        """Many likes on one post become one insert and one counter update"""
+        for fan in self.fans:
+            self.buffer.add([('like', fan.id, self.post.id, True)])
+        # Curtiu e descurtiu antes do flush: não grava nada
+        self.buffer.add([('like', self.author.id, self.post.id, True)])
+        self.buffer.add([('like', self.author.id, self.post.id, False)])
+        
+        with self.assertNumQueries(4):
+            self.buffer.flush()
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 20)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 20)
+        
+        self.buffer.add([('like', fan.id, self.post.id, False) for fan in self.fans[:5]])
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 15)
+    
+    def test_failed_batch_is_requeued_and_flushed_on_close(self):
+        """A batch that fails goes back to the queue; close() writes what is left"""
+        self.buffer.add([('like', self.fans[0].id, self.post.id, True)])
+        with mock.patch.object(events, 'apply_likes', side_effect=RuntimeError('db down')):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(Like.objects.exists())
+        
+        self.buffer.add([('like', self.fans[1].id, self.post.id, True)])
+        self.assertEqual(self.buffer.close(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+    
+    def test_pending_likes_are_visible_to_their_author(self):
+        """Read-your-writes: the acting user sees a like that is still queued"""
+        fan = self.fans[0]
+        with mock.patch.object(events, 'get_buffer', return_value=self.buffer):
+            liked, likes_count = events.toggle_like(fan, self.post)
+            self.assertEqual((liked, likes_count), (True, 1))
+            self.assertFalse(Like.objects.exists())
+            self.assertEqual(events.overlay_ids(fan.id, 'like', []), {self.post.id})
+            self.assertEqual(events.overlay_ids(self.fans[1].id, 'like', []), set())
+            
+            self.buffer.flush()
+        
+        self.assertTrue(Like.objects.filter(user=fan, post=self.post).exists())
+        self.assertEqual(events.pending(fan.id, 'like'), {})
+
+
+class FollowGraphTest(TestCase):
+    """Tests for the cached follow graph and stored follow counts"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='seguidor', nickname='seguidor', email='seguidor@test.com', password='testpass123')
+        self.others = [
+            User.objects.create_user(username=f'perfil{i}', nickname=f'perfil{i}', email=f'perfil{i}@test.com', password='testpass123')
+            for i in range(3)
+        ]
+        self.client.force_login(self.user)
+    
+    def test_follow_view_keeps_counts(self):
+        """follow_user toggles the follow and the stored counters"""
+        target = self.others[0]
+        response = self.client.post(reverse('core:follow_user', args=[target.id]))
+        self.assertEqual(response.json()['followers_count'], 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 1)
+        
+        response = self.client.post(reverse('core:follow_user', args=[target.id]))
+        self.assertFalse(response.json()['following'])
+        self.assertEqual(response.json()['followers_count'], 0)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 0)
+    
+    def test_following_ids_are_cached_until_a_follow(self):
+        """The adjacency set is read once and invalidated by Follow changes"""
+        Follow.objects.create(follower=self.user, following=self.others[0])
+        self.assertEqual(follow_graph.following_ids(self.user.id), {self.others[0].id})
+        with self.assertNumQueries(0):
+            follow_graph.following_ids(self.user.id)
+        
+        Follow.objects.create(follower=self.user, following=self.others[1])
+        self.assertEqual(follow_graph.following_ids(self.user.id), {self.others[0].id, self.others[1].id})
+        Follow.objects.filter(following=self.others[0]).delete()
+        self.assertEqual(follow_graph.following_ids(self.user.id), {self.others[1].id})
+    
+    def test_reconcile_fixes_follow_counts(self):
+        """reconcile_counters repairs drifted follow counts"""
+        Follow.objects.create(follower=self.user, following=self.others[0])
+        User.objects.filter(pk=self.user.pk).update(following_count=9)
+        
+        call_command('reconcile_counters', stdout=StringIO())
+        
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 1)
+
+
+class FollowSuggestionTest(TestCase):
+    """Tests for the precomputed who-to-follow suggestions"""
+    
+    def setUp(self):
+        cache.clear()
+        from apps.messaging.models import StudentConnection, StudyGroup
+        
+        def make(name, **fields):
+            return User.objects.create_user(username=name, nickname=name, email=f'{name}@test.com', password='testpass123', **fields)
+        
+        self.ana = make('ana', course='Engenharia', university='UFSC')
+        self.bia = make('bia')
+        self.caio = make('caio')
+        self.duda = make('duda', course='engenharia ', university='UFSC')
+        self.edu = make('edu', university='ufsc')
+        self.fabi = make('fabi')
+        
+        Follow.objects.create(follower=self.ana, following=self.bia)
+        StudentConnection.objects.create(from_student=self.caio, to_student=self.ana, status='accepted')
+        Follow.objects.create(follower=self.bia, following=self.fabi)
+        Follow.objects.create(follower=self.caio, following=self.fabi)
+        group = StudyGroup.objects.create(name='Cálculo', description='Grupo', subject='Cálculo', creator=self.ana)
+        group.members.add(self.ana, self.edu)
+    
+    def test_python_engine_scores_and_reasons(self):
+        """Friends of friends, shared groups and course/university affinity add up"""
+        graph = suggestions.SocialGraph.load()
+        result = suggestions.score_python(graph, [self.ana.id], 10)[self.ana.id]
+        by_user = {suggested_id: (score, reason, mutual) for suggested_id, score, reason, mutual in result}
+        
+        self.assertEqual(by_user[self.duda.id], (4.0, 'course', 0))
+        self.assertEqual(by_user[self.edu.id], (3.0, 'group', 0))
+        self.assertEqual(by_user[self.fabi.id], (2.0, 'mutual', 2))
+        # Already followed / connected users and the user itself are never suggested
+        self.assertNotIn(self.bia.id, by_user)
+        self.assertNotIn(self.caio.id, by_user)
+        self.assertNotIn(self.ana.id, by_user)
+        self.assertEqual([row[0] for row in result], [self.duda.id, self.edu.id, self.fabi.id])
+    
+    @skipUnless(suggestions.sparse is not None, 'scipy is not installed')
+    def test_sparse_engine_matches_python(self):
+        """The vectorized engine returns the same top-K as the fallback"""
+        graph = suggestions.SocialGraph.load()
+        user_ids = list(graph.user_ids)
+        expected = suggestions.score_python(graph, user_ids, 2)
+        self.assertEqual(suggestions.SparseScorer(graph).score(user_ids, 2), expected)
+    
+    def test_partial_graph_scores_like_the_full_graph(self):
+        """Incremental runs load only the users' neighbourhood, with the same result"""
+        Follow.objects.create(follower=self.fabi, following=self.edu)
+        full = suggestions.score_python(suggestions.SocialGraph.load(), [self.ana.id], 10)
+        partial = suggestions.SocialGraph.load([self.ana.id])
+        # Fabi is two hops away from Ana: edges leaving her are not needed, so not loaded
+        self.assertNotIn(self.fabi.id, partial.edges)
+        self.assertEqual(suggestions.score_python(partial, [self.ana.id], 10), full)
+    
+    def test_refresh_writes_top_k_and_clears_marks(self):
+        """refresh() replaces the stored rows; graph changes mark users again"""
+        with self.settings(SUGGESTIONS_PER_USER=2):
+            suggestions.refresh(engine='python')
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(user=self.ana).values_list('suggested_id', flat=True)),
+            [self.duda.id, self.edu.id]
+        )
+        self.assertFalse(SuggestionRefresh.objects.exists())
+        
+        self.assertFalse(FollowSuggestion.objects.filter(user=self.caio, suggested=self.duda).exists())
+        Follow.objects.create(follower=self.ana, following=self.duda)
+        # The request only marks the two ends of the new edge
+        self.assertEqual(
+            set(SuggestionRefresh.objects.values_list('user_id', flat=True)), {self.ana.id, self.duda.id}
+        )
+        # The followed user disappears from the read path before the next rebuild
+        self.assertNotIn(self.duda, [row.suggested for row in suggestions.suggestions_for(self.ana)])
+        
+        call_command('build_suggestions', engine='python', stdout=StringIO())
+        self.assertFalse(FollowSuggestion.objects.filter(user=self.ana, suggested=self.duda).exists())
+        # The batch run expands the marks: Caio (connected to Ana) now reaches Duda through Ana
+        self.assertTrue(FollowSuggestion.objects.filter(user=self.caio, suggested=self.duda).exists())
+        self.assertFalse(SuggestionRefresh.objects.exists())
+    
+    def test_suggestions_endpoint(self):
+        """GET /api/v1/users/suggestions/ reads the stored rows"""
+        suggestions.refresh(engine='python')
+        self.client.force_login(self.ana)
+        response = self.client.get('/api/v1/users/suggestions/', {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['suggested']['id'] for row in response.json()], [self.duda.id, self.edu.id])
+        self.assertEqual(response.json()[0]['reason'], 'course')
+
+
+@override_settings(EVENT_BUFFER_BACKEND='sync')
+class RenderCacheTest(TestCase):
+    """Tests for versioned fragment caching and the anonymous job list cache"""
+    
+    def setUp(self):
+        cache.clear()
+        self.company = User.objects.create_user(
+            username='empresa', nickname='empresa', email='empresa@test.com', password='testpass123',
+            user_type='company', company_name='Empresa'
+        )
+        self.student = User.objects.create_user(
+            username='aluno', nickname='aluno', email='aluno@test.com', password='testpass123', user_type='student'
+        )
+        Follow.objects.create(follower=self.student, following=self.company)
+        self.post = Post.objects.create(author=self.company, content='Vagas abertas', post_type='text')
+        timeline.fanout_post(self.post)
+        self.job = JobListing.objects.create(
+            company=self.company, title='Estágio Django', description='Descrição', requirements='Python', location='Remoto'
+        )
+    
+    def test_post_card_is_rendered_again_only_when_the_post_changes(self):
+        self.client.force_login(self.student)
+        url = reverse('core:instagram_feed')
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(render_cache.fragment_stats()['post_card'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        
+        self.client.post(reverse('core:like_post', args=[self.post.id]))
+        response = self.client.get(url)
+        self.assertEqual(render_cache.fragment_stats()['post_card']['misses'], 2)
+        self.assertContains(response, '1 curtida')
+    
+    def test_cached_card_carries_an_absolute_timestamp(self):
+        """The relative time is computed on the client, so a cached card never freezes it"""
+        self.client.force_login(self.student)
+        self.client.get(reverse('core:instagram_feed'))
+        response = self.client.get(reverse('core:instagram_feed'))
+        self.assertEqual(render_cache.fragment_stats()['post_card']['hits'], 1)
+        created_at = dateformat.format(timezone.localtime(self.post.created_at), 'c')
+        self.assertContains(response, f'<time class="relative-time" datetime="{created_at}">')
+    
+    def test_cards_with_equal_versions_do_not_share_html(self):
+        # Com o cache de versões frio, todos os escopos podem ter a mesma versão
+        other = Post.objects.create(author=self.company, content='Processo seletivo', post_type='text')
+        timeline.fanout_post(other)
+        self.client.force_login(self.student)
+        with mock.patch('apps.core.cache_versions.get_versions', lambda *scopes: [1] * len(scopes)):
+            self.client.get(reverse('core:instagram_feed'))
+            response = self.client.get(reverse('core:instagram_feed'))
+        self.assertContains(response, 'Vagas abertas', count=1)
+        self.assertContains(response, 'Processo seletivo', count=1)
+    
+    def test_job_list_is_cached_for_anonymous_visitors(self):
+        url = reverse('core:vagas_list')
+        self.assertContains(self.client.get(url), 'Estágio Django')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        
+        self.job.title = 'Estágio Django REST'
+        self.job.save()
+        self.assertContains(self.client.get(url), 'Estágio Django REST')
+    
+    def test_logged_in_users_skip_the_page_cache(self):
+        url = reverse('core:vagas_list')
+        self.client.get(url)
+        self.client.force_login(self.student)
+        response = self.client.get(url)
+        self.assertEqual(render_cache.fragment_stats()['job_card']['hits'], 1)
+        self.assertIn('page_obj', response.context)
+        
+        out = StringIO()
+        call_command('fragment_stats', '--reset', stdout=out)
+        self.assertIn('job_card: 1 acertos, 1 falhas (50.0%)', out.getvalue())
+        self.assertEqual(render_cache.fragment_stats(), {})
+
+
+class JobFacetsTest(TestCase):
+    """Tests for the cached job facet counts"""
+    
+    def setUp(self):
+        cache.clear()
+        self.company = User.objects.create_user(
+            username='facetas', nickname='facetas', email='facetas@test.com', password='testpass123',
+            user_type='company', company_name='Facetas'
+        )
+        self.tech = JobCategory.objects.create(name='Tecnologia', slug='tecnologia', icon='💻')
+        self.design = JobCategory.objects.create(name='Design', slug='design', icon='🎨')
+        self.jobs = [
+            self.create_job('Estágio Backend', self.tech, 'internship', 'Florianópolis'),
+            self.create_job('Estágio Frontend', self.tech, 'internship', 'Remoto'),
+            self.create_job('Designer Júnior', self.design, 'full_time', 'Remoto'),
+        ]
+    
+    def create_job(self, title, category, job_type, location):
+        return JobListing.objects.create(
+            company=self.company, title=title, category=category, job_type=job_type, location=location,
+            description='Descrição', requirements='Requisitos'
+        )
+    
+    def counts(self, facet):
+        return {option['value']: option['count'] for option in job_facets.facets()[facet]}
+    
+    def test_counts_come_from_one_cached_aggregation(self):
+        with self.assertNumQueries(2):
+            result = job_facets.facets()
+        self.assertEqual(result['total'], 3)
+        self.assertEqual(self.counts('category'), {'tecnologia': 2, 'design': 1})
+        self.assertEqual(self.counts('job_type')['internship'], 2)
+        self.assertEqual(self.counts('location'), {'remoto': 2, 'florianópolis': 1})
+        with self.assertNumQueries(0):
+            job_facets.facets()
+    
+    def test_status_changes_invalidate_the_counts(self):
+        job_facets.facets()
+        self.jobs[0].close()
+        self.assertEqual(self.counts('category')['tecnologia'], 1)
+        self.jobs[0].activate()
+        self.create_job('Estágio Dados', self.tech, 'internship', 'Remoto')
+        self.assertEqual(self.counts('category')['tecnologia'], 3)
+    
+    def test_location_spellings_share_one_facet(self):
+        """Case and surrounding spaces do not split a location, in the counts or the filter"""
+        self.create_job('Estágio Dados', self.tech, 'internship', ' remoto ')
+        self.create_job('Estágio QA', self.tech, 'internship', 'SÃO PAULO')
+        self.create_job('Estágio Suporte', self.tech, 'internship', 'São Paulo')
+        options = {option['value']: option for option in job_facets.facets()['location']}
+        self.assertEqual((options['remoto']['label'], options['remoto']['count']), ('Remoto', 3))
+        self.assertEqual(options['são paulo']['count'], 2)
+        
+        response = self.client.get(reverse('core:vagas_list'), {'location': 'Remoto'})
+        self.assertEqual(len(response.context['page_obj']), 3)
+        response = self.client.get(reverse('core:vagas_list'), {'location': 'são paulo'})
+        self.assertEqual(len(response.context['page_obj']), 2)
+    
+    def test_list_filters_and_api_endpoint(self):
+        response = self.client.get(reverse('core:vagas_list'), {'category': 'tecnologia', 'location': 'remoto'})
+        self.assertEqual([job.title for job in response.context['page_obj']], ['Estágio Frontend'])
+        selected = [option['value'] for option in response.context['facets']['category'] if option['selected']]
+        self.assertEqual(selected, ['tecnologia'])
+        self.assertContains(response, 'Todas <span class="facet-count">3</span>', html=False)
+        
+        response = self.client.get(reverse('core:vagas_list'), {'category': 'inexistente'})
+        self.assertEqual(list(response.context['page_obj']), [])
+        
+        self.client.force_login(self.company)
+        data = self.client.get('/api/v1/jobs/facets/').json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual({option['value']: option['count'] for option in data['experience_level']}['entry'], 3)
+
+
+class ApplicationStatsTest(TestCase):
+    """Tests for the single-query application statistics"""
+    
+    def setUp(self):
+        cache.clear()
+        self.company = User.objects.create_user(
+            username='estatisticas', nickname='estatisticas', email='estatisticas@test.com',
+            password='testpass123', user_type='company', company_name='Estatísticas'
+        )
+        self.other_company = User.objects.create_user(
+            username='outra', nickname='outra', email='outra@test.com', password='testpass123',
+            user_type='company', company_name='Outra'
+        )
+        self.job = self.create_job('Estágio Backend')
+        self.empty_job = self.create_job('Estágio Frontend')
+        self.applications = [
+            JobApplication.objects.create(
+                job=self.job, applicant=self.create_student(index), cover_letter='Carta', status=status
+            )
+            for index, status in enumerate(['pending', 'reviewing', 'approved', 'rejected', 'rejected'])
+        ]
+    
+    def create_job(self, title):
+        return JobListing.objects.create(
+            company=self.company, title=title, location='Remoto',
+            description='Descrição', requirements='Requisitos'
+        )
+    
+    def create_student(self, index):
+        return User.objects.create_user(
+            username=f'candidato{index}', nickname=f'candidato{index}', email=f'candidato{index}@test.com',
+            password='testpass123', user_type='student'
+        )
+    
+    def test_job_stats_are_one_cached_query(self):
+        with self.assertNumQueries(1):
+            stats = application_stats.for_job(self.job.id)
+        self.assertEqual(stats['total'], 5)
+        self.assertEqual(stats['by_status'], {
+            'pending': 1, 'reviewing': 1, 'interview': 0, 'approved': 1, 'rejected': 2,
+        })
+        self.assertEqual(stats['open'], 2)
+        self.assertEqual(stats['percentages']['rejected'], 40)
+        with self.assertNumQueries(0):
+            application_stats.for_job(self.job.id)
+        self.assertEqual(application_stats.for_job(self.empty_job.id)['total'], 0)
+    
+    def test_jobs_with_equal_versions_do_not_share_stats(self):
+        with mock.patch('apps.core.cache_versions.get_versions', lambda *scopes: [1] * len(scopes)):
+            self.assertEqual(application_stats.for_job(self.job.id)['total'], 5)
+            self.assertEqual(application_stats.for_job(self.empty_job.id)['total'], 0)
+    
+    def test_status_changes_invalidate_the_job_stats(self):
+        application_stats.for_job(self.job.id)
+        self.applications[0].status = 'approved'
+        self.applications[0].save()
+        self.assertEqual(application_stats.for_job(self.job.id)['by_status']['approved'], 2)
+        self.applications[1].delete()
+        self.assertEqual(application_stats.for_job(self.job.id)['open'], 0)
+    
+    def test_company_stats_and_command(self):
+        with self.assertNumQueries(1):
+            stats = application_stats.for_company(self.company)
+        self.assertEqual((stats['jobs'], stats['total'], stats['open']), (2, 5, 2))
+        
+        out = StringIO()
+        with mock.patch('builtins.input', side_effect=['4', '5']):
+            call_command('manage_applications', email=self.company.email, stdout=out)
+        self.assertIn('Total de vagas publicadas: 2', out.getvalue())
+        self.assertIn('Aceitas: 1', out.getvalue())
+        self.assertIn('Taxa de aceitação: 20.0%', out.getvalue())
+    
+    def test_view_and_api_endpoint(self):
+        self.client.force_login(self.company)
+        response = self.client.get(reverse('core:job_applications', args=[self.job.id]))
+        self.assertEqual(
+            (response.context['pending_count'], response.context['accepted_count'], response.context['rejected_count']),
+            (2, 1, 2)
+        )
+        self.assertEqual(response.context['rejected_percentage'], 40)
+        
+        data = self.client.get(f'/api/v1/jobs/{self.job.id}/stats/').json()
+        self.assertEqual(data['by_status']['rejected'], 2)
+        
+        self.client.force_login(self.other_company)
+        self.assertEqual(self.client.get(f'/api/v1/jobs/{self.job.id}/stats/').status_code, 403)
@@ -0,0 +1,215 @@
+"""
+Timeline materializada (fan-out na escrita) do feed estilo Instagram.
+
+Quando um post é publicado, o id dele é copiado para a timeline de cada
+seguidor do autor (TimelineEntry). Ler o feed vira um slice indexado de
+``(user, -created_at)`` seguido da hidratação apenas dos posts da página.
+
+Empresas com muitos seguidores não são espalhadas: os posts delas são
+puxados na leitura e mesclados com a timeline (modo híbrido), para que uma
+publicação não gere milhares de INSERTs.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment, Follow, Like, Post, TimelineEntry
+from .pagination import decode_cursor, encode_cursor, keyset_filter, InvalidCursor
+from . import events, follow_graph
+
+User = get_user_model()
+
+FANOUT_BATCH_SIZE = 1000
+
+# Quantos comentários/curtidas de cada post são carregados para o card do feed
+COMMENT_PREVIEW_SIZE = 2
+LIKE_PREVIEW_SIZE = 3
+
+
+def _fanout_follower_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 5000)
+
+
+def _backfill_size():
+    return getattr(settings, 'TIMELINE_BACKFILL_SIZE', 50)
+
+
+def is_pull_author(author):
+    """Empresas acima do limite de seguidores têm os posts puxados na leitura"""
+    if not author.is_company():
+        return False
+    # Lê o contador guardado (a instância pode ser anterior ao último follow)
+    followers_count = User.objects.filter(pk=author.pk).values_list('followers_count', flat=True).first() or 0
+    return followers_count >= _fanout_follower_limit()
+
+
+def _entry(user_id, post):
+    return TimelineEntry(
+        user_id=user_id,
+        post_id=post.id,
+        author_id=post.author_id,
+        created_at=post.created_at,
+    )
+
+
+def fanout_post(post):
+    """Espalha um post ativo para a timeline do autor e dos seguidores"""
+    if not post.is_active:
+        return
+
+    # O autor sempre vê os próprios posts
+    TimelineEntry.objects.bulk_create([_entry(post.author_id, post)], ignore_conflicts=True)
+
+    if is_pull_author(post.author):
+        return
+
+    follower_ids = Follow.objects.filter(
+        following_id=post.author_id
+    ).values_list('follower_id', flat=True)
+
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.append(_entry(follower_id, post))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def remove_post(post):
+    """Remove um post (desativado) de todas as timelines"""
+    TimelineEntry.objects.filter(post=post).delete()
+
+
+def _backfill(user, author):
+    recent_posts = Post.objects.filter(
+        author=author,
+        is_active=True
+    ).order_by('-created_at').only('id', 'author_id', 'created_at')[:_backfill_size()]
+
+    TimelineEntry.objects.bulk_create(
+        [_entry(user.id, post) for post in recent_posts],
+        ignore_conflicts=True
+    )
+
+
+def follow(follower, followee):
+    """Traz os posts recentes de quem passou a ser seguido para a timeline"""
+    if not is_pull_author(followee):
+        _backfill(follower, followee)
+
+
+def unfollow(follower, followee):
+    """Remove da timeline os posts de quem deixou de ser seguido"""
+    TimelineEntry.objects.filter(user=follower, author=followee).delete()
+
+
+def rebuild(user):
+    """Reconstrói a timeline de um usuário a partir de quem ele segue"""
+    TimelineEntry.objects.filter(user=user).delete()
+
+    _backfill(user, user)
+    for followee in User.objects.filter(id__in=follow_graph.following_ids(user.id)):
+        follow(user, followee)
+
+
+def _pull_author_ids(user):
+    """Empresas seguidas pelo usuário que estão no modo de leitura"""
+    followee_ids = follow_graph.following_ids(user.id)
+    if not followee_ids:
+        return []
+
+    return list(
+        User.objects.filter(
+            id__in=followee_ids,
+            user_type='company',
+            followers_count__gte=_fanout_follower_limit()
+        ).values_list('id', flat=True)
+    )
+
+
+def read_timeline(user, cursor=None, limit=10):
+    """
+    Retorna ``(posts, next_cursor)`` com no máximo ``limit`` posts do feed.
+
+    ``cursor`` é o cursor opaco (core.pagination) do último post já exibido;
+    ``next_cursor`` aponta para a próxima página, ou é ``None`` no fim.
+    """
+    before = None
+    if cursor:
+        before = decode_cursor(cursor)
+        if len(before) != 2:
+            raise InvalidCursor(cursor)
+
+    entries = TimelineEntry.objects.filter(user=user)
+    if before:
+        entries = entries.filter(keyset_filter(('-created_at', '-post_id'), before))
+    keys = list(
+        entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit + 1]
+    )
+
+    # Modo híbrido: posts de empresas muito seguidas são puxados na leitura
+    pull_author_ids = _pull_author_ids(user)
+    if pull_author_ids:
+        pulled = Post.objects.filter(author_id__in=pull_author_ids, is_active=True)
+        if before:
+            pulled = pulled.filter(keyset_filter(('-created_at', '-id'), before))
+        keys.extend(
+            pulled.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit + 1]
+        )
+        keys = sorted(set(keys), reverse=True)
+
+    next_cursor = encode_cursor(keys[limit - 1]) if len(keys) > limit else None
+    keys = keys[:limit]
+
+    return hydrate_posts([post_id for _, post_id in keys], user), next_cursor
+
+
+def _latest_per_post(queryset, order_field, size):
+    """Limita uma relação às ``size`` linhas mais recentes de cada post (ROW_NUMBER),
+    devolvidas da mais antiga para a mais nova"""
+    return queryset.annotate(
+        preview_rank=Window(
+            expression=RowNumber(),
+            partition_by=F('post_id'),
+            order_by=[F(order_field).desc(), F('id').desc()],
+        )
+    ).filter(preview_rank__lte=size).select_related('user').order_by(order_field, 'id')
+
+
+def hydrate_posts(post_ids, viewer):
+    """
+    Carrega apenas os posts da página, preservando a ordem da timeline.
+
+    Em vez das relações inteiras, cada post traz prévias limitadas
+    (``preview_comments`` e ``preview_likes``); as curtidas do usuário são
+    resolvidas em uma única consulta para a página toda.
+    """
+    posts = Post.objects.filter(
+        id__in=post_ids,
+        is_active=True
+    ).select_related('author').prefetch_related(
+        Prefetch(
+            'comments',
+            queryset=_latest_per_post(Comment.objects.all(), 'created_at', COMMENT_PREVIEW_SIZE),
+            to_attr='preview_comments'
+        ),
+        Prefetch(
+            'likes',
+            queryset=_latest_per_post(Like.objects.all(), 'created_at', LIKE_PREVIEW_SIZE),
+            to_attr='preview_likes'
+        ),
+    )
+    posts_by_id = {post.id: post for post in posts}
+
+    # Inclui os likes do próprio usuário que ainda estão na fila de core.events
+    liked_post_ids = events.overlay_ids(
+        viewer.id, 'like', Like.objects.filter(user=viewer, post_id__in=post_ids).values_list('post_id', flat=True)
+    )
+
+    page = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+    for post in page:
+        post.user_liked = post.id in liked_post_ids
+    return page
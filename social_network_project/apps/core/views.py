@@ -2,21 +2,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.views.decorators.cache import cache_page
 from django.contrib import messages
-from django.db.models import Q, Count
-from django.core.paginator import Paginator
+from django.db.models import Q
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db import transaction
 import logging
 
 from .models import (
-    Post, Like, Comment, Follow, Story, StoryView,
-    JobListing, JobCategory, JobApplication
+    Post, Comment,
+    JobListing, JobApplication, adjust_counters
 )
-from .forms import PostForm, CommentForm, JobListingForm, JobApplicationForm
+from .forms import PostForm, JobListingForm, JobApplicationForm
+from .pagination import KeysetPaginator, InvalidCursor
+from .search import search_jobs
+from apps.messaging import stories as story_engine
+from . import application_stats, events, follow_graph, job_facets, render_cache, suggestions, tags, timeline
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -34,38 +36,60 @@ def search(request):
         results = Post.objects.none()
     return render(request, 'core/search.html', {'results': results, 'query': query})
 
-@login_required
+@render_cache.cache_anonymous_page(getattr(settings, 'JOB_LIST_PAGE_CACHE_TIMEOUT', 300), render_cache.JOBS_SCOPE)
 def vagas_list(request):
-    """Lista todas as vagas com filtros"""
+    """Lista todas as vagas com filtros (pública; cacheada inteira para visitantes)"""
     try:
-        jobs = JobListing.objects.filter(status='active').select_related('company', 'category')
-        categories = JobCategory.objects.all()
+        jobs = JobListing.objects.filter(status='active').select_related(
+            'company', 'category'
+        ).prefetch_related('normalized_tags')
+        
+        # Facetas com as contagens de vagas ativas (cacheadas, ver core.job_facets)
+        facets = job_facets.facets()
         
         # Filtros
         category_filter = request.GET.get('category')
         search_query = request.GET.get('q')
+        tag_filter = request.GET.get('tag')
+        job_type_filter = request.GET.get('job_type')
+        experience_filter = request.GET.get('experience_level')
+        location_filter = request.GET.get('location')
         
         if category_filter:
-            jobs = jobs.filter(category__slug=category_filter)
+            # slug -> id pelas facetas: filtra pelo índice (category, status) sem join
+            category_id = job_facets.category_id(category_filter, facets)
+            jobs = jobs.filter(category_id=category_id) if category_id else jobs.none()
+        
+        if job_type_filter:
+            jobs = jobs.filter(job_type=job_type_filter)
+        
+        if experience_filter:
+            jobs = jobs.filter(experience_level=experience_filter)
+        
+        if location_filter:
+            jobs = job_facets.filter_location(jobs, location_filter, facets)
+        
+        if tag_filter:
+            jobs = tags.filter_by_tag(jobs, tag_filter)
+        
+        # Paginação por cursor (índice status, -created_at)
+        ordering = ('-created_at', '-id')
         
         if search_query:
-            jobs = jobs.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(company__company_name__icontains=search_query) |
-                Q(tags__icontains=search_query)
-            )
+            # Índice full-text, mais relevantes primeiro
+            jobs = search_jobs(jobs, search_query)
+            ordering = ('-search_rank', '-id')
         
-        # Paginação
-        paginator = Paginator(jobs, 6)  # 6 vagas por página
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        paginator = KeysetPaginator(jobs, 6, ordering=ordering)  # 6 vagas por página
+        page_obj = paginator.get_page(request.GET.get('cursor'))
         
         context = {
             'page_obj': page_obj,
-            'categories': categories,
+            'facets': job_facets.with_selection(facets, request.GET),
+            'filter_querystring': job_facets.filter_querystring(request.GET),
             'current_category': category_filter,
             'search_query': search_query,
+            'current_tag': tag_filter,
         }
         
         return render(request, 'core/vagas_list.html', context)
@@ -75,7 +99,7 @@ def vagas_list(request):
         messages.error(request, 'Ocorreu um erro ao carregar as vagas. Tente novamente.')
         return render(request, 'core/vagas_list.html', {
             'page_obj': None,
-            'categories': [],
+            'facets': None,
             'current_category': None,
             'search_query': None,
         })
@@ -212,7 +236,9 @@ def my_jobs(request):
         messages.error(request, 'Acesso restrito para empresas.')
         return redirect('core:vagas_list')
     
-    jobs = JobListing.objects.filter(company=request.user).order_by('-created_at')
+    jobs = JobListing.objects.filter(company=request.user).prefetch_related(
+        'normalized_tags'
+    ).order_by('-created_at')
     
     context = {
         'jobs': jobs,
@@ -224,37 +250,31 @@ def my_jobs(request):
 def job_applications(request, job_id):
     """Ver candidaturas de uma vaga (apenas para o criador da vaga)"""
     job = get_object_or_404(JobListing, id=job_id, company=request.user)
-    applications = JobApplication.objects.filter(job=job).order_by('-applied_at')
+    applications = JobApplication.objects.filter(job=job).select_related('applicant').order_by('-applied_at')
     
-    # Estatísticas das candidaturas
-    total_count = applications.count()
-    accepted_count = applications.filter(status='accepted').count()
-    rejected_count = applications.filter(status='rejected').count()
-    pending_count = applications.filter(status='applied').count()
+    # Estatísticas das candidaturas (uma agregação, em cache por vaga)
+    stats = application_stats.for_job(job.id)
+    total_count = stats['total']
     
-    # Calcular porcentagens
     if total_count > 0:
-        pending_percentage = round((pending_count / total_count) * 100)
-        accepted_percentage = round((accepted_count / total_count) * 100)
-        rejected_percentage = round((rejected_count / total_count) * 100)
-        
         # Para o anel de progresso (circunferência total = 2 * π * raio)
         total_circumference = 2 * 3.14159 * 52  # raio = 52
         dash_offset = total_circumference * (1 - (total_count / max(total_count, 10)))
     else:
-        pending_percentage = accepted_percentage = rejected_percentage = 0
         total_circumference = 327
         dash_offset = 327
     
     context = {
         'job': job,
         'applications': applications,
-        'accepted_count': accepted_count,
-        'rejected_count': rejected_count,
-        'pending_count': pending_count,
-        'pending_percentage': pending_percentage,
-        'accepted_percentage': accepted_percentage,
-        'rejected_percentage': rejected_percentage,
+        'stats': stats,
+        'total_count': total_count,
+        'accepted_count': stats['by_status']['approved'],
+        'rejected_count': stats['by_status']['rejected'],
+        'pending_count': stats['open'],
+        'pending_percentage': round(stats['open'] * 100 / total_count) if total_count else 0,
+        'accepted_percentage': stats['percentages']['approved'],
+        'rejected_percentage': stats['percentages']['rejected'],
         'total_circumference': total_circumference,
         'dash_offset': dash_offset,
     }
@@ -265,35 +285,19 @@ def job_applications(request, job_id):
 def instagram_feed(request):
     """Feed principal estilo Instagram"""
     try:
-        # Posts dos usuários seguidos + próprios posts
-        following_users = request.user.following.values_list('following', flat=True)
-        
-        posts = Post.objects.filter(
-            Q(author__in=following_users) | Q(author=request.user),
-            is_active=True
-        ).select_related('author').prefetch_related('likes', 'comments__user')
-        
-        # Stories ativos
-        stories = Story.objects.filter(
-            user__in=following_users,
-            expires_at__gt=timezone.now()
-        ).select_related('user').annotate(
-            view_count=Count('views')
-        ).order_by('-created_at')
-        
-        # Adicionar informações de like para cada post
-        liked_posts = Like.objects.filter(
-            user=request.user,
-            post__in=posts
-        ).values_list('post_id', flat=True)
+        # Posts dos usuários seguidos + próprios posts, lidos da timeline materializada
+        try:
+            posts, next_cursor = timeline.read_timeline(
+                request.user, cursor=request.GET.get('cursor'), limit=10
+            )
+        except InvalidCursor:
+            posts, next_cursor = timeline.read_timeline(request.user, limit=10)
         
-        for post in posts:
-            post.user_liked = post.id in liked_posts
+        # Stories ativos dos seguidos, da mesma bandeja cacheada do stories_feed
+        stories = story_engine.following_tray(request.user)
         
-        # Paginação
-        paginator = Paginator(posts, 10)
-        page_number = request.GET.get('page')
-        posts_page = paginator.get_page(page_number)
+        # Quem seguir: top-K pré-calculado por build_suggestions
+        suggested_users = suggestions.suggestions_for(request.user, limit=5)
         
         # Empresas para perfis
         companies = User.objects.filter(user_type='company').values(
@@ -301,8 +305,12 @@ def instagram_feed(request):
         )
         
         context = {
-            'posts': posts_page,
+            'posts': posts,
+            'next_cursor': next_cursor,
             'stories': stories,
+            'story_tray_scopes': story_engine.tray_scopes(request.user),
+            'story_tray_timeout': getattr(settings, 'STORY_TRAY_CACHE_TIMEOUT', 60),
+            'suggestions': suggested_users,
             'form': PostForm(),
             'companies': list(companies),
         }
@@ -315,6 +323,7 @@ def instagram_feed(request):
         return render(request, 'core/instagram_feed.html', {
             'posts': [],
             'stories': [],
+            'suggestions': [],
             'form': PostForm(),
             'companies': [],
         })
@@ -327,18 +336,13 @@ def like_post(request, post_id):
     """Toggle like em um post"""
     try:
         post = get_object_or_404(Post, id=post_id)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        
-        if not created:
-            like.delete()
-            liked = False
-        else:
-            liked = True
+        # Gravado em lote (core.events); a resposta já reflete o clique
+        liked, likes_count = events.toggle_like(request.user, post)
         
         return JsonResponse({
             'success': True,
             'liked': liked,
-            'likes_count': post.likes.count()
+            'likes_count': likes_count
         })
     
     except Exception as e:
@@ -375,6 +379,7 @@ def add_comment(request, post_id):
             post=post,
             content=content
         )
+        adjust_counters(post, refresh=False, comments_count=1)
         
         logger.info(f"User {request.user.username} commented on post {post_id}")
         
@@ -405,6 +410,7 @@ def create_post(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            timeline.fanout_post(post)
             messages.success(request, 'Post criado com sucesso!')
             return redirect('core:instagram_feed')
     else:
@@ -413,38 +419,6 @@ def create_post(request):
     return render(request, 'core/create_post.html', {'form': form})
 
 
-@login_required
-def view_story(request, story_id):
-    """Visualizar story"""
-    story = get_object_or_404(Story, id=story_id)
-    
-    # Registrar visualização
-    StoryView.objects.get_or_create(story=story, user=request.user)
-    
-    # Buscar próximo story
-    next_story = Story.objects.filter(
-        user=story.user,
-        created_at__gt=story.created_at,
-        expires_at__gt=timezone.now()
-    ).first()
-    
-    # Se não há próximo do mesmo usuário, buscar de outro usuário
-    if not next_story:
-        following_users = request.user.following.values_list('following', flat=True)
-        next_story = Story.objects.filter(
-            user__in=following_users,
-            expires_at__gt=timezone.now()
-        ).exclude(id=story.id).first()
-    
-    context = {
-        'story': story,
-        'next_story': next_story,
-        'views_count': story.views.count()
-    }
-    
-    return render(request, 'core/story_view.html', context)
-
-
 @login_required
 def user_profile_feed(request, username):
     """Perfil do usuário com grid de posts"""
@@ -452,18 +426,15 @@ def user_profile_feed(request, username):
     posts = Post.objects.filter(author=user, is_active=True)
     
     # Verificar se segue o usuário
-    is_following = Follow.objects.filter(
-        follower=request.user, 
-        following=user
-    ).exists() if request.user != user else False
+    is_following = follow_graph.is_following(request.user.id, user.id) if request.user != user else False
     
     context = {
         'profile_user': user,
         'posts': posts,
         'is_following': is_following,
         'posts_count': posts.count(),
-        'followers_count': user.followers.count(),
-        'following_count': user.following.count(),
+        'followers_count': user.followers_count,
+        'following_count': user.following_count,
     }
     
     return render(request, 'core/user_profile_feed.html', context)
@@ -478,24 +449,20 @@ def follow_user(request, user_id):
     if user_to_follow == request.user:
         return JsonResponse({'success': False, 'message': 'Não é possível seguir a si mesmo'})
     
-    follow, created = Follow.objects.get_or_create(
-        follower=request.user,
-        following=user_to_follow
-    )
+    following = follow_graph.toggle_follow(request.user, user_to_follow)
     
-    if not created:
-        follow.delete()
-        following = False
+    if not following:
+        timeline.unfollow(request.user, user_to_follow)
         message = f'Você não segue mais {user_to_follow.username}'
     else:
-        following = True
+        timeline.follow(request.user, user_to_follow)
         message = f'Você agora segue {user_to_follow.username}'
     
     return JsonResponse({
         'success': True,
         'following': following,
         'message': message,
-        'followers_count': user_to_follow.followers.count()
+        'followers_count': user_to_follow.followers_count
     })
 
 # Compatibilidade com a view antiga
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, ChatMessage, Story, StoryView
+from .models import Conversation, ChatMessage, Story, StoryView, ArchivedStory
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
@@ -8,6 +8,9 @@ class ConversationAdmin(admin.ModelAdmin):
     search_fields = ['participants__nickname', 'participants__email']
     filter_horizontal = ['participants']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('participants')
+    
     def get_participants(self, obj):
         return " & ".join([user.nickname for user in obj.participants.all()])
     get_participants.short_description = 'Participantes'
@@ -35,4 +38,11 @@ class StoryViewAdmin(admin.ModelAdmin):
     list_display = ['story', 'viewer', 'viewed_at']
     list_filter = ['viewed_at']
     search_fields = ['story__title', 'viewer__nickname']
-    readonly_fields = ['viewed_at']
\ No newline at end of file
+    readonly_fields = ['viewed_at']
+
+@admin.register(ArchivedStory)
+class ArchivedStoryAdmin(admin.ModelAdmin):
+    list_display = ['title', 'user', 'story_type', 'expires_at', 'views_count', 'archived_at']
+    list_filter = ['story_type', 'archived_at']
+    search_fields = ['title', 'user__nickname']
+    readonly_fields = ['original_id', 'archived_at']
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class MessagingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.messaging'
\ No newline at end of file
+    name = 'apps.messaging'
+
+    def ready(self):
+        from . import signals
@@ -1,10 +1,47 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+import asyncio
 import json
 
+from apps.core.pagination import InvalidCursor
+from .models import Conversation
+from .writer import get_write_buffer
+from . import history, unread
+
+# Códigos de fechamento (faixa 4000-4999 é livre para a aplicação)
+CLOSE_UNAUTHENTICATED = 4401
+CLOSE_FORBIDDEN = 4403
+
+MAX_MESSAGE_LENGTH = 5000
+
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chat de uma conversa via WebSocket.
+
+    Só participantes autenticados da conversa conectam. As mensagens são
+    gravadas pelo buffer de messaging.writer; depois de gravadas o remetente
+    recebe um ``ack`` com o id e o timestamp do servidor e a conversa recebe
+    a mensagem. Frames aceitos:
+
+    - ``{"type": "message", "content": "...", "client_id": "..."}``
+    - ``{"type": "read"}``: marca as mensagens recebidas como lidas
+    - ``{"type": "history", "cursor": "...", "limit": 50}``: janela de
+      mensagens anteriores (ver messaging.history)
+    """
+
     async def connect(self):
-        self.room_name = self.scope['url_route']['kwargs']['room_name']
-        self.room_group_name = f'chat_{self.room_name}'
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+
+        self.conversation_id = int(self.scope['url_route']['kwargs']['conversation_id'])
+        if not await self.is_participant():
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+
+        self.room_group_name = f'chat_{self.conversation_id}'
+        self.pending_sends = set()
 
         # Join room group
         await self.channel_layer.group_add(
@@ -15,29 +52,111 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
     async def disconnect(self, close_code):
+        if not hasattr(self, 'room_group_name'):
+            return
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
+    @database_sync_to_async
+    def is_participant(self):
+        return Conversation.objects.filter(id=self.conversation_id, participants=self.user).exists()
+
+    @database_sync_to_async
+    def mark_read(self):
+        conversation = Conversation(id=self.conversation_id)
+        return unread.mark_read(conversation, self.user)
+
+    @database_sync_to_async
+    def load_history(self, cursor, limit):
+        chat_messages, next_cursor = history.history_page(self.conversation_id, cursor, limit)
+        return [history.serialize_message(message) for message in chat_messages], next_cursor
+
+    async def send_json(self, payload):
+        await self.send(text_data=json.dumps(payload))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or '')
+        except json.JSONDecodeError:
+            await self.send_json({'type': 'error', 'error': 'JSON inválido'})
+            return
+        if not isinstance(data, dict):
+            await self.send_json({'type': 'error', 'error': 'Frame inválido'})
+            return
+
+        frame_type = data.get('type', 'message')
+        if frame_type == 'message':
+            await self.receive_message(data)
+        elif frame_type == 'read':
+            await self.mark_read()
+        elif frame_type == 'history':
+            await self.receive_history(data)
+        else:
+            await self.send_json({'type': 'error', 'error': f'Tipo desconhecido: {frame_type}'})
+
+    async def receive_message(self, data):
+        # 'message' é o formato antigo do frame
+        content = str(data.get('content', data.get('message', ''))).strip()
+        client_id = data.get('client_id')
+        if not content or len(content) > MAX_MESSAGE_LENGTH:
+            await self.send_json({'type': 'error', 'client_id': client_id, 'error': 'Mensagem inválida'})
+            return
+
+        # Não espera o lote aqui, para o próximo frame do cliente entrar no mesmo lote
+        task = asyncio.ensure_future(self.persist_and_broadcast(content, client_id))
+        self.pending_sends.add(task)
+        task.add_done_callback(self.pending_sends.discard)
+
+    async def receive_history(self, data):
+        try:
+            limit = int(data.get('limit', history.HISTORY_PAGE_SIZE))
+            chat_messages, next_cursor = await self.load_history(data.get('cursor'), limit)
+        except (TypeError, ValueError, InvalidCursor):
+            await self.send_json({'type': 'error', 'error': 'Cursor inválido'})
+            return
+        await self.send_json({'type': 'history', 'messages': chat_messages, 'next_cursor': next_cursor})
+
+    async def persist_and_broadcast(self, content, client_id):
+        try:
+            message = await get_write_buffer().submit(self.conversation_id, self.user.id, content)
+        except Exception:
+            await self.send_json({'type': 'error', 'client_id': client_id, 'error': 'Não foi possível enviar'})
+            return
+
+        timestamp = message.timestamp.isoformat()
+        await self.send_json({
+            'type': 'ack',
+            'client_id': client_id,
+            'id': message.id,
+            'timestamp': timestamp,
+        })
 
         # Send message to room group
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
-                'message': message
+                'id': message.id,
+                'sender_id': self.user.id,
+                'sender': self.user.nickname,
+                'content': message.content,
+                'timestamp': timestamp,
             }
         )
 
     async def chat_message(self, event):
-        message = event['message']
-
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'message': message
-        }))
\ No newline at end of file
+        await self.send_json({
+            'type': 'message',
+            'id': event['id'],
+            'sender_id': event['sender_id'],
+            'sender': event['sender'],
+            'content': event['content'],
+            'timestamp': event['timestamp'],
+            # Compatibilidade com clientes do formato antigo
+            'message': event['content'],
+        })
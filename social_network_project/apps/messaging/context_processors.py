@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import unread
+
+
+def unread_messages(request):
+    """Total de mensagens não lidas para o badge do menu (calculado só se o template usar)"""
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return {}
+    return {'unread_messages_count': SimpleLazyObject(lambda: unread.total_unread(user))}
@@ -0,0 +1,68 @@
+"""
+Entrada e saída de grupos de estudo.
+
+``StudyGroup.members_count`` é a fonte do limite de vagas: ``join`` reserva a
+vaga com um UPDATE condicional (``members_count < max_members``) e só então
+grava a participação, na mesma transação. Dois estudantes disputando a
+última vaga não lotam o grupo além do limite: o segundo UPDATE não encontra
+a linha e a entrada é recusada.
+
+``join``/``leave`` gravam direto na tabela de membros (sem m2m_changed), então
+ajustam o contador e as sugestões aqui; alterações feitas por
+``group.members.add/remove`` (criação do grupo, admin) ajustam o contador no
+signal.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from apps.core import suggestions
+from apps.core.models import adjust_counters
+
+from .models import StudyGroup
+
+Membership = StudyGroup.members.through
+
+JOINED = 'joined'
+ALREADY_MEMBER = 'member'
+FULL = 'full'
+
+
+def is_member(group, user):
+    """Consulta pelo índice único (grupo, usuário) da tabela de membros"""
+    return Membership.objects.filter(studygroup_id=group.pk, customuser_id=user.pk).exists()
+
+
+def join(group, user):
+    """Coloca ``user`` em ``group``; retorna JOINED, ALREADY_MEMBER ou FULL"""
+    if is_member(group, user):
+        return ALREADY_MEMBER
+
+    try:
+        with transaction.atomic():
+            reserved = StudyGroup.objects.filter(
+                pk=group.pk,
+                is_active=True,
+                members_count__lt=F('max_members')
+            ).update(members_count=F('members_count') + 1)
+            if not reserved:
+                return FULL
+            Membership.objects.create(studygroup_id=group.pk, customuser_id=user.pk)
+    except IntegrityError:
+        # O mesmo usuário entrou por outro request; a reserva foi desfeita no rollback
+        return ALREADY_MEMBER
+
+    group.refresh_from_db(fields=['members_count'])
+    suggestions.mark_stale([user.pk, *group.members.values_list('id', flat=True)])
+    return JOINED
+
+
+def leave(group, user):
+    """Tira ``user`` de ``group``; retorna False se ele não era membro"""
+    with transaction.atomic():
+        deleted, _ = Membership.objects.filter(studygroup_id=group.pk, customuser_id=user.pk).delete()
+        if not deleted:
+            return False
+        adjust_counters(group, members_count=-1)
+
+    suggestions.mark_stale([user.pk, *group.members.values_list('id', flat=True)])
+    return True
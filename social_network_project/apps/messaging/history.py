@@ -0,0 +1,41 @@
+"""
+Histórico do chat em janelas paginadas por chave.
+
+A conversa abre com as HISTORY_PAGE_SIZE mensagens mais recentes; as
+anteriores são buscadas sob demanda (rolagem para cima) com o cursor opaco
+de core.pagination sobre ``(timestamp, id)``. O índice
+``(conversation, -timestamp, -id)`` faz de cada janela uma busca no índice,
+então o custo não depende do tamanho da conversa.
+"""
+from apps.core.pagination import KeysetPaginator
+
+from .models import ChatMessage
+
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+
+def history_page(conversation_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Retorna ``(mensagens, cursor_anterior)``.
+
+    As mensagens vêm da mais antiga para a mais nova (ordem de exibição);
+    ``cursor_anterior`` busca a janela anterior, ou é ``None`` no início da
+    conversa. Levanta InvalidCursor para cursores adulterados.
+    """
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+    messages = ChatMessage.objects.filter(conversation_id=conversation_id).select_related('sender')
+    page = KeysetPaginator(messages, limit, ordering=('-timestamp', '-id')).page(cursor)
+    return list(reversed(page.object_list)), page.next_cursor
+
+
+def serialize_message(message):
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'sender': message.sender.nickname,
+        'content': message.content,
+        'message_type': message.message_type,
+        'timestamp': message.timestamp.isoformat(),
+        'is_read': message.is_read,
+    }
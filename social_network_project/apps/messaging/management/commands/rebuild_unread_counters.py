@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.messaging import unread
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de mensagens não lidas a partir de ChatMessage.is_read'
+
+    def handle(self, *args, **options):
+        counters_count = unread.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {counters_count} conversas com mensagens não lidas ({unread.get_backend().__class__.__name__})"
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from apps.messaging import sweeper
+
+class Command(BaseCommand):
+    help = 'Move os stories expirados (e suas visualizações) para o arquivo e apaga as mídias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Stories por lote (padrão: STORY_SWEEP_BATCH_SIZE)')
+        parser.add_argument('--max-batches', type=int, default=None, help='Para depois de N lotes')
+        parser.add_argument('--pause-ms', type=int, default=None, help='Pausa entre lotes (padrão: STORY_SWEEP_PAUSE_MS)')
+
+    def handle(self, *args, **options):
+        archived_count = sweeper.sweep_expired(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            pause_ms=options['pause_ms']
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ {archived_count} stories expirados arquivados"))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    StudentPost = apps.get_model('messaging', 'StudentPost')
+    PostLike = apps.get_model('messaging', 'PostLike')
+    PostComment = apps.get_model('messaging', 'PostComment')
+
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+                total=Count('pk')
+            ).values('total')
+        ), Value(0))
+
+    StudentPost.objects.update(likes_count=count_of(PostLike), comments_count=count_of(PostComment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_alter_story_options_story_external_link_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentpost',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentpost',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
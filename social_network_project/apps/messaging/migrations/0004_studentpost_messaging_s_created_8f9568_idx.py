@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_studentpost_comments_count_studentpost_likes_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentpost',
+            index=models.Index(fields=['-created_at', 'is_active'], name='messaging_s_created_8f9568_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tag_joblisting_normalized_tags_post_normalized_tags'),
+        ('messaging', '0004_studentpost_messaging_s_created_8f9568_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentpost',
+            name='normalized_tags',
+            field=models.ManyToManyField(blank=True, related_name='student_posts', to='core.tag'),
+        ),
+    ]
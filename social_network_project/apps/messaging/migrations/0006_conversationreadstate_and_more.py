@@ -0,0 +1,78 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def backfill_read_states(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ChatMessage = apps.get_model('messaging', 'ChatMessage')
+    ConversationReadState = apps.get_model('messaging', 'ConversationReadState')
+
+    # Não lidas de (conversa, usuário) = não lidas da conversa - as enviadas por ele
+    unread_by_sender = {}
+    unread_total = {}
+    rows = ChatMessage.objects.filter(is_read=False).values('conversation_id', 'sender_id').annotate(
+        total=Count('pk')
+    ).order_by()
+    for row in rows:
+        unread_by_sender[(row['conversation_id'], row['sender_id'])] = row['total']
+        unread_total[row['conversation_id']] = unread_total.get(row['conversation_id'], 0) + row['total']
+
+    participants = Conversation.participants.through.objects.values_list('conversation_id', 'customuser_id')
+    ConversationReadState.objects.bulk_create(
+        [
+            ConversationReadState(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                unread_count=unread_total.get(conversation_id, 0) - unread_by_sender.get((conversation_id, user_id), 0)
+            )
+            for conversation_id, user_id in participants.iterator()
+        ],
+        ignore_conflicts=True,
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0005_studentpost_normalized_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['conversation', 'is_read', 'sender'], name='messaging_c_convers_1d2565_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversationreadstate',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='messaging.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationreadstate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_read_states', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='conversationreadstate',
+            index=models.Index(fields=['user', 'unread_count'], name='messaging_c_user_id_283b0d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversationreadstate',
+            unique_together={('conversation', 'user')},
+        ),
+        migrations.RunPython(backfill_read_states, migrations.RunPython.noop),
+    ]
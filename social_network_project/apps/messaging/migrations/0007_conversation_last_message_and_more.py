@@ -0,0 +1,74 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_snapshots(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ChatMessage = apps.get_model('messaging', 'ChatMessage')
+
+    participants = {}
+    for conversation_id, user_id in Conversation.participants.through.objects.values_list('conversation_id', 'customuser_id'):
+        participants.setdefault(conversation_id, []).append(user_id)
+
+    conversations = list(Conversation.objects.all())
+    for conversation in conversations:
+        user_ids = sorted(participants.get(conversation.id, []))
+        if len(user_ids) == 2:
+            conversation.participant_key = f'{user_ids[0]}:{user_ids[1]}'
+
+        last = ChatMessage.objects.filter(conversation_id=conversation.id).order_by('-timestamp', '-id').first()
+        if last:
+            conversation.last_message_id = last.id
+            conversation.last_message_preview = last.content[:120]
+            conversation.last_message_sender_id = last.sender_id
+            conversation.last_message_at = last.timestamp
+
+    Conversation.objects.bulk_update(
+        conversations,
+        ['participant_key', 'last_message', 'last_message_preview', 'last_message_sender', 'last_message_at'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0006_conversationreadstate_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.chatmessage'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_key',
+            field=models.CharField(blank=True, db_index=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_message_at'], name='messaging_c_last_me_3f31f1_idx'),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
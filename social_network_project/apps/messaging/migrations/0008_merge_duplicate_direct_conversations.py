@@ -0,0 +1,57 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:17
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_conversations(apps, schema_editor):
+    """Junta conversas diretas repetidas na mais antiga antes da restrição única"""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ChatMessage = apps.get_model('messaging', 'ChatMessage')
+    ConversationReadState = apps.get_model('messaging', 'ConversationReadState')
+
+    duplicated = Conversation.objects.exclude(participant_key='').values('participant_key').annotate(
+        total=Count('id'),
+        keep_id=Min('id')
+    ).filter(total__gt=1).order_by()
+
+    for row in duplicated:
+        keep_id = row['keep_id']
+        duplicate_ids = list(
+            Conversation.objects.filter(participant_key=row['participant_key']).exclude(
+                id=keep_id
+            ).values_list('id', flat=True)
+        )
+
+        ChatMessage.objects.filter(conversation_id__in=duplicate_ids).update(conversation_id=keep_id)
+
+        for state in ConversationReadState.objects.filter(conversation_id__in=duplicate_ids):
+            kept, _ = ConversationReadState.objects.get_or_create(conversation_id=keep_id, user_id=state.user_id)
+            kept.unread_count += state.unread_count
+            if state.last_read_at and (not kept.last_read_at or state.last_read_at > kept.last_read_at):
+                kept.last_read_at = state.last_read_at
+            kept.save()
+
+        # Participantes e estados de leitura das repetidas caem em cascata
+        Conversation.objects.filter(id__in=duplicate_ids).delete()
+
+        last = ChatMessage.objects.filter(conversation_id=keep_id).order_by('-timestamp', '-id').first()
+        if last:
+            Conversation.objects.filter(id=keep_id).update(
+                last_message_id=last.id,
+                last_message_preview=last.content[:120],
+                last_message_sender_id=last.sender_id,
+                last_message_at=last.timestamp,
+                updated_at=last.timestamp,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0007_conversation_last_message_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0008_merge_duplicate_direct_conversations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversation',
+            name='participant_key',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('participant_key', ''), _negated=True), fields=('participant_key',), name='unique_direct_conversation'),
+        ),
+    ]
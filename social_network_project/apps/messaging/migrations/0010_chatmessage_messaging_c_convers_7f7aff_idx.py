@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0009_direct_conversation_unique_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['conversation', '-timestamp', '-id'], name='messaging_c_convers_7f7aff_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0010_chatmessage_messaging_c_convers_7f7aff_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='background_color',
+            field=models.CharField(default='#000000', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='link_text',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='text_color',
+            field=models.CharField(default='#FFFFFF', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='video',
+            field=models.FileField(blank=True, help_text='Vídeo do story', null=True, upload_to='stories/videos/'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['user', 'expires_at'], name='messaging_s_user_id_c18cbc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['expires_at'], name='messaging_s_expires_886554_idx'),
+        ),
+    ]
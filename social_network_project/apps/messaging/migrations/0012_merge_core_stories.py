@@ -0,0 +1,62 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:22
+
+from django.db import migrations
+
+
+def merge_core_stories(apps, schema_editor):
+    """Copia core.Story/core.StoryView para as tabelas de messaging"""
+    CoreStory = apps.get_model('core', 'Story')
+    CoreStoryView = apps.get_model('core', 'StoryView')
+    Story = apps.get_model('messaging', 'Story')
+    StoryView = apps.get_model('messaging', 'StoryView')
+
+    originals = list(CoreStory.objects.order_by('id'))
+    if not originals:
+        return
+
+    copies = []
+    for original in originals:
+        text = original.text_content.strip()
+        copies.append(Story(
+            user_id=original.user_id,
+            title=(text.splitlines()[0] if text else 'Story')[:100],
+            content=original.text_content,
+            image=original.image.name if original.image else None,
+            video=original.video.name if original.video else None,
+            external_link=original.external_link,
+            link_text=original.link_text,
+            background_color=original.background_color,
+            text_color=original.text_color,
+            expires_at=original.expires_at,
+        ))
+    Story.objects.bulk_create(copies, batch_size=500)
+
+    # created_at/viewed_at são auto_now_add: o bulk_create grava "agora"
+    for original, copy in zip(originals, copies):
+        copy.created_at = original.created_at
+    Story.objects.bulk_update(copies, ['created_at'], batch_size=500)
+
+    story_ids = {original.id: copy.id for original, copy in zip(originals, copies)}
+    views = list(CoreStoryView.objects.order_by('id'))
+    StoryView.objects.bulk_create([
+        StoryView(story_id=story_ids[view.story_id], viewer_id=view.user_id)
+        for view in views
+    ], batch_size=500, ignore_conflicts=True)
+
+    viewed_at = {(story_ids[view.story_id], view.user_id): view.viewed_at for view in views}
+    copied_views = list(StoryView.objects.filter(story_id__in=story_ids.values()))
+    for view in copied_views:
+        view.viewed_at = viewed_at[(view.story_id, view.viewer_id)]
+    StoryView.objects.bulk_update(copied_views, ['viewed_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_backfill_tags'),
+        ('messaging', '0011_story_video_story_link_text_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_core_stories, migrations.RunPython.noop),
+    ]
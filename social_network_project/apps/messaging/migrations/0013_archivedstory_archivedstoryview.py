@@ -0,0 +1,53 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0012_merge_core_stories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.PositiveIntegerField(help_text='Id do story na tabela Story', unique=True)),
+                ('title', models.CharField(max_length=100)),
+                ('content', models.TextField(blank=True)),
+                ('story_type', models.CharField(max_length=20)),
+                ('external_link', models.URLField(blank=True, null=True)),
+                ('link_text', models.CharField(blank=True, max_length=50)),
+                ('views_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_stories', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived stories',
+                'ordering': ['-expires_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedStoryView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed_at', models.DateTimeField()),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='views', to='messaging.archivedstory')),
+                ('viewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('story', 'viewer')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedstory',
+            index=models.Index(fields=['user', '-expires_at'], name='messaging_a_user_id_1a9803_idx'),
+        ),
+    ]
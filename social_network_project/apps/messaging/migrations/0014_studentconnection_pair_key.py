@@ -0,0 +1,54 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+# Ao deduplicar pares, fica a conexão com o status de maior prioridade (depois a mais antiga)
+STATUS_PRIORITY = {'blocked': 0, 'accepted': 1, 'pending': 2, 'rejected': 3}
+
+
+def fill_pair_keys(apps, schema_editor):
+    """Preenche pair_key e apaga as conexões duplicadas em sentido inverso (A->B e B->A)"""
+    StudentConnection = apps.get_model('messaging', 'StudentConnection')
+
+    by_pair = {}
+    for connection in StudentConnection.objects.order_by('created_at', 'id'):
+        low, high = sorted([connection.from_student_id, connection.to_student_id])
+        connection.pair_key = f'{low}:{high}'
+        by_pair.setdefault(connection.pair_key, []).append(connection)
+
+    keep, duplicates = [], []
+    for connections in by_pair.values():
+        connections.sort(key=lambda connection: STATUS_PRIORITY.get(connection.status, len(STATUS_PRIORITY)))
+        keep.append(connections[0])
+        duplicates.extend(connection.id for connection in connections[1:])
+
+    StudentConnection.objects.filter(id__in=duplicates).delete()
+    StudentConnection.objects.bulk_update(keep, ['pair_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0013_archivedstory_archivedstoryview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentconnection',
+            name='pair_key',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.RunPython(fill_pair_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='studentconnection',
+            index=models.Index(fields=['from_student', 'status'], name='messaging_s_from_st_ad3f3a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentconnection',
+            index=models.Index(fields=['to_student', 'status'], name='messaging_s_to_stud_2f69fc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentconnection',
+            constraint=models.UniqueConstraint(fields=('pair_key',), name='unique_student_connection_pair'),
+        ),
+    ]
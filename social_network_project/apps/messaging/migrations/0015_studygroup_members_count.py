@@ -0,0 +1,30 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_members_count(apps, schema_editor):
+    StudyGroup = apps.get_model('messaging', 'StudyGroup')
+    Membership = StudyGroup.members.through
+    counts = Membership.objects.filter(studygroup=OuterRef('pk')).values('studygroup').annotate(
+        total=Count('id')
+    ).values('total')
+    StudyGroup.objects.update(members_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0014_studentconnection_pair_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studygroup',
+            name='members_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_members_count, migrations.RunPython.noop),
+    ]
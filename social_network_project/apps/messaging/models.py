@@ -1,5 +1,5 @@
 # apps/messaging/models.py
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
@@ -10,18 +10,73 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Chave "menor_id:maior_id" das conversas diretas (mantida pelo m2m_changed),
+    # única entre as conversas diretas
+    participant_key = models.CharField(max_length=50, blank=True)
+    
+    # Resumo da última mensagem, atualizado a cada envio (ver snapshot_fields)
+    last_message = models.ForeignKey('ChatMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=120, blank=True)
+    last_message_sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['-last_message_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['participant_key'],
+                condition=~models.Q(participant_key=''),
+                name='unique_direct_conversation',
+            ),
+        ]
     
     def __str__(self):
+        # Usa o prefetch de participants quando houver
         users = list(self.participants.all())
         if len(users) >= 2:
             return f"Chat entre {users[0].nickname} e {users[1].nickname}"
         return f"Chat {self.id}"
     
-    @property
-    def last_message(self):
-        return self.messages.last()
+    @staticmethod
+    def pair_key(user_id, other_user_id):
+        low, high = sorted([user_id, other_user_id])
+        return f'{low}:{high}'
+    
+    @classmethod
+    def get_or_create_direct(cls, user, other_user):
+        """
+        Conversa direta entre dois usuários, em uma busca pela chave do par.
+        
+        A restrição única resolve a corrida entre dois requests criando a
+        mesma conversa: quem perde reutiliza a conversa do outro.
+        """
+        participant_key = cls.pair_key(user.id, other_user.id)
+        conversation = cls.objects.filter(participant_key=participant_key).first()
+        if conversation:
+            return conversation, False
+        
+        try:
+            with transaction.atomic():
+                conversation = cls.objects.create(participant_key=participant_key)
+                conversation.participants.add(user, other_user)
+        except IntegrityError:
+            return cls.objects.get(participant_key=participant_key), False
+        return conversation, True
+    
+    @staticmethod
+    def snapshot_fields(message):
+        """Campos do resumo de ``message`` para um ``update()`` da conversa"""
+        preview_length = Conversation._meta.get_field('last_message_preview').max_length
+        return {
+            'last_message_id': message.id,
+            'last_message_preview': message.content[:preview_length],
+            'last_message_sender_id': message.sender_id,
+            'last_message_at': message.timestamp,
+            'updated_at': message.timestamp,
+        }
 
 class ChatMessage(models.Model):
     """Mensagem individual em uma conversa"""
@@ -38,16 +93,51 @@ class ChatMessage(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Cobre o UPDATE de "marcar como lidas" (ver messaging.unread.mark_read)
+            models.Index(fields=['conversation', 'is_read', 'sender']),
+            # Janelas do histórico (ver messaging.history)
+            models.Index(fields=['conversation', '-timestamp', '-id']),
+        ]
 
     def __str__(self):
         return f'{self.sender.nickname}: {self.content[:50]}...'
 
+class ConversationReadState(models.Model):
+    """
+    Estado de leitura de um participante em uma conversa.
+    
+    ``unread_count`` é o contador usado pelo backend 'db' de messaging.unread
+    (com Redis os contadores ficam lá); ``last_read_at`` é o recibo de
+    leitura e é gravado nos dois backends.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversation_read_states')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['conversation', 'user']
+        indexes = [
+            models.Index(fields=['user', 'unread_count']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.nickname} - conversa {self.conversation_id} ({self.unread_count} não lidas)"
+
 class Story(models.Model):
-    """Stories das empresas para mostrar vagas, projetos, etc."""
+    """
+    Stories dos usuários (vagas, projetos, avisos...).
+
+    É a única tabela de stories do projeto: a bandeja de stories_feed e a do
+    instagram_feed leem daqui, e stories novos/visualizações entram por
+    messaging.stories (publish_story/record_view).
+    """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stories')
     title = models.CharField(max_length=100, help_text="Título do story")
     content = models.TextField(help_text="Conteúdo principal do story")
     image = models.ImageField(upload_to='stories/', blank=True, null=True, help_text="Imagem do story")
+    video = models.FileField(upload_to='stories/videos/', blank=True, null=True, help_text="Vídeo do story")
     story_type = models.CharField(max_length=20, choices=[
         ('job', 'Nova Vaga'),
         ('project', 'Novo Projeto'),
@@ -62,6 +152,11 @@ class Story(models.Model):
     related_job = models.ForeignKey('core.JobListing', on_delete=models.CASCADE, blank=True, null=True, 
                                     help_text="Vaga relacionada ao story")
     external_link = models.URLField(blank=True, null=True, help_text="Link externo relacionado")
+    link_text = models.CharField(max_length=50, blank=True)
+    
+    # Aparência dos stories só de texto
+    background_color = models.CharField(max_length=7, default='#000000')
+    text_color = models.CharField(max_length=7, default='#FFFFFF')
     
     # Configurações de tempo
     created_at = models.DateTimeField(auto_now_add=True)
@@ -74,6 +169,11 @@ class Story(models.Model):
     class Meta:
         ordering = ['-is_highlighted', '-created_at']
         verbose_name_plural = 'Stories'
+        indexes = [
+            # Stories ativos de um autor e varredura dos expirados
+            models.Index(fields=['user', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.expires_at:
@@ -113,6 +213,42 @@ class StoryView(models.Model):
         return f"{self.viewer.nickname} viu story de {self.story.user.nickname}"
 
 
+class ArchivedStory(models.Model):
+    """Stories expirados, movidos para cá pelo sweeper (ver messaging.sweeper)"""
+    original_id = models.PositiveIntegerField(unique=True, help_text="Id do story na tabela Story")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_stories')
+    title = models.CharField(max_length=100)
+    content = models.TextField(blank=True)
+    story_type = models.CharField(max_length=20)
+    external_link = models.URLField(blank=True, null=True)
+    link_text = models.CharField(max_length=50, blank=True)
+    views_count = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-expires_at']
+        verbose_name_plural = 'Archived stories'
+        indexes = [
+            models.Index(fields=['user', '-expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} (arquivado)"
+
+
+class ArchivedStoryView(models.Model):
+    """Visualizações dos stories arquivados"""
+    story = models.ForeignKey(ArchivedStory, on_delete=models.CASCADE, related_name='views')
+    viewer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    viewed_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['story', 'viewer']
+
+
 # ==================== ÁREA SOCIAL DOS ESTUDANTES ====================
 
 class StudentPost(models.Model):
@@ -133,24 +269,24 @@ class StudentPost(models.Model):
     ], default='discussion')
     
     tags = models.CharField(max_length=500, blank=True, help_text="Tags separadas por vírgula")
+    normalized_tags = models.ManyToManyField('core.Tag', related_name='student_posts', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    # Contadores desnormalizados (ver core.models.adjust_counters)
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    
     # Campos específicos para grupos de estudo
     study_subject = models.CharField(max_length=100, blank=True, help_text="Matéria de estudo")
     max_participants = models.PositiveIntegerField(null=True, blank=True, help_text="Máximo de participantes")
     
     class Meta:
         ordering = ['-created_at']
-    
-    @property
-    def likes_count(self):
-        return self.likes.count()
-    
-    @property
-    def comments_count(self):
-        return self.comments.count()
+        indexes = [
+            models.Index(fields=['-created_at', 'is_active']),
+        ]
     
     def __str__(self):
         return f"{self.author.nickname} - {self.title}"
@@ -193,11 +329,47 @@ class StudentConnection(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     accepted_at = models.DateTimeField(null=True, blank=True)
     
+    # Chave "menor_id:maior_id" do par, a mesma nos dois sentidos (preenchida no save)
+    pair_key = models.CharField(max_length=50, blank=True)
+    
     class Meta:
         unique_together = ['from_student', 'to_student']
+        indexes = [
+            models.Index(fields=['from_student', 'status']),
+            models.Index(fields=['to_student', 'status']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['pair_key'], name='unique_student_connection_pair'),
+        ]
     
     def __str__(self):
         return f"{self.from_student.nickname} -> {self.to_student.nickname} ({self.status})"
+    
+    def save(self, *args, **kwargs):
+        self.pair_key = Conversation.pair_key(self.from_student_id, self.to_student_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'from_student', 'to_student'}.intersection(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'pair_key'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def between(cls, user_id, other_user_id):
+        """A conexão entre dois usuários, em qualquer sentido (ou None)"""
+        return cls.objects.filter(pair_key=Conversation.pair_key(user_id, other_user_id)).first()
+    
+    @classmethod
+    def statuses_for(cls, user_id, other_user_ids):
+        """``{outro_id: status}`` das conexões de ``user_id`` com ``other_user_ids``, em uma consulta"""
+        keys = {
+            Conversation.pair_key(user_id, other_user_id): other_user_id
+            for other_user_id in other_user_ids if other_user_id != user_id
+        }
+        if not keys:
+            return {}
+        return {
+            keys[pair_key]: status
+            for pair_key, status in cls.objects.filter(pair_key__in=list(keys)).values_list('pair_key', 'status')
+        }
 
 
 class StudyGroup(models.Model):
@@ -221,13 +393,12 @@ class StudyGroup(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Total de membros, mantido por messaging.groups e pelo m2m_changed de members
+    members_count = models.PositiveIntegerField(default=0)
+    
     class Meta:
         ordering = ['-created_at']
     
-    @property
-    def members_count(self):
-        return self.members.count()
-    
     @property
     def is_full(self):
         return self.members_count >= self.max_members
@@ -0,0 +1,83 @@
+"""
+Reprodução de stories (view_story).
+
+A sessão de reprodução sai da bandeja cacheada (messaging.stories): a
+playlist é a bandeja achatada, autor por autor, com os stories de cada autor
+do mais antigo para o mais novo, e o anterior/próximo de cada story já vem
+calculado. Passar por 20 stories não consulta os stories de novo.
+
+As visualizações não são gravadas no request: viram eventos ``story_view``
+de core.events e vão para o banco em lote (``bulk_create(ignore_conflicts=True)``).
+"""
+from dataclasses import dataclass
+
+from apps.core import events
+
+from .models import Story, StoryView
+from . import stories
+
+
+@dataclass
+class Playback:
+    story: Story
+    user_stories: list
+    current_index: int
+    prev_story_id: int = None
+    next_story_id: int = None
+
+
+def playlist(user):
+    """Stories da bandeja de ``user`` na ordem de reprodução"""
+    stories_by_user, _ = stories.story_tray(user)
+    ordered = []
+    for story_data in stories_by_user.values():
+        ordered.append(sorted(story_data['stories'], key=lambda story: (story.created_at, story.id)))
+    return ordered
+
+
+def playback(user, story_id):
+    """Sessão de reprodução em ``story_id``, ou None se ele não está na bandeja"""
+    flat = []
+    author_stories = {}
+    for user_stories in playlist(user):
+        for story in user_stories:
+            author_stories[story.id] = user_stories
+            flat.append(story)
+
+    for position, story in enumerate(flat):
+        if story.id == story_id:
+            user_stories = author_stories[story_id]
+            return Playback(
+                story=story,
+                user_stories=user_stories,
+                current_index=user_stories.index(story),
+                prev_story_id=flat[position - 1].id if position > 0 else None,
+                next_story_id=flat[position + 1].id if position + 1 < len(flat) else None,
+            )
+    return None
+
+
+def write_views(states):
+    """
+    Aplica um lote de visualizações ``{(viewer_id, story_id): True}`` (handler
+    ``story_view`` de core.events); retorna quantas eram de stories existentes.
+    """
+    existing = set(
+        Story.objects.filter(id__in={story_id for _, story_id in states}).values_list('id', flat=True)
+    )
+    views = [
+        StoryView(story_id=story_id, viewer_id=viewer_id)
+        for (viewer_id, story_id), active in states.items() if active and story_id in existing
+    ]
+    StoryView.objects.bulk_create(views, ignore_conflicts=True)
+
+    # bulk_create não dispara post_save: invalida a bandeja de cada usuário uma vez
+    for viewer_id in {view.viewer_id for view in views}:
+        stories.invalidate_viewer(viewer_id)
+    return len(views)
+
+
+def queue_view(story, viewer):
+    """Agenda a visualização de ``story`` por ``viewer`` (o autor não conta)"""
+    if story.user_id != viewer.id:
+        events.record('story_view', viewer.id, story.id)
@@ -3,5 +3,5 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
-    re_path(r'ws/messaging/(?P<room_name>\w+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/messaging/(?P<conversation_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
 ]
\ No newline at end of file
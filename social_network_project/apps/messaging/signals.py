@@ -0,0 +1,148 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+
+from apps.core import suggestions, tags
+from apps.core.models import adjust_counters
+from .models import ChatMessage, Conversation, Story, StoryView, StudentConnection, StudentPost, StudyGroup
+from . import social_stats, stories, unread
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=StudentPost)
+def sync_student_post_tags(sender, instance, update_fields=None, **kwargs):
+    """Sincroniza normalized_tags quando o texto das tags pode ter mudado"""
+    if update_fields and 'tags' not in update_fields:
+        return
+    tags.sync_tags(instance)
+
+
+@receiver(pre_delete, sender=StudentPost)
+def release_student_post_tags(sender, instance, **kwargs):
+    tags.release_tags(instance)
+
+
+@receiver(post_save, sender=ChatMessage)
+def record_sent_message(sender, instance, created=False, **kwargs):
+    """Atualiza o resumo da conversa e o contador de não lidas dos destinatários"""
+    if not created:
+        return
+    Conversation.objects.filter(pk=instance.conversation_id).update(**Conversation.snapshot_fields(instance))
+    unread.messages_sent(instance.conversation_id, instance.sender_id)
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def update_participant_key(sender, instance, action, reverse=False, **kwargs):
+    """Recalcula participant_key quando os participantes de uma conversa mudam"""
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    user_ids = list(instance.participants.values_list('id', flat=True))
+    participant_key = Conversation.pair_key(*user_ids) if len(user_ids) == 2 else ''
+    if participant_key and Conversation.objects.filter(
+        participant_key=participant_key
+    ).exclude(pk=instance.pk).exists():
+        # O par já tem uma conversa direta: esta fica sem chave (é um grupo que
+        # ficou com duas pessoas), em vez de violar unique_direct_conversation
+        participant_key = ''
+    if participant_key != instance.participant_key:
+        instance.participant_key = participant_key
+        Conversation.objects.filter(pk=instance.pk).update(participant_key=participant_key)
+
+
+@receiver(post_save, sender=Story)
+@receiver(post_delete, sender=Story)
+def invalidate_story_trays(sender, **kwargs):
+    stories.invalidate_stories()
+
+
+@receiver(post_save, sender=StoryView)
+@receiver(post_delete, sender=StoryView)
+def invalidate_viewer_tray(sender, instance, **kwargs):
+    stories.invalidate_viewer(instance.viewer_id)
+
+
+@receiver(post_save, sender=StudentConnection)
+@receiver(post_delete, sender=StudentConnection)
+def mark_connection_suggestions(sender, instance, **kwargs):
+    suggestions.mark_stale([instance.from_student_id, instance.to_student_id])
+
+
+@receiver(m2m_changed, sender=StudyGroup.members.through)
+def update_members_count(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    """Mantém members_count quando os membros mudam por members.add/remove/clear"""
+    if action == 'pre_clear':
+        # Depois do clear não dá mais para saber quem saiu
+        if reverse:
+            instance._cleared_group_ids = list(instance.study_groups.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        if reverse:
+            group_ids = getattr(instance, '_cleared_group_ids', [])
+            StudyGroup.objects.filter(id__in=group_ids).update(members_count=Greatest(F('members_count') - 1, 0))
+        else:
+            StudyGroup.objects.filter(pk=instance.pk).update(members_count=0)
+            instance.members_count = 0
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    step = 1 if action == 'post_add' else -1
+    if reverse:
+        # instance é o usuário e pk_set são os grupos
+        StudyGroup.objects.filter(id__in=pk_set).update(members_count=Greatest(F('members_count') + step, 0))
+    else:
+        adjust_counters(instance, members_count=step * len(pk_set))
+
+
+@receiver(m2m_changed, sender=StudyGroup.members.through)
+def mark_study_group_suggestions(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    """Quem entrou ou saiu de um grupo (e os membros que ficaram) recebe sugestões novas"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        suggestions.mark_stale([instance.pk])
+        return
+    user_ids = set(pk_set or ())
+    user_ids.update(instance.members.values_list('id', flat=True))
+    suggestions.mark_stale(user_ids)
+
+
+def _track_stat(name, created, counted, update_fields, tracked_field):
+    """Criação conta como +1; edição de ``tracked_field`` força recontagem"""
+    if created:
+        if counted:
+            social_stats.adjust(name, 1)
+    elif update_fields is None or tracked_field in update_fields:
+        social_stats.invalidate(name)
+
+
+@receiver(post_save, sender=StudentPost)
+def count_student_post(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        _track_stat('total_posts', created, instance.is_active, update_fields, 'is_active')
+
+
+@receiver(post_save, sender=StudyGroup)
+def count_study_group(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        _track_stat('total_study_groups', created, instance.is_active, update_fields, 'is_active')
+
+
+@receiver(post_save, sender=User)
+def count_student(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        _track_stat('total_students', created, instance.user_type == 'student', update_fields, 'user_type')
+
+
+@receiver(post_delete, sender=StudentPost)
+@receiver(post_delete, sender=StudyGroup)
+@receiver(post_delete, sender=User)
+def uncount_deleted(sender, instance, **kwargs):
+    if sender is User:
+        if instance.user_type == 'student':
+            social_stats.adjust('total_students', -1)
+    elif instance.is_active:
+        social_stats.adjust('total_posts' if sender is StudentPost else 'total_study_groups', -1)
@@ -0,0 +1,62 @@
+"""
+Estatísticas da barra lateral do feed social dos estudantes.
+
+Cada total (posts ativos, estudantes, grupos ativos) fica no cache por
+SOCIAL_STATS_CACHE_TIMEOUT segundos. Criar ou apagar um post, estudante ou
+grupo soma/subtrai no valor cacheado (``cache.incr``) depois do commit, então
+o feed não faz COUNT nenhum enquanto o cache estiver quente. Quando um total
+expira, ele é recontado uma vez; a recontagem também corrige qualquer desvio
+dos incrementos (ex: uma criação contada duas vezes durante a recontagem).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import StudentPost, StudyGroup
+
+User = get_user_model()
+
+# Total -> queryset que ele conta
+STATS = {
+    'total_posts': lambda: StudentPost.objects.filter(is_active=True),
+    'total_students': lambda: User.objects.filter(user_type='student'),
+    'total_study_groups': lambda: StudyGroup.objects.filter(is_active=True),
+}
+
+
+def _key(name):
+    return f'social_stats:{name}'
+
+
+def snapshot():
+    """``{total: valor}``; só reconta os totais que não estão no cache"""
+    cached = cache.get_many([_key(name) for name in STATS])
+    values = {}
+    missing = {}
+    for name, queryset in STATS.items():
+        if _key(name) in cached:
+            values[name] = cached[_key(name)]
+        else:
+            missing[_key(name)] = values[name] = queryset().count()
+    if missing:
+        cache.set_many(missing, getattr(settings, 'SOCIAL_STATS_CACHE_TIMEOUT', 600))
+    return values
+
+
+def _incr(name, delta):
+    try:
+        cache.incr(_key(name), delta)
+    except ValueError:
+        # Fora do cache: o próximo snapshot reconta
+        pass
+
+
+def adjust(name, delta):
+    """Soma ``delta`` no total cacheado quando a transação atual fizer commit"""
+    transaction.on_commit(lambda: _incr(name, delta))
+
+
+def invalidate(name):
+    """Força a recontagem de um total (mudanças que não dá para calcular como delta)"""
+    transaction.on_commit(lambda: cache.delete(_key(name)))
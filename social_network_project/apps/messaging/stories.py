@@ -0,0 +1,146 @@
+"""
+Stories: publicação, visualizações e bandeja.
+
+messaging.Story é a única tabela de stories; as views de messaging e de core
+publicam por ``publish_story``, registram visualizações por ``record_view``
+(ou em lote, por messaging.playback) e leem a bandeja de ``story_tray``.
+
+A bandeja inteira sai de uma consulta: os stories ativos com um
+``Exists`` sobre os StoryView do usuário, agrupados por autor em Python.
+O resultado é cacheado por usuário com chaves versionadas
+(core.cache_versions): publicar ou apagar um story invalida todas as
+bandejas, ver um story invalida só a de quem viu.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Value
+from django.utils import timezone
+
+from apps.core import events, follow_graph
+from apps.core.cache_versions import bump_version, versioned_key
+
+from .models import Story, StoryView
+
+STORIES_SCOPE = 'stories'
+STORY_DURATION = timedelta(hours=24)
+
+
+def viewer_scope(user_id):
+    return f'story_views:{user_id}'
+
+
+def invalidate_stories():
+    bump_version(STORIES_SCOPE)
+
+
+def invalidate_viewer(user_id):
+    bump_version(viewer_scope(user_id))
+
+
+def active_stories(now=None):
+    """Stories ainda não expirados (usa o índice de ``expires_at``)"""
+    return Story.objects.filter(is_active=True, expires_at__gt=now or timezone.now())
+
+
+def publish_story(user, story=None, duration=STORY_DURATION, **fields):
+    """
+    Publica um story de ``user``.
+
+    Aceita um Story ainda não salvo (ex: ``form.save(commit=False)``) ou os
+    campos do model em ``fields``.
+    """
+    if story is None:
+        story = Story(**fields)
+    story.user = user
+    if not story.expires_at:
+        story.expires_at = timezone.now() + duration
+    story.save()
+    return story
+
+
+def record_view(story, viewer):
+    """Registra que ``viewer`` viu ``story``; o autor não conta como visualização"""
+    if story.user_id == viewer.id:
+        return False
+    _, created = StoryView.objects.get_or_create(story=story, viewer=viewer)
+    return created
+
+
+def _build_tray(user):
+    now = timezone.now()
+    if user.is_authenticated:
+        viewed = Exists(StoryView.objects.filter(story=OuterRef('pk'), viewer=user))
+    else:
+        viewed = Value(True)
+
+    stories = active_stories(now).select_related('user').annotate(
+        viewed=viewed
+    ).order_by('-is_highlighted', '-created_at')
+
+    stories_by_user = {}
+    total_stories = 0
+    for story in stories:
+        total_stories += 1
+        story_data = stories_by_user.setdefault(story.user_id, {
+            'user': story.user,
+            'stories': [],
+            'unviewed_count': 0
+        })
+        story_data['stories'].append(story)
+        if not story.viewed:
+            story_data['unviewed_count'] += 1
+    return stories_by_user, total_stories
+
+
+def _timeout(stories_by_user):
+    """Não deixa a bandeja cacheada passar da expiração do primeiro story"""
+    timeout = getattr(settings, 'STORY_TRAY_CACHE_TIMEOUT', 60)
+    expirations = [
+        story.expires_at for story_data in stories_by_user.values() for story in story_data['stories']
+    ]
+    if expirations:
+        seconds_left = (min(expirations) - timezone.now()).total_seconds()
+        timeout = max(1, min(timeout, int(seconds_left)))
+    return timeout
+
+
+def story_tray(user):
+    """Retorna ``(stories_by_user, total_stories)`` para a bandeja de ``user``"""
+    viewer_id = user.id if user.is_authenticated else 0
+    key = versioned_key('story_tray', [STORIES_SCOPE, viewer_scope(viewer_id)], viewer_id)
+
+    tray = cache.get(key)
+    if tray is None:
+        tray = _build_tray(user)
+        cache.set(key, tray, _timeout(tray[0]))
+
+    # Visualizações do próprio usuário ainda na fila de core.events
+    if user.is_authenticated:
+        pending_ids = events.overlay_ids(user.id, 'story_view', [])
+        if pending_ids:
+            tray = _with_pending_views(tray, pending_ids)
+    return tray
+
+
+def _with_pending_views(tray, pending_ids):
+    stories_by_user, total_stories = tray
+    return {
+        user_id: dict(story_data, unviewed_count=sum(
+            1 for story in story_data['stories'] if not story.viewed and story.id not in pending_ids
+        ))
+        for user_id, story_data in stories_by_user.items()
+    }, total_stories
+
+
+def tray_scopes(user):
+    """Escopos de versão da bandeja de ``user`` (para cachear o HTML dela)"""
+    return [STORIES_SCOPE, viewer_scope(user.id), follow_graph.scope(user.id)]
+
+
+def following_tray(user):
+    """Grupos da bandeja só dos autores que ``user`` segue (bandeja do instagram_feed)"""
+    stories_by_user, _ = story_tray(user)
+    following_ids = follow_graph.following_ids(user.id)
+    return [story_data for user_id, story_data in stories_by_user.items() if user_id in following_ids]
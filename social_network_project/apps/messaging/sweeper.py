@@ -0,0 +1,145 @@
+"""
+Limpeza dos stories expirados.
+
+Stories expirados (e as suas visualizações) saem de Story/StoryView para
+ArchivedStory/ArchivedStoryView em lotes de STORY_SWEEP_BATCH_SIZE, com uma
+pausa de STORY_SWEEP_PAUSE_MS entre lotes para nunca segurar as tabelas por
+muito tempo. As imagens e vídeos são apagados do storage depois do commit.
+
+Roda pelo comando ``sweep_expired_stories`` (cron) ou, com
+STORY_SWEEPER_IN_PROCESS, como uma task asyncio no processo ASGI a cada
+STORY_SWEEP_INTERVAL segundos (ver ``SweeperLauncher``).
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedStory, ArchivedStoryView, Story, StoryView
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _delete_media(names):
+    for field_name, name in names:
+        storage = Story._meta.get_field(field_name).storage
+        try:
+            storage.delete(name)
+        except Exception as e:
+            logger.warning(f"Não foi possível apagar {name} do story arquivado: {e}")
+
+
+def sweep_batch(batch_size=None, now=None):
+    """Arquiva um lote de stories expirados; retorna quantos foram arquivados"""
+    batch_size = batch_size or _setting('STORY_SWEEP_BATCH_SIZE', 200)
+    now = now or timezone.now()
+    media = []
+
+    with transaction.atomic():
+        # skip_locked: dois sweepers ao mesmo tempo pegam lotes diferentes
+        stories = list(
+            Story.objects.filter(expires_at__lte=now).order_by('expires_at').select_for_update(
+                skip_locked=True
+            )[:batch_size]
+        )
+        if not stories:
+            return 0
+        story_ids = [story.id for story in stories]
+
+        views_by_story = {}
+        for story_id, viewer_id, viewed_at in StoryView.objects.filter(story_id__in=story_ids).values_list(
+            'story_id', 'viewer_id', 'viewed_at'
+        ):
+            views_by_story.setdefault(story_id, []).append((viewer_id, viewed_at))
+
+        archived = ArchivedStory.objects.bulk_create([
+            ArchivedStory(
+                original_id=story.id,
+                user_id=story.user_id,
+                title=story.title,
+                content=story.content,
+                story_type=story.story_type,
+                external_link=story.external_link,
+                link_text=story.link_text,
+                views_count=len(views_by_story.get(story.id, [])),
+                created_at=story.created_at,
+                expires_at=story.expires_at,
+            )
+            for story in stories
+        ])
+        ArchivedStoryView.objects.bulk_create([
+            ArchivedStoryView(story_id=archived_story.id, viewer_id=viewer_id, viewed_at=viewed_at)
+            for story, archived_story in zip(stories, archived)
+            for viewer_id, viewed_at in views_by_story.get(story.id, [])
+        ], batch_size=1000)
+
+        StoryView.objects.filter(story_id__in=story_ids).delete()
+        Story.objects.filter(id__in=story_ids).delete()
+
+        for story in stories:
+            media.extend((field_name, getattr(story, field_name).name)
+                         for field_name in ('image', 'video') if getattr(story, field_name))
+        transaction.on_commit(lambda: _delete_media(media))
+
+    return len(stories)
+
+
+def sweep_expired(batch_size=None, max_batches=None, pause_ms=None):
+    """Arquiva os stories expirados lote a lote; retorna o total arquivado"""
+    pause_ms = _setting('STORY_SWEEP_PAUSE_MS', 200) if pause_ms is None else pause_ms
+    now = timezone.now()
+    archived_count = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        archived = sweep_batch(batch_size, now)
+        archived_count += archived
+        batches += 1
+        if not archived:
+            break
+        time.sleep(pause_ms / 1000)
+    return archived_count
+
+
+async def run_sweeper(interval=None, batch_size=None, pause_ms=None):
+    """Loop da task asyncio: arquiva tudo que expirou a cada ``interval`` segundos"""
+    interval = interval or _setting('STORY_SWEEP_INTERVAL', 300)
+    pause_ms = _setting('STORY_SWEEP_PAUSE_MS', 200) if pause_ms is None else pause_ms
+    while True:
+        try:
+            now = timezone.now()
+            while await database_sync_to_async(sweep_batch)(batch_size, now):
+                await asyncio.sleep(pause_ms / 1000)
+        except Exception as e:
+            logger.error(f"Erro ao arquivar stories expirados: {e}", exc_info=True)
+        await asyncio.sleep(interval)
+
+
+_tasks = weakref.WeakKeyDictionary()
+
+
+def start_background_sweeper():
+    """Inicia o sweeper no event loop atual, uma vez por loop"""
+    loop = asyncio.get_running_loop()
+    task = _tasks.get(loop)
+    if task is None or task.done():
+        _tasks[loop] = loop.create_task(run_sweeper())
+
+
+class SweeperLauncher:
+    """App ASGI que inicia o sweeper no loop do servidor e repassa tudo para ``app``"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        start_background_sweeper()
+        return await self.app(scope, receive, send)
@@ -1,17 +1,677 @@
 from django.test import TestCase
-from .models import Message
+from django.test import override_settings
+from unittest import mock
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from asgiref.testing import ApplicationCommunicator
+from django.core.management import call_command
+from django.urls import reverse
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from io import StringIO
+import os
+import subprocess
+import sys
+import tempfile
+import asyncio
+import json
+from django.core.cache import cache
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+from apps.core.models import Follow
+from .models import (
+    ArchivedStory, ArchivedStoryView, ChatMessage, Conversation, ConversationReadState, Story, StoryView,
+    StudentConnection, StudentPost, StudyGroup
+)
+from .history import history_page
+from .routing import websocket_urlpatterns
+from .stories import following_tray, publish_story, record_view, story_tray
+from .sweeper import sweep_expired
+from apps.core.events import MemoryEventBuffer
+from .playback import playback, playlist
+from .writer import MessageWriteBuffer
+from . import groups, social_stats, unread
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 class MessageModelTest(TestCase):
     def setUp(self):
-        self.user = User.objects.create_user(username='testuser', password='testpass')
-        self.message = Message.objects.create(sender=self.user, content='Hello, World!')
+        self.user = User.objects.create_user(username='testuser', nickname='testuser', email='test@test.com', password='testpass')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        self.message = ChatMessage.objects.create(conversation=self.conversation, sender=self.user, content='Hello, World!')
 
     def test_message_creation(self):
         self.assertEqual(self.message.sender, self.user)
         self.assertEqual(self.message.content, 'Hello, World!')
 
     def test_message_str(self):
-        self.assertEqual(str(self.message), f'{self.user.username}: {self.message.content}')
\ No newline at end of file
+        self.assertEqual(str(self.message), f'{self.user.nickname}: {self.message.content[:50]}...')
+
+
+@override_settings(UNREAD_COUNTER_BACKEND='db')
+class UnreadCounterTest(TestCase):
+    """Tests for the per-conversation unread counters"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', nickname='alice', email='alice@test.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', nickname='bob', email='bob@test.com', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+
+    def send(self, sender, content='Oi'):
+        return ChatMessage.objects.create(conversation=self.conversation, sender=sender, content=content)
+
+    def test_counters_follow_send_and_read(self):
+        """Sending increments only the recipient; opening the chat resets it"""
+        self.send(self.alice)
+        self.send(self.alice)
+        self.assertEqual(unread.total_unread(self.bob), 2)
+        self.assertEqual(unread.total_unread(self.alice), 0)
+        self.assertEqual(unread.unread_counts(self.bob, [self.conversation.id]), {self.conversation.id: 2})
+
+        self.client.force_login(self.bob)
+        self.client.get(reverse('messaging:chat_view', args=[self.conversation.id]))
+
+        self.assertEqual(unread.total_unread(self.bob), 0)
+        self.assertFalse(ChatMessage.objects.filter(is_read=False).exists())
+        self.assertIsNotNone(ConversationReadState.objects.get(conversation=self.conversation, user=self.bob).last_read_at)
+
+    def test_reopening_read_conversation_writes_nothing_else(self):
+        """With nothing unread, mark_read is the indexed UPDATE plus the counter read"""
+        self.send(self.alice)
+        self.assertEqual(unread.mark_read(self.conversation, self.bob), 1)
+        with self.assertNumQueries(2):
+            self.assertEqual(unread.mark_read(self.conversation, self.bob), 0)
+
+    def test_mark_read_repairs_a_drifted_counter(self):
+        """Messages are marked read even when the counter was lost"""
+        self.send(self.alice)
+        ConversationReadState.objects.update(unread_count=0)
+        self.assertEqual(unread.mark_read(self.conversation, self.bob), 1)
+        self.assertFalse(ChatMessage.objects.filter(is_read=False).exists())
+
+    @override_settings(UNREAD_COUNTER_BACKEND='redis', UNREAD_REDIS_RETRY_SECONDS=30)
+    def test_redis_errors_fall_back_to_the_database(self):
+        """A Redis error answers from the DB and skips Redis until the retry interval"""
+        import redis
+
+        with override_settings(UNREAD_COUNTER_BACKEND='db'):
+            self.send(self.alice)
+        backend = unread.RedisUnreadCounters()
+        backend.client = mock.Mock(**{'hvals.side_effect': redis.ConnectionError('down')})
+        self.addCleanup(setattr, unread, '_redis_retry_at', 0)
+        with mock.patch.object(unread, '_redis_counters', backend):
+            self.assertEqual(unread.total_unread(self.bob), 1)
+            self.assertIsNone(unread._redis_counters)
+            with mock.patch.object(unread, 'RedisUnreadCounters') as reconnect:
+                self.assertIsInstance(unread.get_backend(), unread.DatabaseUnreadCounters)
+                reconnect.assert_not_called()
+
+    def test_conversation_list_badges(self):
+        self.send(self.alice)
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('messaging:conversations_list'))
+        self.assertEqual(response.context['conversations'][0].unread_count, 1)
+        self.assertContains(response, 'unread-badge')
+
+    def test_snapshot_and_participant_key(self):
+        """Sending a message updates the conversation's last-message snapshot"""
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.participant_key, Conversation.pair_key(self.bob.id, self.alice.id))
+
+        message = self.send(self.bob, 'Tudo bem?')
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, message.id)
+        self.assertEqual(self.conversation.last_message_preview, 'Tudo bem?')
+        self.assertEqual(self.conversation.last_message_sender_id, self.bob.id)
+        self.assertEqual(self.conversation.last_message_at, message.timestamp)
+
+    def test_direct_conversation_is_unique_per_pair(self):
+        """Opening a chat by user_id reuses the pair's conversation"""
+        conversation, created = Conversation.get_or_create_direct(self.bob, self.alice)
+        self.assertFalse(created)
+        self.assertEqual(conversation, self.conversation)
+
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('messaging:chat') + f'?user_id={self.bob.id}')
+        self.assertEqual(response.context['conversation'], self.conversation)
+        self.assertEqual(Conversation.objects.count(), 1)
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Conversation.objects.create(participant_key=self.conversation.participant_key)
+
+    def test_group_shrinking_to_an_existing_pair_keeps_no_key(self):
+        """A group that drops to two members does not take the pair's direct-chat key"""
+        carol = User.objects.create_user(username='carol', nickname='carol', email='carol@test.com', password='testpass123')
+        group = Conversation.objects.create()
+        group.participants.add(self.alice, self.bob, carol)
+        group.participants.remove(carol)
+        group.refresh_from_db()
+        self.assertEqual(group.participant_key, '')
+        self.assertEqual(Conversation.get_or_create_direct(self.alice, self.bob)[0], self.conversation)
+
+    def test_inbox_query_count_is_constant(self):
+        """The inbox renders from the snapshot, whatever the number of conversations"""
+        self.client.force_login(self.bob)
+        for i in range(5):
+            other = User.objects.create_user(username=f'user{i}', nickname=f'user{i}', email=f'user{i}@test.com', password='testpass123')
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.bob, other)
+            ChatMessage.objects.create(conversation=conversation, sender=other, content=f'Mensagem {i}')
+
+        # sessão, usuário, conversas, participantes, badges e total do menu
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('messaging:conversations_list'))
+        self.assertEqual(response.context['conversations'][0].last_message_preview, 'Mensagem 4')
+
+    def test_rebuild_unread_counters_command(self):
+        self.send(self.alice)
+        self.send(self.bob)
+        ConversationReadState.objects.update(unread_count=0)
+
+        call_command('rebuild_unread_counters', stdout=StringIO())
+
+        self.assertEqual(unread.total_unread(self.alice), 1)
+        self.assertEqual(unread.total_unread(self.bob), 1)
+
+
+class WebsocketClient(ApplicationCommunicator):
+    """Cliente WebSocket mínimo para testar consumers"""
+
+    async def connect(self, timeout=1):
+        await self.send_input({'type': 'websocket.connect'})
+        response = await self.receive_output(timeout)
+        if response['type'] == 'websocket.close':
+            return False, response.get('code', 1000)
+        return True, None
+
+    async def send_json_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive_json_from(self, timeout=1):
+        response = await self.receive_output(timeout)
+        return json.loads(response['text'])
+
+    async def disconnect(self, code=1000, timeout=1):
+        await self.send_input({'type': 'websocket.disconnect', 'code': code})
+        await self.wait(timeout)
+
+
+@override_settings(UNREAD_COUNTER_BACKEND='db')
+class ChatHistoryTest(TestCase):
+    """Tests for the keyset-paginated chat history"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', nickname='alice', email='alice@test.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', nickname='bob', email='bob@test.com', password='testpass123')
+        self.conversation, _ = Conversation.get_or_create_direct(self.alice, self.bob)
+        ChatMessage.objects.bulk_create([
+            ChatMessage(conversation=self.conversation, sender=self.alice, content=f'Mensagem {i}')
+            for i in range(120)
+        ])
+        self.client.force_login(self.bob)
+
+    def test_windows_walk_back_to_the_start(self):
+        contents = []
+        cursor = None
+        while True:
+            window, cursor = history_page(self.conversation.id, cursor, limit=50)
+            contents = [message.content for message in window] + contents
+            if cursor is None:
+                break
+        self.assertEqual(contents, [f'Mensagem {i}' for i in range(120)])
+
+    def test_chat_view_renders_only_the_latest_window(self):
+        response = self.client.get(reverse('messaging:chat_view', args=[self.conversation.id]))
+        self.assertEqual(len(response.context['messages']), 50)
+        self.assertEqual(response.context['messages'][-1].content, 'Mensagem 119')
+
+        response = self.client.get(
+            reverse('messaging:chat_history', args=[self.conversation.id]),
+            {'cursor': response.context['history_cursor']}
+        )
+        data = response.json()
+        self.assertEqual([item['content'] for item in data['messages']][-1], 'Mensagem 69')
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_history_requires_participation_and_valid_cursor(self):
+        url = reverse('messaging:chat_history', args=[self.conversation.id])
+        self.assertEqual(self.client.get(url, {'cursor': 'invalido'}).status_code, 400)
+
+        outsider = User.objects.create_user(username='eve', nickname='eve', email='eve@test.com', password='testpass123')
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(UNREAD_COUNTER_BACKEND='db', CHAT_WRITE_FLUSH_MS=5)
+class ChatConsumerTest(TestCase):
+    """Tests for the persisting WebSocket consumer"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', nickname='alice', email='alice@test.com', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', nickname='bob', email='bob@test.com', password='testpass123')
+        self.carol = User.objects.create_user(username='carol', nickname='carol', email='carol@test.com', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+
+    async def connect(self, user):
+        # channels.testing depende do daphne, então o protocolo é conduzido pelo asgiref
+        communicator = WebsocketClient(URLRouter(websocket_urlpatterns), {
+            'type': 'websocket',
+            'path': f'/ws/messaging/{self.conversation.id}/',
+            'headers': [],
+            'subprotocols': [],
+            'user': user,
+        })
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    async def test_rejects_non_participants(self):
+        communicator, connected, code = await self.connect(self.carol)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+    async def test_messages_are_persisted_acked_and_broadcast(self):
+        alice, connected, _ = await self.connect(self.alice)
+        self.assertTrue(connected)
+        bob, _, _ = await self.connect(self.bob)
+
+        for i in range(3):
+            await alice.send_json_to({'type': 'message', 'content': f'Oi {i}', 'client_id': str(i)})
+
+        acks = [await alice.receive_json_from() for _ in range(6)]
+        acks = [frame for frame in acks if frame['type'] == 'ack']
+        self.assertEqual([frame['client_id'] for frame in acks], ['0', '1', '2'])
+
+        received = [await bob.receive_json_from() for _ in range(3)]
+        self.assertEqual([frame['content'] for frame in received], ['Oi 0', 'Oi 1', 'Oi 2'])
+        self.assertEqual([frame['id'] for frame in received], [frame['id'] for frame in acks])
+
+        saved = await database_sync_to_async(
+            lambda: list(ChatMessage.objects.order_by('id').values_list('content', flat=True))
+        )()
+        self.assertEqual(saved, ['Oi 0', 'Oi 1', 'Oi 2'])
+        self.assertEqual(await database_sync_to_async(unread.total_unread)(self.bob), 3)
+
+        await bob.send_json_to({'type': 'read'})
+        self.assertTrue(await bob.receive_nothing(timeout=0.2))
+        self.assertEqual(await database_sync_to_async(unread.total_unread)(self.bob), 0)
+
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_history_frame(self):
+        await database_sync_to_async(ChatMessage.objects.bulk_create)([
+            ChatMessage(conversation=self.conversation, sender=self.alice, content=f'Mensagem {i}')
+            for i in range(5)
+        ])
+        bob, _, _ = await self.connect(self.bob)
+
+        await bob.send_json_to({'type': 'history', 'limit': 3})
+        frame = await bob.receive_json_from()
+        self.assertEqual([item['content'] for item in frame['messages']], ['Mensagem 2', 'Mensagem 3', 'Mensagem 4'])
+
+        await bob.send_json_to({'type': 'history', 'cursor': frame['next_cursor'], 'limit': 3})
+        frame = await bob.receive_json_from()
+        self.assertEqual([item['content'] for item in frame['messages']], ['Mensagem 0', 'Mensagem 1'])
+        self.assertIsNone(frame['next_cursor'])
+        await bob.disconnect()
+
+    async def test_buffer_flushes_when_batch_is_full(self):
+        """A full batch is written at once, without waiting for the timer"""
+        buffer = MessageWriteBuffer(batch_size=2, flush_interval_ms=60000)
+        first, second = await asyncio.wait_for(asyncio.gather(
+            buffer.submit(self.conversation.id, self.alice.id, 'um'),
+            buffer.submit(self.conversation.id, self.alice.id, 'dois'),
+        ), timeout=5)
+        self.assertLess(first.id, second.id)
+        self.assertEqual(await database_sync_to_async(ChatMessage.objects.count)(), 2)
+
+
+class StoryTrayTest(TestCase):
+    """Tests for the cached story tray"""
+
+    def setUp(self):
+        cache.clear()
+        self.company = User.objects.create_user(username='company', nickname='company', email='company@test.com', password='testpass123', user_type='company')
+        self.viewer = User.objects.create_user(username='viewer', nickname='viewer', email='viewer@test.com', password='testpass123')
+        self.stories = [
+            Story.objects.create(user=self.company, title=f'Story {i}', content='Conteúdo')
+            for i in range(3)
+        ]
+        StoryView.objects.create(story=self.stories[0], viewer=self.viewer)
+
+    def test_tray_is_built_in_one_query_and_cached(self):
+        with self.assertNumQueries(1):
+            stories_by_user, total_stories = story_tray(self.viewer)
+        self.assertEqual(total_stories, 3)
+        self.assertEqual(stories_by_user[self.company.id]['unviewed_count'], 2)
+
+        with self.assertNumQueries(0):
+            story_tray(self.viewer)
+
+    def test_views_and_new_stories_invalidate_the_tray(self):
+        story_tray(self.viewer)
+        StoryView.objects.create(story=self.stories[1], viewer=self.viewer)
+        stories_by_user, _ = story_tray(self.viewer)
+        self.assertEqual(stories_by_user[self.company.id]['unviewed_count'], 1)
+
+        Story.objects.create(user=self.company, title='Nova', content='Conteúdo')
+        stories_by_user, total_stories = story_tray(self.viewer)
+        self.assertEqual(total_stories, 4)
+        self.assertEqual(stories_by_user[self.company.id]['unviewed_count'], 2)
+
+    def test_stories_feed_view(self):
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('messaging:stories_feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_stories'], 3)
+
+    def test_publish_and_record_view(self):
+        story = publish_story(self.company, title='Vaga', content='Nova vaga aberta')
+        self.assertIsNotNone(story.expires_at)
+        self.assertFalse(record_view(story, self.company))
+        self.assertTrue(record_view(story, self.viewer))
+        self.assertFalse(record_view(story, self.viewer))
+        self.assertEqual(story.views.count(), 1)
+
+    def test_instagram_feed_reads_the_same_tray(self):
+        self.assertEqual(following_tray(self.viewer), [])
+        Follow.objects.create(follower=self.viewer, following=self.company)
+        tray = following_tray(self.viewer)
+        self.assertEqual([story_data['user'] for story_data in tray], [self.company])
+
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('core:instagram_feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['stories']), 1)
+
+
+class StorySweeperTest(TestCase):
+    """Tests for archiving expired stories"""
+
+    def setUp(self):
+        self.company = User.objects.create_user(username='company', nickname='company', email='company@test.com', password='testpass123', user_type='company')
+        self.viewer = User.objects.create_user(username='viewer', nickname='viewer', email='viewer@test.com', password='testpass123')
+        expired_at = timezone.now() - timedelta(minutes=1)
+        self.expired = [
+            Story.objects.create(user=self.company, title=f'Antigo {i}', content='Conteúdo', expires_at=expired_at)
+            for i in range(5)
+        ]
+        self.active = Story.objects.create(user=self.company, title='Atual', content='Conteúdo')
+        StoryView.objects.create(story=self.expired[0], viewer=self.viewer)
+        StoryView.objects.create(story=self.active, viewer=self.viewer)
+
+    def test_expired_stories_move_to_the_archive_in_batches(self):
+        self.assertEqual(sweep_expired(batch_size=2, max_batches=1, pause_ms=0), 2)
+        self.assertEqual(sweep_expired(batch_size=2, pause_ms=0), 3)
+
+        self.assertEqual(list(Story.objects.all()), [self.active])
+        self.assertEqual(list(StoryView.objects.values_list('story_id', flat=True)), [self.active.id])
+        self.assertEqual(ArchivedStory.objects.count(), 5)
+        archived = ArchivedStory.objects.get(original_id=self.expired[0].id)
+        self.assertEqual(archived.views_count, 1)
+        self.assertEqual(ArchivedStoryView.objects.get().story, archived)
+
+    def test_media_is_deleted_after_commit(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            story = self.expired[0]
+            story.image = SimpleUploadedFile('story.gif', b'GIF89a', content_type='image/gif')
+            story.save()
+            path = story.image.path
+            self.assertTrue(os.path.exists(path))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                sweep_expired(pause_ms=0)
+            self.assertFalse(os.path.exists(path))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('sweep_expired_stories', '--pause-ms', '0', stdout=out)
+        self.assertIn('5 stories expirados arquivados', out.getvalue())
+
+
+@override_settings(EVENT_BUFFER_BACKEND='sync')
+class StoryPlaybackTest(TestCase):
+    """Tests for the story playback session"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', nickname='viewer', email='viewer@test.com', password='testpass123')
+        self.companies = [
+            User.objects.create_user(username=f'company{i}', nickname=f'company{i}', email=f'company{i}@test.com', password='testpass123', user_type='company')
+            for i in range(2)
+        ]
+        self.stories = [
+            Story.objects.create(user=company, title=f'{company.nickname} {i}', content='Conteúdo')
+            for company in self.companies for i in range(2)
+        ]
+
+    def test_playlist_walks_every_author_in_order(self):
+        session = playback(self.viewer, playlist(self.viewer)[0][0].id)
+        order = [session.story.id]
+        while session.next_story_id:
+            session = playback(self.viewer, session.next_story_id)
+            order.append(session.story.id)
+        self.assertEqual(len(order), 4)
+        self.assertIsNone(playback(self.viewer, order[0]).prev_story_id)
+        # Os stories de cada autor tocam do mais antigo para o mais novo
+        self.assertEqual(order, [self.stories[2].id, self.stories[3].id, self.stories[0].id, self.stories[1].id])
+
+    def test_view_story_records_the_view(self):
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('messaging:view_story', args=[self.stories[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['next_story_id'], self.stories[1].id)
+        self.assertTrue(StoryView.objects.filter(story=self.stories[0], viewer=self.viewer).exists())
+
+    def test_expired_story_redirects(self):
+        Story.objects.filter(id=self.stories[0].id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        cache.clear()
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('messaging:view_story', args=[self.stories[0].id]))
+        self.assertRedirects(response, reverse('messaging:stories_feed'))
+
+    def test_buffered_views_are_written_in_one_batch(self):
+        buffer = MemoryEventBuffer(flush_ms=60000)
+        for story in self.stories:
+            buffer.add([('story_view', self.viewer.id, story.id, True)])
+        buffer.add([('story_view', self.viewer.id, self.stories[0].id, True)])
+        self.assertEqual(StoryView.objects.count(), 0)
+
+        with self.assertNumQueries(2):
+            buffer.flush()
+        self.assertEqual(StoryView.objects.filter(viewer=self.viewer).count(), 4)
+
+
+class StudentConnectionTest(TestCase):
+    """Conexões indexadas pela chave do par"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buscador', nickname='buscador', email='buscador@test.com', password='testpass123', user_type='student'
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f'colega{i}', nickname=f'colega{i}', email=f'colega{i}@test.com', password='testpass123', user_type='student'
+            )
+            for i in range(6)
+        ]
+        self.client.force_login(self.user)
+
+    def test_pair_key_is_the_same_in_both_directions(self):
+        StudentConnection.objects.create(from_student=self.students[0], to_student=self.user, status='accepted')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StudentConnection.objects.create(from_student=self.user, to_student=self.students[0])
+
+        self.assertEqual(StudentConnection.between(self.user.id, self.students[0].id).status, 'accepted')
+        self.assertEqual(
+            StudentConnection.statuses_for(self.user.id, [student.id for student in self.students]),
+            {self.students[0].id: 'accepted'}
+        )
+
+    def search_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('messaging:search_students'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_search_queries_do_not_grow_with_results(self):
+        StudentConnection.objects.create(from_student=self.user, to_student=self.students[0], status='pending')
+        few, _ = self.search_queries()
+
+        for student in self.students[1:4]:
+            StudentConnection.objects.create(from_student=student, to_student=self.user, status='accepted')
+        many, response = self.search_queries()
+
+        self.assertEqual(few, many)
+        statuses = {student.id: student.connection_status for student in response.context['students']}
+        self.assertEqual(statuses[self.students[0].id], 'pending')
+        self.assertEqual(statuses[self.students[1].id], 'accepted')
+        self.assertEqual(statuses[self.students[5].id], 'none')
+
+    def test_request_to_someone_who_already_asked(self):
+        StudentConnection.objects.create(from_student=self.students[0], to_student=self.user, status='pending')
+        self.client.post(reverse('messaging:send_connection_request', args=[self.students[0].id]))
+        self.assertEqual(StudentConnection.objects.count(), 1)
+
+        StudentConnection.objects.update(status='rejected')
+        self.client.post(reverse('messaging:send_connection_request', args=[self.students[0].id]))
+        connection_row = StudentConnection.objects.get()
+        self.assertEqual((connection_row.from_student, connection_row.status), (self.user, 'pending'))
+
+
+class StudyGroupMembershipTest(TestCase):
+    """Contador de membros e entrada com limite de vagas"""
+
+    def setUp(self):
+        self.creator, *self.students = [
+            User.objects.create_user(
+                username=f'estudante{i}', nickname=f'estudante{i}', email=f'estudante{i}@test.com', password='testpass123',
+                user_type='student'
+            )
+            for i in range(4)
+        ]
+        self.group = StudyGroup.objects.create(
+            name='Cálculo I', description='Listas', subject='Cálculo', creator=self.creator, max_members=3
+        )
+        self.group.members.add(self.creator)
+
+    def test_members_add_and_remove_keep_the_counter(self):
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.members_count, 1)
+        self.students[0].study_groups.add(self.group)
+        self.group.members.remove(self.creator)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.members_count, 1)
+
+    def test_last_seat_goes_to_one_student(self):
+        self.assertEqual(groups.join(self.group, self.students[0]), groups.JOINED)
+        self.assertEqual(groups.join(self.group, self.students[0]), groups.ALREADY_MEMBER)
+
+        # Dois requests com a mesma cópia do grupo (2/3) disputando a última vaga
+        stale = StudyGroup.objects.get(pk=self.group.pk)
+        self.assertEqual(groups.join(stale, self.students[1]), groups.JOINED)
+        self.assertEqual(groups.join(stale, self.students[2]), groups.FULL)
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.members_count, 3)
+        self.assertEqual(self.group.members.count(), 3)
+
+        self.assertTrue(groups.leave(self.group, self.students[1]))
+        self.assertFalse(groups.leave(self.group, self.students[1]))
+        self.assertEqual(self.group.members_count, 2)
+
+    def test_join_view_refuses_full_group(self):
+        StudyGroup.objects.filter(pk=self.group.pk).update(max_members=1)
+        self.client.force_login(self.students[0])
+        self.client.post(reverse('messaging:join_study_group', args=[self.group.id]))
+        self.assertFalse(groups.is_member(self.group, self.students[0]))
+
+    def test_list_page_renders_from_annotations(self):
+        self.client.force_login(self.students[0])
+        url = reverse('messaging:study_groups_list')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        few = len(context.captured_queries)
+
+        for i in range(3):
+            StudyGroup.objects.create(name=f'Grupo {i}', description='d', subject='Física', creator=self.creator)
+        groups.join(self.group, self.students[0])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(context.captured_queries), few)
+        self.assertContains(response, '✅ Membro')
+
+
+class SocialStatsTest(TestCase):
+    """Totais da barra lateral do feed social"""
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(
+            username='leitor', nickname='leitor', email='leitor@test.com', password='testpass123', user_type='student'
+        )
+        self.client.force_login(self.student)
+
+    def create_post(self, **fields):
+        return StudentPost.objects.create(author=self.student, title='Dúvida', content='Conteúdo', post_type='help', **fields)
+
+    def test_feed_reads_totals_without_counting(self):
+        self.create_post()
+        url = reverse('messaging:student_social_feed')
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertFalse([query for query in context.captured_queries if 'COUNT(' in query['sql']])
+        self.assertEqual(response.context['total_posts'], 1)
+        self.assertEqual(response.context['total_students'], 1)
+        self.assertEqual(response.context['total_study_groups'], 0)
+
+    def test_signals_adjust_the_cached_totals(self):
+        self.assertEqual(social_stats.snapshot()['total_posts'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+            self.create_post(is_active=False)
+            StudyGroup.objects.create(name='Grupo', description='d', subject='s', creator=self.student)
+            User.objects.create_user(username='novo', nickname='novo', email='novo@test.com', password='testpass123', user_type='student')
+
+        with self.assertNumQueries(0):
+            totals = social_stats.snapshot()
+        self.assertEqual(totals, {'total_posts': 1, 'total_students': 2, 'total_study_groups': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(social_stats.snapshot()['total_posts'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentPost.objects.get(is_active=False).save()
+        self.assertEqual(social_stats.snapshot()['total_posts'], 0)
+
+
+class AsgiApplicationTest(TestCase):
+    """The ASGI entry point must import in a fresh process (as daphne/uvicorn do)"""
+
+    def import_asgi(self, **env):
+        environ = {key: value for key, value in os.environ.items() if key != 'DJANGO_SETTINGS_MODULE'}
+        environ.update(env)
+        return subprocess.run(
+            [sys.executable, '-c', 'import config.asgi; print(type(config.asgi.application).__name__)'],
+            cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True, timeout=60
+        )
+
+    def test_asgi_module_imports(self):
+        result = self.import_asgi()
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'ProtocolTypeRouter')
+
+    def test_in_process_sweeper_wraps_the_asgi_app(self):
+        result = self.import_asgi(STORY_SWEEPER_IN_PROCESS='true')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'SweeperLauncher')
@@ -0,0 +1,275 @@
+"""
+Contadores de mensagens não lidas por (usuário, conversa).
+
+Os contadores são incrementados quando uma mensagem é enviada e zerados
+quando o destinatário abre a conversa, então o badge do menu e a lista de
+conversas não precisam varrer ChatMessage.
+
+Backends (settings.UNREAD_COUNTER_BACKEND):
+
+- ``'db'``: coluna ``unread_count`` de ConversationReadState, com F().
+- ``'redis'``: um hash ``unread:<user_id>`` (conversa -> contador) no Redis
+  de REDIS_HOST/REDIS_PORT. Se o Redis não responder (na conexão ou em
+  qualquer comando), os contadores vão para o banco e o Redis só é testado
+  de novo depois de UNREAD_REDIS_RETRY_SECONDS; ``rebuild`` junta os dois.
+
+Nos dois casos o recibo de leitura (``last_read_at``) fica no banco, e
+``rebuild`` recalcula tudo a partir de ``ChatMessage.is_read``.
+"""
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ChatMessage, Conversation, ConversationReadState
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseUnreadCounters:
+    """Contadores na tabela ConversationReadState"""
+
+    def _ensure_states(self, conversation_id, user_ids):
+        ConversationReadState.objects.bulk_create(
+            [ConversationReadState(conversation_id=conversation_id, user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+
+    def incr(self, conversation_id, user_ids, amount=1):
+        self._ensure_states(conversation_id, user_ids)
+        ConversationReadState.objects.filter(
+            conversation_id=conversation_id,
+            user_id__in=user_ids
+        ).update(unread_count=Greatest(F('unread_count') + amount, 0))
+
+    def get(self, user_id, conversation_id):
+        return ConversationReadState.objects.filter(
+            conversation_id=conversation_id,
+            user_id=user_id
+        ).values_list('unread_count', flat=True).first() or 0
+
+    def reset(self, user_id, conversation_id):
+        ConversationReadState.objects.filter(
+            conversation_id=conversation_id,
+            user_id=user_id
+        ).update(unread_count=0)
+
+    def counts(self, user_id, conversation_ids):
+        return dict(
+            ConversationReadState.objects.filter(
+                user_id=user_id,
+                conversation_id__in=conversation_ids,
+                unread_count__gt=0
+            ).values_list('conversation_id', 'unread_count')
+        )
+
+    def total(self, user_id):
+        return ConversationReadState.objects.filter(
+            user_id=user_id,
+            unread_count__gt=0
+        ).aggregate(total=Sum('unread_count'))['total'] or 0
+
+    def replace(self, counts):
+        """Sobrescreve todos os contadores com ``{(user_id, conversation_id): n}``"""
+        ConversationReadState.objects.exclude(unread_count=0).update(unread_count=0)
+        states = [
+            ConversationReadState(conversation_id=conversation_id, user_id=user_id, unread_count=count)
+            for (user_id, conversation_id), count in counts.items()
+        ]
+        ConversationReadState.objects.bulk_create(
+            states,
+            update_conflicts=True,
+            unique_fields=['conversation', 'user'],
+            update_fields=['unread_count'],
+            batch_size=1000
+        )
+
+
+def _fallback_on_error(method):
+    """
+    Em erro do Redis, marca o backend como indisponível e repete a operação
+    nos contadores do banco.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except self.errors as e:
+            _redis_unavailable(e)
+            return getattr(DatabaseUnreadCounters(), method.__name__)(*args, **kwargs)
+    return wrapper
+
+
+class RedisUnreadCounters:
+    """Contadores em hashes do Redis, um por usuário"""
+
+    key_prefix = 'unread'
+
+    def __init__(self):
+        import redis
+
+        self.errors = redis.RedisError
+        self.client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=getattr(settings, 'UNREAD_REDIS_DB', 2),
+            socket_timeout=1,
+        )
+
+    def _key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    @_fallback_on_error
+    def incr(self, conversation_id, user_ids, amount=1):
+        pipe = self.client.pipeline()
+        for user_id in user_ids:
+            pipe.hincrby(self._key(user_id), conversation_id, amount)
+        pipe.execute()
+
+    @_fallback_on_error
+    def get(self, user_id, conversation_id):
+        return max(int(self.client.hget(self._key(user_id), conversation_id) or 0), 0)
+
+    @_fallback_on_error
+    def reset(self, user_id, conversation_id):
+        self.client.hdel(self._key(user_id), conversation_id)
+
+    @_fallback_on_error
+    def counts(self, user_id, conversation_ids):
+        conversation_ids = list(conversation_ids)
+        if not conversation_ids:
+            return {}
+        values = self.client.hmget(self._key(user_id), conversation_ids)
+        return {
+            conversation_id: int(value)
+            for conversation_id, value in zip(conversation_ids, values)
+            if value is not None and int(value) > 0
+        }
+
+    @_fallback_on_error
+    def total(self, user_id):
+        return sum(max(int(value), 0) for value in self.client.hvals(self._key(user_id)))
+
+    @_fallback_on_error
+    def replace(self, counts):
+        pipe = self.client.pipeline()
+        for key in self.client.scan_iter(f'{self.key_prefix}:*'):
+            pipe.delete(key)
+        for (user_id, conversation_id), count in counts.items():
+            pipe.hset(self._key(user_id), conversation_id, count)
+        pipe.execute()
+
+
+BACKENDS = {
+    'db': DatabaseUnreadCounters,
+    'redis': RedisUnreadCounters,
+}
+
+
+_redis_counters = None
+_redis_retry_at = 0
+
+
+def _redis_unavailable(error):
+    """Usa o banco até UNREAD_REDIS_RETRY_SECONDS, em vez de testar o Redis a cada chamada"""
+    global _redis_counters, _redis_retry_at
+    logger.warning(f"Redis indisponível para contadores de não lidas, usando o banco: {error}")
+    _redis_counters = None
+    _redis_retry_at = time.monotonic() + getattr(settings, 'UNREAD_REDIS_RETRY_SECONDS', 30)
+
+
+def get_backend():
+    global _redis_counters
+    name = getattr(settings, 'UNREAD_COUNTER_BACKEND', 'db')
+    if name != 'redis':
+        return BACKENDS[name]()
+
+    # A conexão é reaproveitada entre requests; só é testada na primeira vez
+    # (e de novo, após uma falha, a cada UNREAD_REDIS_RETRY_SECONDS)
+    if _redis_counters is None:
+        if time.monotonic() < _redis_retry_at:
+            return DatabaseUnreadCounters()
+        try:
+            backend = RedisUnreadCounters()
+            backend.client.ping()
+        except Exception as e:
+            _redis_unavailable(e)
+            return DatabaseUnreadCounters()
+        _redis_counters = backend
+    return _redis_counters
+
+
+def messages_sent(conversation_id, sender_id, amount=1):
+    """Soma ``amount`` mensagens não lidas para os outros participantes da conversa"""
+    recipient_ids = list(
+        Conversation.participants.through.objects.filter(
+            conversation_id=conversation_id
+        ).exclude(customuser_id=sender_id).values_list('customuser_id', flat=True)
+    )
+    if recipient_ids:
+        get_backend().incr(conversation_id, recipient_ids, amount)
+
+
+def mark_read(conversation, user):
+    """
+    Marca como lidas as mensagens recebidas por ``user`` na conversa.
+
+    O UPDATE usa o índice (conversation, is_read, sender) e roda sempre, mesmo com o
+    contador zerado, para que um contador que divergiu (ex: escrita perdida
+    no Redis) não deixe mensagens não lidas para sempre. Sem nada para marcar,
+    o contador e o recibo só são escritos se o contador estiver fora de zero.
+    """
+    backend = get_backend()
+    updated = ChatMessage.objects.filter(
+        conversation=conversation,
+        is_read=False
+    ).exclude(sender=user).update(is_read=True)
+
+    if not updated and not backend.get(user.id, conversation.id):
+        return 0
+
+    backend.reset(user.id, conversation.id)
+    ConversationReadState.objects.update_or_create(
+        conversation=conversation,
+        user=user,
+        defaults={'last_read_at': timezone.now()}
+    )
+    return updated
+
+
+def unread_counts(user, conversation_ids):
+    """``{conversation_id: n}`` apenas das conversas com mensagens não lidas"""
+    return get_backend().counts(user.id, conversation_ids)
+
+
+def total_unread(user):
+    return get_backend().total(user.id)
+
+
+def rebuild():
+    """Recalcula todos os contadores a partir de ChatMessage.is_read; retorna quantos ficaram > 0"""
+    unread_by_sender = {}
+    unread_total = {}
+    rows = ChatMessage.objects.filter(is_read=False).values('conversation_id', 'sender_id').annotate(
+        total=Count('pk')
+    ).order_by()
+    for row in rows:
+        unread_by_sender[(row['conversation_id'], row['sender_id'])] = row['total']
+        unread_total[row['conversation_id']] = unread_total.get(row['conversation_id'], 0) + row['total']
+
+    participants = Conversation.participants.through.objects.filter(
+        conversation_id__in=list(unread_total)
+    ).values_list('conversation_id', 'customuser_id')
+
+    counts = {}
+    for conversation_id, user_id in participants:
+        count = unread_total[conversation_id] - unread_by_sender.get((conversation_id, user_id), 0)
+        if count:
+            counts[(user_id, conversation_id)] = count
+
+    get_backend().replace(counts)
+    return len(counts)
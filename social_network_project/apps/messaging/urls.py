@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.conversations_list, name='conversations_list'),
     path('chat/', views.chat_view, name='chat'),
     path('chat/<int:conversation_id>/', views.chat_view, name='chat_view'),
+    path('chat/<int:conversation_id>/history/', views.chat_history, name='chat_history'),
     path('search/', views.search_users, name='search_users'),
     
     # Stories URLs
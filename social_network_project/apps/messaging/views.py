@@ -1,28 +1,37 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.views.generic import ListView, CreateView
-from django.utils import timezone
+from django.views.generic import CreateView
 from django.contrib.auth import get_user_model
 from django.http import JsonResponse
-from django.db.models import Q, Max, Count
+from django.db import IntegrityError, transaction
+from django.db.models import Q, F, Exists, OuterRef
 from django.contrib import messages
-from django.core.paginator import Paginator
 from .models import (
-    Conversation, ChatMessage, Story, StoryView,
+    Conversation, Story,
     StudentPost, PostLike, PostComment, StudentConnection, StudyGroup
 )
 from .forms import StoryForm, ChatMessageForm, StudentPostForm, StudyGroupForm
+from apps.core.models import adjust_counters
+from apps.core.pagination import KeysetPaginator, InvalidCursor
+from apps.core import tags
+from . import groups, history, playback, social_stats, stories, unread
 
 User = get_user_model()
 
 @login_required
 def conversations_list(request):
     """Lista todas as conversas do usuário"""
-    conversations = Conversation.objects.filter(
+    # Ordenado pelo resumo da última mensagem, sem tocar em ChatMessage
+    conversations = list(Conversation.objects.filter(
         participants=request.user
-    ).annotate(
-        last_message_time=Max('messages__timestamp')
-    ).order_by('-last_message_time')
+    ).prefetch_related('participants').order_by(
+        F('last_message_at').desc(nulls_last=True), '-created_at'
+    ))
+    
+    # Badges de não lidas vindos dos contadores, sem varrer as mensagens
+    unread_counts = unread.unread_counts(request.user, [conversation.id for conversation in conversations])
+    for conversation in conversations:
+        conversation.unread_count = unread_counts.get(conversation.id, 0)
     
     return render(request, 'messaging/conversations_list.html', {
         'conversations': conversations
@@ -42,28 +51,19 @@ def chat_view(request, conversation_id=None):
         other_user_id = request.GET.get('user_id')
         if other_user_id:
             other_user = get_object_or_404(User, id=other_user_id)
-            # Verificar se já existe conversa entre os dois usuários
-            conversation = Conversation.objects.filter(
-                participants=request.user
-            ).filter(
-                participants=other_user
-            ).first()
+            if other_user == request.user:
+                return redirect('messaging:conversations_list')
             
-            if not conversation:
-                # Criar nova conversa
-                conversation = Conversation.objects.create()
-                conversation.participants.add(request.user, other_user)
+            # Busca pela chave única do par (ou cria a conversa)
+            conversation, _ = Conversation.get_or_create_direct(request.user, other_user)
         else:
             return redirect('messaging:conversations_list')
     
-    # Marcar mensagens como lidas
-    ChatMessage.objects.filter(
-        conversation=conversation,
-        is_read=False
-    ).exclude(sender=request.user).update(is_read=True)
+    # Marcar mensagens como lidas (só escreve se o contador indicar não lidas)
+    unread.mark_read(conversation, request.user)
     
-    # Buscar mensagens
-    chat_messages = conversation.messages.all()
+    # Apenas a janela mais recente; as anteriores vêm de chat_history
+    chat_messages, history_cursor = history.history_page(conversation.id)
     other_user = conversation.participants.exclude(id=request.user.id).first()
     
     if request.method == 'POST':
@@ -73,8 +73,6 @@ def chat_view(request, conversation_id=None):
             message.conversation = conversation
             message.sender = request.user
             message.save()
-            conversation.updated_at = timezone.now()
-            conversation.save()
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
@@ -92,38 +90,37 @@ def chat_view(request, conversation_id=None):
     return render(request, 'messaging/chat.html', {
         'conversation': conversation,
         'messages': chat_messages,
+        'history_cursor': history_cursor,
         'other_user': other_user,
         'form': form
     })
 
+@login_required
+def chat_history(request, conversation_id):
+    """Janela de mensagens anteriores a ``?cursor=`` (JSON, mais antigas primeiro)"""
+    conversation = get_object_or_404(Conversation, id=conversation_id, participants=request.user)
+    
+    try:
+        limit = int(request.GET.get('limit', history.HISTORY_PAGE_SIZE))
+        chat_messages, next_cursor = history.history_page(conversation.id, request.GET.get('cursor'), limit)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'success': False, 'error': 'Parâmetros inválidos'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'messages': [history.serialize_message(message) for message in chat_messages],
+        'next_cursor': next_cursor,
+    })
+
 @login_required
 def stories_feed(request):
     """Feed de stories ativas"""
-    # Stories das últimas 24 horas que ainda não expiraram
-    active_stories = Story.objects.filter(
-        is_active=True,
-        expires_at__gt=timezone.now()
-    ).select_related('user').order_by('-is_highlighted', '-created_at')
-    
-    # Agrupar stories por usuário
-    stories_by_user = {}
-    for story in active_stories:
-        user_id = story.user.id
-        if user_id not in stories_by_user:
-            stories_by_user[user_id] = {
-                'user': story.user,
-                'stories': [],
-                'unviewed_count': 0
-            }
-        stories_by_user[user_id]['stories'].append(story)
-        
-        # Verificar se o usuário já viu este story (apenas se estiver logado)
-        if request.user.is_authenticated and not StoryView.objects.filter(story=story, viewer=request.user).exists():
-            stories_by_user[user_id]['unviewed_count'] += 1
+    # Uma consulta (ou o cache do usuário) para a bandeja inteira
+    stories_by_user, total_stories = stories.story_tray(request.user)
     
     context = {
         'stories_by_user': stories_by_user,
-        'total_stories': active_stories.count(),
+        'total_stories': total_stories,
     }
     
     return render(request, 'messaging/stories_feed.html', context)
@@ -131,37 +128,23 @@ def stories_feed(request):
 @login_required
 def view_story(request, story_id):
     """Visualizar um story específico"""
-    story = get_object_or_404(Story, id=story_id, is_active=True)
-    
-    # Verificar se o story não expirou
-    if story.is_expired:
+    # Playlist da bandeja cacheada, com anterior/próximo já calculados
+    session = playback.playback(request.user, story_id)
+    if session is None:
+        get_object_or_404(Story, id=story_id, is_active=True)
         messages.error(request, 'Este story expirou.')
         return redirect('messaging:stories_feed')
     
-    # Registrar visualização se não for o próprio criador
-    if story.user != request.user:
-        StoryView.objects.get_or_create(story=story, viewer=request.user)
-    
-    # Buscar outros stories do mesmo usuário que ainda estão ativos
-    user_stories = Story.objects.filter(
-        user=story.user,
-        is_active=True,
-        expires_at__gt=timezone.now()
-    ).order_by('created_at')
-    
-    # Encontrar o índice atual
-    current_index = 0
-    story_list = list(user_stories)
-    for i, s in enumerate(story_list):
-        if s.id == story.id:
-            current_index = i
-            break
+    # Registrar visualização (em lote, fora do request)
+    playback.queue_view(session.story, request.user)
     
     context = {
-        'story': story,
-        'user_stories': story_list,
-        'current_index': current_index,
-        'total_stories': len(story_list),
+        'story': session.story,
+        'user_stories': session.user_stories,
+        'current_index': session.current_index,
+        'total_stories': len(session.user_stories),
+        'prev_story_id': session.prev_story_id,
+        'next_story_id': session.next_story_id,
     }
     
     return render(request, 'messaging/view_story.html', context)
@@ -173,12 +156,12 @@ class CreateStoryView(CreateView):
     template_name = 'messaging/create_story.html'
     
     def form_valid(self, form):
-        form.instance.user = self.request.user
         # Apenas empresas podem criar stories
         if self.request.user.user_type != 'company':
             messages.error(self.request, 'Apenas empresas podem criar stories.')
             return redirect('messaging:stories_feed')
-        return super().form_valid(form)
+        self.object = stories.publish_story(self.request.user, form.save(commit=False))
+        return redirect(self.get_success_url())
     
     def get_success_url(self):
         messages.success(self.request, 'Story criado com sucesso!')
@@ -223,13 +206,17 @@ def student_social_feed(request):
     # Filtros
     post_type = request.GET.get('type', 'all')
     search_query = request.GET.get('q', '')
+    tag_filter = request.GET.get('tag', '')
     
     # Buscar posts
-    posts = StudentPost.objects.filter(is_active=True).select_related('author').prefetch_related('likes', 'comments')
+    posts = StudentPost.objects.filter(is_active=True).select_related('author').prefetch_related('normalized_tags')
     
     if post_type != 'all':
         posts = posts.filter(post_type=post_type)
     
+    if tag_filter:
+        posts = tags.filter_by_tag(posts, tag_filter)
+    
     if search_query:
         posts = posts.filter(
             Q(title__icontains=search_query) |
@@ -237,32 +224,17 @@ def student_social_feed(request):
             Q(tags__icontains=search_query)
         )
     
-    posts = posts.order_by('-created_at')
-    
-    # Processar tags para cada post
-    for post in posts:
-        if post.tags:
-            post.tag_list = [tag.strip() for tag in post.tags.split(',') if tag.strip()]
-        else:
-            post.tag_list = []
-    
-    # Paginação
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Estatísticas rápidas
-    total_posts = StudentPost.objects.filter(is_active=True).count()
-    total_students = User.objects.filter(user_type='student').count()
-    total_study_groups = StudyGroup.objects.filter(is_active=True).count()
+    # Paginação por cursor (sem COUNT nem OFFSET)
+    paginator = KeysetPaginator(posts, 10)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
         'post_type': post_type,
         'search_query': search_query,
-        'total_posts': total_posts,
-        'total_students': total_students,
-        'total_study_groups': total_study_groups,
+        'current_tag': tag_filter,
+        # Estatísticas rápidas, do cache mantido pelos signals (messaging.social_stats)
+        **social_stats.snapshot(),
     }
     
     return render(request, 'messaging/student_social_feed.html', context)
@@ -307,6 +279,7 @@ def student_post_detail(request, post_id):
                 author=request.user,
                 content=content
             )
+            adjust_counters(post, refresh=False, comments_count=1)
             messages.success(request, 'Comentário adicionado!')
             return redirect('messaging:student_post_detail', post_id=post.id)
     
@@ -333,6 +306,8 @@ def toggle_post_like(request, post_id):
     else:
         liked = True
     
+    adjust_counters(post, likes_count=1 if liked else -1)
+    
     return JsonResponse({
         'liked': liked,
         'likes_count': post.likes_count
@@ -350,24 +325,25 @@ def study_groups_list(request):
     meeting_type = request.GET.get('meeting_type', '')
     university = request.GET.get('university', '')
     
-    groups = StudyGroup.objects.filter(is_active=True).annotate(
-        members_count=Count('members')
+    # members_count é um campo; is_member vem de um EXISTS no índice da tabela de membros
+    study_groups = StudyGroup.objects.filter(is_active=True).annotate(
+        is_member=Exists(groups.Membership.objects.filter(studygroup=OuterRef('pk'), customuser=request.user))
     ).select_related('creator')
     
     if subject:
-        groups = groups.filter(subject__icontains=subject)
+        study_groups = study_groups.filter(subject__icontains=subject)
     if meeting_type:
-        groups = groups.filter(meeting_type=meeting_type)
+        study_groups = study_groups.filter(meeting_type=meeting_type)
     if university:
-        groups = groups.filter(university__icontains=university)
+        study_groups = study_groups.filter(university__icontains=university)
     
-    groups = groups.order_by('-created_at')
+    study_groups = study_groups.order_by('-created_at')
     
     # Grupos que o usuário participa
     user_groups = request.user.study_groups.filter(is_active=True)
     
     context = {
-        'groups': groups,
+        'groups': study_groups,
         'user_groups': user_groups,
         'subject': subject,
         'meeting_type': meeting_type,
@@ -397,47 +373,6 @@ def create_study_group(request):
     
     return render(request, 'messaging/create_study_group.html', {'form': form})
 
-@login_required
-def join_study_group(request, group_id):
-    """Entrar em um grupo de estudos"""
-    if request.user.user_type != 'student':
-        return JsonResponse({'error': 'Área exclusiva para estudantes'}, status=403)
-    
-    group = get_object_or_404(StudyGroup, id=group_id, is_active=True)
-    
-    if group.is_full:
-        return JsonResponse({'error': 'Grupo lotado'}, status=400)
-    
-    if request.user in group.members.all():
-        return JsonResponse({'error': 'Você já faz parte deste grupo'}, status=400)
-    
-    group.members.add(request.user)
-    
-    return JsonResponse({
-        'success': True,
-        'message': f'Você entrou no grupo {group.name}!',
-        'members_count': group.members_count
-    })
-
-@login_required
-def leave_study_group(request, group_id):
-    """Sair de um grupo de estudos"""
-    if request.user.user_type != 'student':
-        return JsonResponse({'error': 'Área exclusiva para estudantes'}, status=403)
-    
-    group = get_object_or_404(StudyGroup, id=group_id)
-    
-    if request.user not in group.members.all():
-        return JsonResponse({'error': 'Você não faz parte deste grupo'}, status=400)
-    
-    group.members.remove(request.user)
-    
-    return JsonResponse({
-        'success': True,
-        'message': f'Você saiu do grupo {group.name}.',
-        'members_count': group.members_count
-    })
-
 @login_required
 def student_connections(request):
     """Lista de conexões do estudante"""
@@ -497,18 +432,12 @@ def search_students(request):
     if university:
         students = students.filter(university__icontains=university)
     
-    students = students[:20]  # Limite de resultados
+    students = list(students[:20])  # Limite de resultados
     
-    # Verificar status de conexão para cada estudante
+    # Status de conexão de todos os resultados em uma consulta
+    statuses = StudentConnection.statuses_for(request.user.id, [student.id for student in students])
     for student in students:
-        student.connection_status = 'none'
-        connection = StudentConnection.objects.filter(
-            Q(from_student=request.user, to_student=student) |
-            Q(from_student=student, to_student=request.user)
-        ).first()
-        
-        if connection:
-            student.connection_status = connection.status
+        student.connection_status = statuses.get(student.id, 'none')
     
     context = {
         'students': students,
@@ -532,25 +461,36 @@ def send_connection_request(request, user_id):
         messages.error(request, 'Você não pode se conectar consigo mesmo.')
         return redirect('messaging:search_students')
     
-    # Verificar se já existe uma conexão
-    existing_connection = StudentConnection.objects.filter(
-        Q(from_student=request.user, to_student=target_user) |
-        Q(from_student=target_user, to_student=request.user)
-    ).first()
+    # Verificar se já existe uma conexão (em qualquer sentido)
+    existing_connection = StudentConnection.between(request.user.id, target_user.id)
     
-    if existing_connection:
+    if existing_connection and existing_connection.status != 'rejected':
         if existing_connection.status == 'accepted':
             messages.info(request, f'Você já está conectado com {target_user.nickname}.')
         elif existing_connection.status == 'pending':
             messages.info(request, f'Solicitação para {target_user.nickname} já foi enviada.')
+        else:
+            messages.error(request, f'Não é possível se conectar com {target_user.nickname}.')
         return redirect('messaging:search_students')
     
-    # Criar nova solicitação
-    StudentConnection.objects.create(
-        from_student=request.user,
-        to_student=target_user,
-        status='pending'
-    )
+    if existing_connection:
+        # Uma solicitação recusada pode ser refeita: o par continua com uma linha só
+        existing_connection.from_student = request.user
+        existing_connection.to_student = target_user
+        existing_connection.status = 'pending'
+        existing_connection.save(update_fields=['from_student', 'to_student', 'status'])
+    else:
+        try:
+            with transaction.atomic():
+                StudentConnection.objects.create(
+                    from_student=request.user,
+                    to_student=target_user,
+                    status='pending'
+                )
+        except IntegrityError:
+            # O outro estudante enviou uma solicitação ao mesmo tempo
+            messages.info(request, f'Solicitação para {target_user.nickname} já foi enviada.')
+            return redirect('messaging:search_students')
     
     messages.success(request, f'Solicitação de conexão enviada para {target_user.nickname}!')
     return redirect('messaging:search_students')
@@ -597,16 +537,14 @@ def join_study_group(request, group_id):
     
     group = get_object_or_404(StudyGroup, id=group_id, is_active=True)
     
-    if request.user in group.members.all():
+    # A vaga é reservada no mesmo UPDATE que confere o limite (ver messaging.groups)
+    result = groups.join(group, request.user)
+    if result == groups.ALREADY_MEMBER:
         messages.info(request, 'Você já faz parte deste grupo.')
-        return redirect('messaging:study_groups_list')
-    
-    if group.members.count() >= group.max_members:
+    elif result == groups.FULL:
         messages.error(request, 'Este grupo já está lotado.')
-        return redirect('messaging:study_groups_list')
-    
-    group.members.add(request.user)
-    messages.success(request, f'Você agora faz parte do grupo "{group.name}"!')
+    else:
+        messages.success(request, f'Você agora faz parte do grupo "{group.name}"!')
     return redirect('messaging:study_groups_list')
 
 @login_required
@@ -618,11 +556,10 @@ def leave_study_group(request, group_id):
     
     group = get_object_or_404(StudyGroup, id=group_id, is_active=True)
     
-    if request.user not in group.members.all():
+    if not groups.leave(group, request.user):
         messages.info(request, 'Você não faz parte deste grupo.')
         return redirect('messaging:study_groups_list')
     
-    group.members.remove(request.user)
     messages.success(request, f'Você saiu do grupo "{group.name}".')
     return redirect('messaging:study_groups_list')
 
@@ -0,0 +1,125 @@
+"""
+Escrita em lote das mensagens recebidas pelo WebSocket.
+
+Cada mensagem do ChatConsumer entra em um buffer por processo (um por event
+loop). O buffer é descarregado com um único ``bulk_create`` a cada
+CHAT_WRITE_FLUSH_MS milissegundos ou quando junta CHAT_WRITE_BATCH_SIZE
+mensagens, o que acontecer primeiro. Na mesma transação:
+
+- o resumo da última mensagem (e ``updated_at``) de cada conversa recebe um
+  UPDATE por conversa do lote, e não um por mensagem;
+- os contadores de não lidas (messaging.unread) são somados por
+  (conversa, remetente).
+
+Quem chamou ``submit`` recebe a ChatMessage salva (com id e timestamp) assim
+que o lote dela for gravado.
+"""
+import asyncio
+import weakref
+from dataclasses import dataclass
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import ChatMessage, Conversation
+from . import unread
+
+
+@dataclass
+class PendingMessage:
+    conversation_id: int
+    sender_id: int
+    content: str
+    message_type: str
+    future: asyncio.Future
+
+
+def write_messages(pending):
+    """Grava um lote de mensagens; retorna as ChatMessage na mesma ordem"""
+    messages = [
+        ChatMessage(
+            conversation_id=item.conversation_id,
+            sender_id=item.sender_id,
+            content=item.content,
+            message_type=item.message_type,
+        )
+        for item in pending
+    ]
+
+    with transaction.atomic():
+        ChatMessage.objects.bulk_create(messages)
+
+        last_messages = {}
+        sent_counts = {}
+        for message in messages:
+            last_messages[message.conversation_id] = message
+            key = (message.conversation_id, message.sender_id)
+            sent_counts[key] = sent_counts.get(key, 0) + 1
+
+        for conversation_id, message in last_messages.items():
+            Conversation.objects.filter(pk=conversation_id).update(**Conversation.snapshot_fields(message))
+        for (conversation_id, sender_id), amount in sent_counts.items():
+            unread.messages_sent(conversation_id, sender_id, amount)
+
+    return messages
+
+
+class MessageWriteBuffer:
+    """Buffer assíncrono que agrupa mensagens em bulk_create"""
+
+    def __init__(self, batch_size=None, flush_interval_ms=None):
+        self.batch_size = batch_size or getattr(settings, 'CHAT_WRITE_BATCH_SIZE', 500)
+        self.flush_interval = (flush_interval_ms or getattr(settings, 'CHAT_WRITE_FLUSH_MS', 20)) / 1000
+        self._pending = []
+        self._timer = None
+        self._lock = asyncio.Lock()
+
+    async def submit(self, conversation_id, sender_id, content, message_type='text'):
+        """Enfileira uma mensagem e espera o lote dela ser gravado"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(PendingMessage(conversation_id, sender_id, content, message_type, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._start_flush)
+
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        # O lock mantém a ordem de gravação entre lotes
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            try:
+                messages = await database_sync_to_async(write_messages)(batch)
+            except Exception as e:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                return
+
+            for item, message in zip(batch, messages):
+                if not item.future.done():
+                    item.future.set_result(message)
+
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_write_buffer():
+    """Buffer compartilhado pelos consumers do event loop atual"""
+    loop = asyncio.get_running_loop()
+    if loop not in _buffers:
+        _buffers[loop] = MessageWriteBuffer()
+    return _buffers[loop]
@@ -8,18 +8,27 @@ https://docs.djangoproject.com/en/stable/howto/deployment/asgi/
 """
 
 import os
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+
 from django.core.asgi import get_asgi_application
-from apps.messaging.routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# Load the apps before importing anything that touches models (consumers, sweeper)
 django_asgi_app = get_asgi_application()
 
+from django.conf import settings  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from apps.messaging.routing import websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(websocket_urlpatterns)
     ),
-})
\ No newline at end of file
+})
+
+if settings.STORY_SWEEPER_IN_PROCESS:
+    from apps.messaging.sweeper import SweeperLauncher
+
+    application = SweeperLauncher(application)
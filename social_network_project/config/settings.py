@@ -106,6 +106,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.messaging.context_processors.unread_messages',
             ],
         },
     },
@@ -195,6 +196,67 @@ else:
         }
     }
 
+# Home timeline (fan-out on write)
+# Companies with at least this many followers are pulled at read time instead of fanned out
+TIMELINE_FANOUT_MAX_FOLLOWERS = env.int('TIMELINE_FANOUT_MAX_FOLLOWERS', 5000)
+# Posts copied into a follower's timeline when they start following someone
+TIMELINE_BACKFILL_SIZE = env.int('TIMELINE_BACKFILL_SIZE', 50)
+
+# Cached follow-graph adjacency sets (invalidated on follow/unfollow)
+FOLLOW_GRAPH_CACHE_TIMEOUT = env.int('FOLLOW_GRAPH_CACHE_TIMEOUT', 3600)
+
+# Who-to-follow suggestions stored per user by `manage.py build_suggestions`
+SUGGESTIONS_PER_USER = env.int('SUGGESTIONS_PER_USER', 20)
+SUGGESTIONS_BATCH_SIZE = env.int('SUGGESTIONS_BATCH_SIZE', 2000)
+
+# Unread message counters: 'redis' (hashes in REDIS_HOST, falls back to the DB if unreachable) or 'db'
+UNREAD_COUNTER_BACKEND = env.str('UNREAD_COUNTER_BACKEND', 'redis' if CACHE_ENABLED else 'db')
+UNREAD_REDIS_DB = env.int('UNREAD_REDIS_DB', 2)
+UNREAD_REDIS_RETRY_SECONDS = env.int('UNREAD_REDIS_RETRY_SECONDS', 30)
+
+# Per-viewer story tray cache (also capped by the first story's expiry)
+STORY_TRAY_CACHE_TIMEOUT = env.int('STORY_TRAY_CACHE_TIMEOUT', 60)
+
+# Student social feed sidebar totals (adjusted in place by signals, recounted on expiry)
+SOCIAL_STATS_CACHE_TIMEOUT = env.int('SOCIAL_STATS_CACHE_TIMEOUT', 600)
+
+# Rendered HTML caching: post/job cards and story trays (keyed on per-entity versions),
+# and the job list page for anonymous visitors
+FRAGMENT_CACHE_TIMEOUT = env.int('FRAGMENT_CACHE_TIMEOUT', 300)
+FRAGMENT_CACHE_STATS = env.bool('FRAGMENT_CACHE_STATS', True)
+JOB_LIST_PAGE_CACHE_TIMEOUT = env.int('JOB_LIST_PAGE_CACHE_TIMEOUT', 300)
+
+# Job facet counts (category, job type, level, location); invalidated on any job change
+JOB_FACETS_CACHE_TIMEOUT = env.int('JOB_FACETS_CACHE_TIMEOUT', 600)
+
+# Per-job application totals by status; invalidated when an application is created, updated or deleted
+APPLICATION_STATS_CACHE_TIMEOUT = env.int('APPLICATION_STATS_CACHE_TIMEOUT', 600)
+
+# Write-behind buffer for like and story view events: 'sync', 'memory' (flush thread per
+# process) or 'redis' (list drained by manage.py process_events).
+# 'memory' keeps the read-your-writes overlay in the default cache, so it needs a cache shared
+# by all workers (CACHE_ENABLED/Redis): with the per-process LocMemCache a like can vanish on
+# the next request served by another worker. Its queue also lives in the worker and is only
+# flushed on a clean exit. Without a shared cache the default is 'sync'.
+EVENT_BUFFER_BACKEND = env.str('EVENT_BUFFER_BACKEND', 'memory' if CACHE_ENABLED else 'sync')
+EVENT_FLUSH_MS = env.int('EVENT_FLUSH_MS', 500)
+EVENT_BATCH_SIZE = env.int('EVENT_BATCH_SIZE', 1000)
+# Attempts before the memory buffer drops a batch that keeps failing
+EVENT_MAX_ATTEMPTS = env.int('EVENT_MAX_ATTEMPTS', 5)
+EVENT_REDIS_DB = env.int('EVENT_REDIS_DB', 3)
+# How long a user's own queued events are overlaid on what they read
+EVENT_OVERLAY_TIMEOUT = env.int('EVENT_OVERLAY_TIMEOUT', 300)
+
+# Expired story sweeper (manage.py sweep_expired_stories from cron, or in-process under ASGI)
+STORY_SWEEP_BATCH_SIZE = env.int('STORY_SWEEP_BATCH_SIZE', 200)
+STORY_SWEEP_PAUSE_MS = env.int('STORY_SWEEP_PAUSE_MS', 200)
+STORY_SWEEP_INTERVAL = env.int('STORY_SWEEP_INTERVAL', 300)
+STORY_SWEEPER_IN_PROCESS = env.bool('STORY_SWEEPER_IN_PROCESS', False)
+
+# WebSocket chat writes are flushed with bulk_create every N ms or every M messages
+CHAT_WRITE_FLUSH_MS = env.int('CHAT_WRITE_FLUSH_MS', 20)
+CHAT_WRITE_BATCH_SIZE = env.int('CHAT_WRITE_BATCH_SIZE', 500)
+
 LOGIN_REDIRECT_URL = 'accounts:profile'
 LOGOUT_REDIRECT_URL = 'accounts:login'
 LOGIN_URL = 'accounts:login'